@@ -0,0 +1,57 @@
+""" 登录密码加密: 公钥解析, 单次加密, 以及多账户并发登录时的加密开销
+
+python -m benchmarks.bench_encrypt [--count N] [--accounts N] [--threads N]
+"""
+import time
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.hazmat.primitives import serialization
+from emt import emt_trade_encrypt
+from emt.emt_trade_encrypt import rsa_public_key, load_public_key, encrypt_password
+
+
+def _report(name: str, n: int, elapsed: float):
+    print(f'{name:<36} {n:6d} in {elapsed * 1000:9.2f}ms  {elapsed / n * 1e6:9.2f}us/op')
+
+
+def _timeit(name: str, n: int, func):
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    _report(name, n, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--accounts', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    load_public_key()
+    _report('first load_public_key', 1, time.perf_counter() - start)
+
+    _timeit('load_pem_public_key (uncached)', args.count,
+            lambda: serialization.load_pem_public_key(rsa_public_key.encode('utf-8')))
+    _timeit('load_public_key (cached)', args.count, load_public_key)
+    _timeit('encrypt_password', args.count, lambda: encrypt_password('123456'))
+
+    def uncached(_):
+        # 每次登录都解析公钥, 即缓存前的行为
+        emt_trade_encrypt._pub_key = None
+        return encrypt_password('123456')
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for name, func in (
+            ('pool login encrypt (parse each)', uncached),
+            ('pool login encrypt (cached key)', lambda _: encrypt_password('123456')),
+        ):
+            start = time.perf_counter()
+            list(executor.map(func, range(args.accounts)))
+            _report(name, args.accounts, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
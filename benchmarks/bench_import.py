@@ -0,0 +1,60 @@
+""" 冷启动导入耗时
+
+每个场景在新的解释器进程中执行, 测量总耗时(含解释器启动)和 -X importtime 统计的导入耗时,
+并列出耗时最多的模块.
+
+python -m benchmarks.bench_import [repeat]
+"""
+import os
+import re
+import sys
+import time
+import statistics
+import subprocess
+
+_scenarios = {
+    'python (baseline)': 'pass',
+    'import emt': 'import emt',
+    'from emt import get_last_price': 'from emt import get_last_price',
+    'from emt import EMTTrade': 'from emt import EMTTrade',
+    'EMTTrade()': 'from emt import EMTTrade; EMTTrade()',
+    'from emt import PreTradeRisk': 'from emt import PreTradeRisk',
+}
+
+_importtime_line = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)')
+
+
+def _run(code: str, importtime: bool = False) -> tuple[float, str]:
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=os.getcwd(), check=True)
+    return time.perf_counter() - start, proc.stderr
+
+
+def _top_imports(stderr: str, n: int = 5) -> list[tuple[str, int]]:
+    """ 顶层(直接由脚本触发)导入中累计耗时最多的模块, 单位微秒 """
+    ret = []
+    for m in _importtime_line.finditer(stderr):
+        _, cumulative, indent, name = m.groups()
+        if len(indent) != 1:
+            continue
+        if name == 'site':
+            # 之前的是解释器启动时的导入
+            ret = []
+        else:
+            ret.append((name, int(cumulative)))
+    return sorted(ret, key=lambda i: -i[1])[:n]
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, code in _scenarios.items():
+        wall = statistics.median(_run(code)[0] for _ in range(repeat))
+        _, stderr = _run(code, importtime=True)
+        top = ', '.join(f'{k} {v / 1000:.1f}ms' for k, v in _top_imports(stderr))
+        print(f'{name:<32} {wall * 1000:8.1f}ms  {top}')
+    print(f'emt_logs created: {os.path.exists("emt_logs")}')
+
+
+if __name__ == '__main__':
+    main()
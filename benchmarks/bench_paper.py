@@ -0,0 +1,62 @@
+""" 模拟交易吞吐: 下单, 按行情撮合(部分成交), 撤单和查询
+
+python -m benchmarks.bench_paper [--orders N] [--symbols N] [--fill-ratio 比例] [--latency 秒]
+"""
+import time
+import random
+import argparse
+
+from emt import PaperTrade, InstrumentID, MarketType, Direction
+
+
+def _report(name: str, n: int, elapsed: float):
+    print(f'{name:<28} {n:8d} in {elapsed * 1000:9.2f}ms  {n / elapsed:12.1f}/s')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--fill-ratio', type=float, default=0.5)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    ins_ids = [InstrumentID(f'{600000 + i:06d}', MarketType.SSE) for i in range(args.symbols)]
+    api = PaperTrade(
+        cash=1e12,
+        positions={i.symbol_code: (10 ** 8, 10.0) for i in ins_ids},
+        latency=args.latency,
+        fill_ratio=args.fill_ratio
+    )
+    for i in ins_ids:
+        api.set_price(i, 10.0)
+    orders = [(rng.choice(ins_ids), rng.choice((Direction.Buy, Direction.Sell)),
+               round(10.0 + rng.randint(-20, 20) * 0.01, 2), 100 * rng.randint(1, 10))
+              for _ in range(args.orders)]
+
+    start = time.perf_counter()
+    infos = [api.insert_order(*i) for i in orders]
+    _report('insert_order', len(orders), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    fills = 0
+    for _ in range(3):
+        for i in ins_ids:
+            fills += api.on_price(i, round(10.0 + rng.randint(-20, 20) * 0.01, 2))
+    _report('on_price match (fills)', fills, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    ret = api.cancel_orders([i for i in infos if i is not None])
+    _report('cancel_orders', len(ret), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    rows = api.query_orders()
+    trades = api.query_trades()
+    api.query_asset_and_position()
+    _report('query orders + trades', len(rows) + len(trades), time.perf_counter() - start)
+    print(f'asset: {api.account.asset}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+""" 内存对比: OrderInfo(dataclass) vs OrderRecord/FrozenOrderRecord(__slots__)
+
+python -m benchmarks.bench_records [count]
+"""
+import sys
+import gc
+import tracemalloc
+
+from emt.types import order_deserialize
+from emt.records import order_record_deserialize
+
+
+def make_row(i: int) -> dict:
+    return {
+        'Zqdm': ('000001', '600000', '300750', '601318')[i % 4],
+        'Wtbh': str(100000 + i),
+        'Wtsl': '100',
+        'Cdsl': '0',
+        'Cjsl': '100',
+        'Wtjg': '10.01',
+        'Cjje': '1001.00',
+        'Wtzt': '已成',
+        'Mmlb': 'B' if i % 2 else 'S',
+        'Bpsj': '093001',
+        'Wtrq': '20231010',
+        'Wtsj': '093000',
+    }
+
+
+def measure(name: str, factory, rows: list[dict]):
+    gc.collect()
+    tracemalloc.start()
+    objs = [factory(i) for i in rows]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 实例本身(含 __dict__)的大小, 不含字段引用的对象
+    shallow = sys.getsizeof(objs[0]) + (sys.getsizeof(objs[0].__dict__) if hasattr(objs[0], '__dict__') else 0)
+    print(f'{name:<20} {len(objs):>8} objs  {current / 1024 / 1024:8.2f} MiB  '
+          f'{current / len(objs):8.1f} B/obj  {shallow:5d} B/instance')
+    del objs
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rows = [make_row(i) for i in range(count)]
+    measure('OrderInfo', order_deserialize, rows)
+    measure('OrderRecord', order_record_deserialize, rows)
+    measure('FrozenOrderRecord', lambda r: order_record_deserialize(r, True), rows)
+
+
+if __name__ == '__main__':
+    main()
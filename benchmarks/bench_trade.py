@@ -0,0 +1,111 @@
+""" 端到端基准: 在本地模拟服务上测量下单吞吐, 撤单延迟分布和响应解析耗时
+
+python -m benchmarks.bench_trade [--orders N] [--latency 秒] [--jitter 秒] [--error-rate 比例] [--no-rate-limit]
+"""
+import time
+import argparse
+
+from emt import EMTTrade, InstrumentID, MarketType, Direction
+from emt.captcha import CaptchaSolver
+from emt.columnar import orders_to_array
+from emt.metrics import Histogram, MetricsRegistry
+from emt.rate_limit import RateLimiter
+from emt.types import order_deserialize
+from benchmarks.mock_broker import MockBrokerServer, MockConfig, EchoOcr
+from benchmarks.bench_records import make_row
+
+
+def _percentiles(name: str, s: dict):
+    print(f'{name:<28} n={s["count"]:<6} p50={s["p50"] / 1000:8.2f}ms  p90={s["p90"] / 1000:8.2f}ms  '
+          f'p99={s["p99"] / 1000:8.2f}ms  max={s["max"] / 1000:8.2f}ms')
+
+
+def _orders(n: int) -> list[tuple[InstrumentID, Direction, float, int]]:
+    ins = (InstrumentID('600000', MarketType.SSE), InstrumentID('000001', MarketType.SZE))
+    return [(ins[i % 2], Direction.Buy, 10.0, 100) for i in range(n)]
+
+
+def bench_insert(api: EMTTrade, n: int) -> list:
+    orders = _orders(n)
+    start = time.perf_counter()
+    sequential = [api.insert_order(*i) for i in orders]
+    elapsed = time.perf_counter() - start
+    ok = sum(i is not None for i in sequential)
+    print(f'{"insert_order sequential":<28} {n / elapsed:10.1f} orders/s  ok={ok}/{n}')
+
+    start = time.perf_counter()
+    batch = api.insert_orders(orders)
+    elapsed = time.perf_counter() - start
+    ok = sum(i is not None for i in batch)
+    print(f'{"insert_orders concurrent":<28} {n / elapsed:10.1f} orders/s  ok={ok}/{n}')
+    return [i for i in sequential + batch if i is not None]
+
+
+def bench_cancel(api: EMTTrade, orders: list):
+    half = len(orders) // 2
+    hist = Histogram()
+    for order in orders[:half]:
+        start = time.perf_counter()
+        api.cancel_order(order.cancel_code)
+        hist.record((time.perf_counter() - start) * 1e6)
+    _percentiles('cancel_order latency', hist.snapshot())
+
+    rest = orders[half:]
+    start = time.perf_counter()
+    ret = api.cancel_orders(rest)
+    elapsed = time.perf_counter() - start
+    print(f'{"cancel_orders batch":<28} {len(rest)} orders in {elapsed * 1000:.2f}ms  '
+          f'ok={sum(ret.values())}/{len(ret)}')
+
+
+def bench_deserialize(count: int = 50000):
+    rows = [make_row(i) for i in range(count)]
+    for name, func in (
+        ('order_deserialize', lambda: [order_deserialize(i) for i in rows]),
+        ('orders_to_array', lambda: orders_to_array(rows)),
+    ):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f'{name:<28} {count} rows in {elapsed * 1000:8.2f}ms  {elapsed / count * 1e6:6.2f}us/row')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--pool-size', type=int, default=16)
+    parser.add_argument('--no-rate-limit', action='store_true', help='关闭客户端限流, 测量原始吞吐')
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    with MockBrokerServer(config) as server:
+        registry = MetricsRegistry()
+        api = EMTTrade(
+            pool_size=args.pool_size,
+            metrics=registry,
+            captcha_solver=CaptchaSolver(ocr=EchoOcr()),
+            base_url=server.base_url,
+            rate_limiter=None if args.no_rate_limit else RateLimiter()
+        )
+        if api.login('mock', 'mock') is None:
+            print('login to mock broker fail')
+            return
+        print(f'mock broker {server.base_url}, latency={args.latency}s, error_rate={args.error_rate}')
+        orders = bench_insert(api, args.orders)
+        bench_cancel(api, orders)
+        latency = registry.snapshot()['latency_us']
+        for endpoint in ('insert_order', 'cancel_order'):
+            for phase in ('throttle', 'server', 'total'):
+                if phase in latency.get(endpoint, {}):
+                    _percentiles(f'{endpoint} {phase}', latency[endpoint][phase])
+        retries = registry.snapshot()['retries']
+        if retries:
+            print(f'retries: {retries}')
+    bench_deserialize()
+
+
+if __name__ == '__main__':
+    main()
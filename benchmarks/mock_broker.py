@@ -0,0 +1,267 @@
+""" 本地模拟交易/行情服务
+
+复现 jywg.18.cn 的 Login/YZM, Login/Authentication, Trade/Buy, Com/queryAssetAndPositionV1, Search/*,
+Trade/SubmitTradeV2, Trade/RevokeOrders 以及行情快照接口的路径和响应格式, 支持配置延迟和错误注入.
+验证码图片内容即为验证码本身, 配合 EchoOcr 使用.
+
+python -m benchmarks.mock_broker [port]
+"""
+import sys
+import json
+import time
+import random
+import datetime
+import threading
+
+from dataclasses import dataclass, field
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+
+class EchoOcr:
+    """ 模拟服务的验证码识别, 图片内容即验证码 """
+
+    def classification(self, img: bytes) -> str:
+        return img.decode()
+
+
+@dataclass
+class MockConfig:
+    # 每个请求的固定延迟(秒)
+    latency: float = 0.0
+    # 在固定延迟之上的随机抖动(秒)
+    jitter: float = 0.0
+    # 返回 500 的概率
+    error_rate: float = 0.0
+    # 报单立即全部成交的概率
+    fill_prob: float = 0.0
+    captcha_code: str = '1234'
+    validatekey: str = 'mock-validatekey'
+    # 预置的当日委托数量
+    initial_orders: int = 0
+    # 行情快照的最新价
+    prices: dict = field(default_factory=dict)
+
+
+class MockBroker:
+
+    def __init__(self, config: Optional[MockConfig] = None):
+        self.config = config or MockConfig()
+        self._lock = threading.Lock()
+        self._orders: dict[int, dict] = {}
+        self._trades: list[dict] = []
+        self._next_id = 100000
+        self._sessions: set[str] = set()
+        self.requests = 0
+        for i in range(self.config.initial_orders):
+            self._submit('000001' if i % 2 else '600000', 'B', 10.0, 100)
+
+    def expire_sessions(self):
+        """ 使全部会话失效, 之后的请求被重定向到登录页 """
+        with self._lock:
+            self._sessions.clear()
+
+    def _now(self) -> tuple[str, str]:
+        now = datetime.datetime.now()
+        return now.strftime('%Y%m%d'), now.strftime('%H%M%S')
+
+    def _submit(self, code: str, side: str, price: float, qty: int) -> dict:
+        date, t = self._now()
+        order_id = self._next_id
+        self._next_id += 1
+        filled = random.random() < self.config.fill_prob
+        order = {
+            'Zqdm': code, 'Zqmc': code, 'Wtbh': str(order_id), 'Wtsl': str(qty), 'Cdsl': '0',
+            'Cjsl': str(qty if filled else 0), 'Wtjg': f'{price:.2f}',
+            'Cjje': f'{price * qty if filled else 0:.2f}', 'Wtzt': '已成' if filled else '已报',
+            'Mmlb': side, 'Bpsj': t, 'Wtrq': date, 'Wtsj': t, 'Dwc': f'{date}|{order_id}',
+        }
+        self._orders[order_id] = order
+        if filled:
+            self._trades.append({
+                'Zqdm': code, 'Zqmc': code, 'Wtbh': str(order_id), 'Cjbh': str(len(self._trades) + 1),
+                'Mmlb': side, 'Cjsl': str(qty), 'Cjjg': f'{price:.2f}', 'Cjje': f'{price * qty:.2f}',
+                'Cjrq': date, 'Cjsj': t, 'Dwc': f'{date}|{len(self._trades) + 1}',
+            })
+        return order
+
+    def _revoke(self, code: str) -> str:
+        try:
+            order_id = int(code.split('_')[-1])
+        except ValueError:
+            return f'{code}: 撤单失败, 委托编号错误'
+        order = self._orders.get(order_id)
+        if order is None:
+            return f'{code}: 撤单失败, 委托不存在'
+        if order['Wtzt'] not in ('已报', '部成'):
+            return f'{code}: 撤单失败, 委托已{order["Wtzt"][-1]}'
+        order['Wtzt'] = '已撤'
+        order['Cdsl'] = str(int(order['Wtsl']) - int(order['Cjsl']))
+        return f'{code}: 撤单委托已提交'
+
+    @staticmethod
+    def _page(rows: list[dict], form: dict) -> list[dict]:
+        count = int(form.get('qqhs', 100) or 100)
+        dwc = form.get('dwc', '')
+        start = 0
+        if dwc:
+            start = next((i + 1 for i, r in enumerate(rows) if r.get('Dwc') == dwc), len(rows))
+        return rows[start:start + count]
+
+    def _asset(self) -> dict:
+        return {
+            'Zzc': '1000000.00', 'Zxsz': '0.00', 'Kyzj': '1000000.00', 'Ljyk': '0.00', 'Zjye': '1000000.00',
+            'Kqzj': '1000000.00', 'Dryk': '0.00', 'Djzj': '0.00',
+            'positions': [{
+                'Zqdm': '000001', 'Zqmc': '平安银行', 'Zqsl': '1000', 'Kysl': '1000', 'Djsl': '0',
+                'Cbjg': '10.00', 'Zxjg': '10.00', 'Ykbl': '0.00', 'Ljyk': '0.00', 'Zxsz': '10000.00',
+            }],
+        }
+
+    def _snapshot(self, code: str, market: str) -> dict:
+        price = self.config.prices.get(code, 10.0)
+        return {
+            'code': code, 'name': code, 'status': 0,
+            'topprice': f'{price * 1.1:.2f}', 'bottomprice': f'{price * 0.9:.2f}',
+            'realtimequote': {
+                'open': f'{price:.2f}', 'high': f'{price:.2f}', 'low': f'{price:.2f}',
+                'currentPrice': f'{price:.2f}', 'volume': '100', 'amount': f'{price * 100:.2f}',
+                'time': datetime.datetime.now().strftime('%H:%M:%S'),
+            },
+        }
+
+    def handle(self, method: str, path: str, query: dict, form: dict, cookie: str) -> tuple[int, dict, bytes]:
+        """ 处理请求, 返回 (状态码, 响应头, 响应内容) """
+        cfg = self.config
+        self.requests += 1
+        delay = cfg.latency + (random.random() * cfg.jitter if cfg.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if cfg.error_rate and random.random() < cfg.error_rate:
+            return 500, {}, b'injected error'
+
+        if path == '/api/SHSZQuoteSnapshot':
+            return self._json(self._snapshot(query.get('id', ''), query.get('market', '')))
+        if path == '/Login/YZM':
+            return 200, {'Content-Type': 'image/jpeg'}, cfg.captcha_code.encode()
+        if path == '/Login/Authentication':
+            if form.get('identifyCode') != cfg.captcha_code:
+                return self._json({'Status': -1, 'Message': '验证码错误', 'Data': []})
+            session = f'mock{random.getrandbits(64):x}'
+            with self._lock:
+                self._sessions.add(session)
+            body = {'Status': 0, 'Message': '', 'Data': [{'khmc': 'mock', 'Date': self._now()[0]}]}
+            return self._json(body, {'Set-Cookie': f'mock_session={session}; Path=/'})
+
+        if path == '/Login':
+            return 200, {'Content-Type': 'text/html'}, b'<html>login</html>'
+        with self._lock:
+            logged_in = cookie in self._sessions
+        if not logged_in:
+            return 302, {'Location': '/Login?el=1'}, b''
+        if path == '/Trade/Buy':
+            html = f'<input id="em_validatekey" type="hidden" value="{cfg.validatekey}" />'
+            return 200, {'Content-Type': 'text/html'}, html.encode()
+        if query.get('validatekey') != cfg.validatekey:
+            return 302, {'Location': '/Login?el=1'}, b''
+
+        with self._lock:
+            if path == '/Com/queryAssetAndPositionV1':
+                return self._json({'Status': 0, 'Data': [self._asset()]})
+            if path in ('/Search/GetOrdersData', '/Search/GetHisOrdersData'):
+                return self._json({'Status': 0, 'Data': self._page(list(self._orders.values()), form)})
+            if path in ('/Search/GetDealData', '/Search/GetHisDealData'):
+                return self._json({'Status': 0, 'Data': self._page(self._trades, form)})
+            if path in ('/Search/GetFundsFlow', '/Search/GetStockList'):
+                return self._json({'Status': 0, 'Data': []})
+            if path == '/Trade/SubmitTradeV2':
+                order = self._submit(form['stockCode'], form['tradeType'], float(form['price']), int(form['amount']))
+                return self._json({'Status': 0, 'Data': [{'Wtbh': order['Wtbh']}]})
+            if path == '/Trade/RevokeOrders':
+                lines = [self._revoke(i) for i in form.get('revokes', '').split(',') if i]
+                return 200, {'Content-Type': 'text/plain; charset=utf-8'}, '\r\n'.join(lines).encode()
+        return 404, {}, b'not found'
+
+    @staticmethod
+    def _json(body: dict, headers: Optional[dict] = None) -> tuple[int, dict, bytes]:
+        h = {'Content-Type': 'application/json; charset=utf-8'}
+        h.update(headers or {})
+        return 200, h, json.dumps(body, ensure_ascii=False).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写入, 不关闭 Nagle 会叠加客户端的 delayed ACK(约 40ms)
+    disable_nagle_algorithm = True
+    broker: MockBroker
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        form = {}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        cookie = ''
+        for i in (self.headers.get('Cookie') or '').split(';'):
+            k, _, v = i.strip().partition('=')
+            if k == 'mock_session':
+                cookie = v
+        status, headers, body = self.broker.handle(method, url.path, query, form, cookie)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class MockBrokerServer:
+    """ 在后台线程运行的模拟服务 """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.broker = MockBroker(config)
+        handler = type('Handler', (_Handler,), {'broker': self.broker})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def snapshot_url(self) -> str:
+        return f'{self.base_url}/api/SHSZQuoteSnapshot'
+
+    def start(self) -> 'MockBrokerServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock_broker', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    server = MockBrokerServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
+    print(f'mock broker listening on {server.base_url}')
+    server._server.serve_forever()
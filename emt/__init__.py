@@ -1,3 +1,62 @@
-from .emt_trade_impl import EMTTrade
-from .types import Direction, InstrumentID, MarketType
-from .utils import get_last_price
+""" emt
+
+子模块按需加载: ``import emt`` 不会导入 requests, numpy, cryptography, ddddocr 等依赖, 也不会创建日志文件,
+首次访问 ``emt.EMTTrade`` 等属性时才导入对应模块. 需要文件日志时调用 ``emt.setup_logging()``.
+"""
+import importlib
+
+from typing import TYPE_CHECKING
+
+# 属性名 -> 所在子模块
+_lazy_attrs = {
+    'EMTTrade': '.emt_trade_impl',
+    'PageQueryError': '.emt_trade_impl',
+    'AsyncEMTTrade': '.emt_trade_async',
+    'OrderTracker': '.order_tracker',
+    'OrderManager': '.order_manager',
+    'AccountCache': '.account_cache',
+    'PreTradeRisk': '.risk',
+    'RiskReject': '.risk',
+    'QuoteStream': '.quote_stream',
+    'TickRecorder': '.tick_store',
+    'TickReader': '.tick_store',
+    'TickReplay': '.tick_store',
+    'PaperTrade': '.paper_trade',
+    'Direction': '.types',
+    'InstrumentID': '.types',
+    'MarketType': '.types',
+    'Order': '.types',
+    'get_last_price': '.utils',
+    'get_last_prices': '.utils',
+    'setup_logging': '.log',
+}
+
+__all__ = list(_lazy_attrs)
+
+if TYPE_CHECKING:
+    from .emt_trade_impl import EMTTrade, PageQueryError
+    from .emt_trade_async import AsyncEMTTrade
+    from .order_tracker import OrderTracker
+    from .order_manager import OrderManager
+    from .account_cache import AccountCache
+    from .risk import PreTradeRisk, RiskReject
+    from .quote_stream import QuoteStream
+    from .tick_store import TickRecorder, TickReader, TickReplay
+    from .paper_trade import PaperTrade
+    from .types import Direction, InstrumentID, MarketType, Order
+    from .utils import get_last_price, get_last_prices
+    from .log import setup_logging
+
+
+def __getattr__(name: str):
+    module = _lazy_attrs.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # 缓存到模块属性, 之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,289 @@
+import copy
+import math
+import time
+import threading
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+from .log import logger
+from .emt_trade_impl import EMTTrade
+from .types import Account, Asset, Position, Order, OrderStatus, Direction
+
+
+@dataclass
+class Discrepancy:
+    # 资产字段为空字符串, 持仓字段为股票代码
+    symbol_code: str
+    field: str
+    local: float
+    remote: float
+
+
+DiscrepancyCallback = Callable[[list[Discrepancy]], None]
+
+# 本地推算并在同步时核对的字段
+_asset_fields = ('available_funds', 'frozen_funds', 'account_balance')
+_position_fields = ('hold_qty', 'free_qty', 'frozen_qty')
+
+
+class AccountCache:
+    """ 本地账户视图
+
+    以最近一次 query_asset_and_position 的结果为基准, 在本地应用下单, 成交和撤单对资金和持仓的影响:
+
+    - 买入下单冻结 price * qty 资金; 成交时按成交金额扣减资金余额并增加持仓(当日买入不可卖); 撤单解冻剩余资金
+    - 卖出下单冻结可用数量; 成交时减少持仓并增加可用资金; 撤单解冻剩余数量
+
+    本地推算不含手续费, 资金会有少量偏差. 按 sync_interval 定期, 或本地数据出现负数(漂移)时与服务端重新同步,
+    同步时对比推算值和服务端数据, 超出容差的字段记录日志并回调 on_discrepancy.
+
+    配合 OrderManager 使用时调用 attach, 订单变化会自动应用到本地视图; 也可以直接调用 on_order.
+    """
+
+    def __init__(
+        self,
+        api: EMTTrade,
+        sync_interval: float = 30,
+        funds_tolerance: float = 10.0,
+        on_discrepancy: Optional[DiscrepancyCallback] = None
+    ):
+        """
+        :param api: 已登录的 EMTTrade
+        :param sync_interval: 与服务端同步的间隔(秒), <= 0 时只在漂移或手动调用 sync 时同步
+        :param funds_tolerance: 同步时资金差异的容差(元), 用于忽略手续费造成的偏差
+        :param on_discrepancy: 同步时发现差异的回调
+        """
+        self._api = api
+        self._sync_interval = sync_interval
+        self._funds_tolerance = funds_tolerance
+        self._callbacks: list[DiscrepancyCallback] = [on_discrepancy] if on_discrepancy else []
+        self._lock = threading.RLock()
+        self._account: Optional[Account] = None
+        self._positions: dict[str, Position] = {}
+        # 已应用到本地视图的订单进度, {order_id: (成交数量, 成交金额, 撤单数量)}
+        self._applied: dict[int, tuple[int, float, int]] = {}
+        self._manager = None
+        self._synced_at: float = 0
+        self._drift = False
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def asset(self) -> Optional[Asset]:
+        with self._lock:
+            return copy.copy(self._account.asset) if self._account else None
+
+    @property
+    def positions(self) -> list[Position]:
+        with self._lock:
+            return [copy.copy(i) for i in self._positions.values() if i.hold_qty > 0 or i.frozen_qty > 0]
+
+    @property
+    def account(self) -> Optional[Account]:
+        with self._lock:
+            if self._account is None:
+                return None
+            return Account(copy.copy(self._account.asset), self.positions)
+
+    @property
+    def synced_at(self) -> float:
+        """ 最近一次同步的时间(unix 时间戳) """
+        return self._synced_at
+
+    def position(self, symbol_code: str) -> Optional[Position]:
+        with self._lock:
+            pos = self._positions.get(symbol_code)
+            return copy.copy(pos) if pos is not None else None
+
+    def subscribe(self, callback: DiscrepancyCallback):
+        self._callbacks.append(callback)
+
+    def attach(self, manager):
+        """ 订阅 OrderManager 的订单变化, 并以其当前订单作为同步基准 """
+        self._manager = manager
+        manager.subscribe(on_order=self.on_order)
+        with self._lock:
+            self._applied = self._baseline()
+
+    def _orders(self) -> list[Order]:
+        return list(self._manager.orders.values()) if self._manager is not None else []
+
+    def _baseline(self) -> dict[int, tuple[int, float, int]]:
+        # 服务端快照已包含现有订单的影响, 之后只应用增量
+        ret = dict(self._applied)
+        for order in self._orders():
+            ret[order.order_id] = (order.traded_qty, order.traded_amount, order.canceled_qty)
+        return ret
+
+    def sync(self) -> bool:
+        """ 从服务端同步资金和持仓, 返回是否成功
+
+        请求期间不持有锁, 订单回调和下单前检查不会被阻塞. 请求期间观察到的订单变化都来自服务端,
+        视为已包含在返回的快照中, 不再重复应用, 否则同一笔委托会被冻结两次;
+        个别在快照之后才到达服务端的变化在下一次同步时按差异修正.
+        """
+        self._api.query_asset_and_position()
+        remote = self._api.account
+        if remote is None:
+            return False
+        with self._lock:
+            discrepancies = self._diff(remote) if self._account is not None else []
+            self._account = copy.deepcopy(remote)
+            self._positions = {i.symbol_code: i for i in self._account.positions}
+            self._applied = self._baseline()
+            self._synced_at = time.time()
+            self._drift = False
+
+        if discrepancies:
+            logger.warning("account cache found discrepancies: %s", discrepancies)
+            for callback in self._callbacks:
+                try:
+                    callback(discrepancies)
+                except Exception as e:
+                    logger.error("account cache discrepancy callback found exception: [%s]", e)
+        return True
+
+    def _diff(self, remote: Account) -> list[Discrepancy]:
+        ret = []
+        for name in _asset_fields:
+            local, value = getattr(self._account.asset, name), getattr(remote.asset, name)
+            if abs(local - value) > self._funds_tolerance:
+                ret.append(Discrepancy('', name, local, value))
+        empty = Position('', '', 0, 0, 0, .0, .0, .0, .0, .0)
+        remote_positions = {i.symbol_code: i for i in remote.positions}
+        for code in self._positions.keys() | remote_positions.keys():
+            local, pos = self._positions.get(code, empty), remote_positions.get(code, empty)
+            for name in _position_fields:
+                if getattr(local, name) != getattr(pos, name):
+                    ret.append(Discrepancy(code, name, getattr(local, name), getattr(pos, name)))
+        return ret
+
+    def needs_sync(self) -> bool:
+        """ 是否到达同步间隔或本地数据已漂移 """
+        if self._account is None or self._drift:
+            return True
+        return 0 < self._sync_interval <= time.time() - self._synced_at
+
+    def maybe_sync(self) -> bool:
+        """ 需要时同步, 返回本地视图是否可用 """
+        if self.needs_sync():
+            return self.sync()
+        return True
+
+    def _position(self, symbol_code: str) -> Position:
+        pos = self._positions.get(symbol_code)
+        if pos is None:
+            pos = self._positions[symbol_code] = Position(symbol_code, '', 0, 0, 0, .0, .0, .0, .0, .0)
+        return pos
+
+    def on_order(self, order: Order):
+        """ 应用订单的增量变化(新订单, 成交, 撤单) """
+        with self._lock:
+            if self._account is not None:
+                self._apply(order)
+
+    def _apply(self, order: Order):
+        applied = self._applied.get(order.order_id)
+        if applied is None:
+            applied = (0, .0, 0)
+            self._apply_insert(order)
+        traded_qty, traded_amount, canceled_qty = applied
+        if order.traded_qty > traded_qty:
+            self._apply_trade(order, order.traded_qty - traded_qty, order.traded_amount - traded_amount)
+        released = order.canceled_qty - canceled_qty
+        if order.status == OrderStatus.REJECTED:
+            # 废单的剩余数量全部解冻
+            released = order.qty - order.traded_qty - canceled_qty
+        if released > 0:
+            self._apply_release(order, released)
+        self._applied[order.order_id] = (
+            max(order.traded_qty, traded_qty), max(order.traded_amount, traded_amount), canceled_qty + max(released, 0)
+        )
+        self._check_drift()
+
+    def _apply_insert(self, order: Order):
+        asset = self._account.asset
+        if order.side == Direction.Buy:
+            amount = order.price * order.qty
+            asset.available_funds -= amount
+            asset.frozen_funds += amount
+        else:
+            pos = self._position(order.symbol_code)
+            pos.free_qty -= order.qty
+            pos.frozen_qty += order.qty
+
+    def _apply_trade(self, order: Order, qty: int, amount: float):
+        asset = self._account.asset
+        pos = self._position(order.symbol_code)
+        if order.side == Direction.Buy:
+            frozen = order.price * qty
+            asset.frozen_funds -= frozen
+            asset.available_funds += frozen - amount
+            asset.account_balance -= amount
+            pos.price = (pos.price * pos.hold_qty + amount) / (pos.hold_qty + qty)
+            pos.hold_qty += qty
+        else:
+            asset.available_funds += amount
+            asset.account_balance += amount
+            pos.frozen_qty -= qty
+            pos.hold_qty -= qty
+
+    def _apply_release(self, order: Order, qty: int):
+        if order.side == Direction.Buy:
+            amount = order.price * qty
+            self._account.asset.frozen_funds -= amount
+            self._account.asset.available_funds += amount
+        else:
+            pos = self._position(order.symbol_code)
+            pos.frozen_qty -= qty
+            pos.free_qty += qty
+
+    def _check_drift(self):
+        asset = self._account.asset
+        if asset.available_funds < -self._funds_tolerance or asset.frozen_funds < -self._funds_tolerance \
+                or any(i.free_qty < 0 or i.frozen_qty < 0 or i.hold_qty < 0 for i in self._positions.values()):
+            if not self._drift:
+                logger.warning("account cache drifted, asset=%s", asset)
+            self._drift = True
+
+    def can_buy(self, price: float, qty: int) -> bool:
+        """ 可用资金是否足够买入, 不发起请求 """
+        with self._lock:
+            return self._account is not None and price * qty <= self._account.asset.available_funds
+
+    def can_sell(self, symbol_code: str, qty: int) -> bool:
+        """ 可用数量是否足够卖出, 不发起请求 """
+        with self._lock:
+            pos = self._positions.get(symbol_code)
+            return pos is not None and qty <= pos.free_qty
+
+    def max_buy_qty(self, price: float, lot_size: int = 100) -> int:
+        """ 按可用资金可以买入的最大数量(整手) """
+        with self._lock:
+            if self._account is None or price <= 0 or math.isnan(price):
+                return 0
+            lots = int(self._account.asset.available_funds // (price * lot_size))
+            return max(lots, 0) * lot_size
+
+    def start(self):
+        """ 启动后台同步线程 """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='emt_account_cache', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # 未配置同步间隔时仍需要及时处理漂移
+        interval = min(self._sync_interval, 1.0) if self._sync_interval > 0 else 1.0
+        while not self._stopped.wait(interval):
+            try:
+                self.maybe_sync()
+            except Exception as e:
+                logger.error("account cache sync found exception: [%s]", e)
@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Callable, Any
+from .log import logger
+from .captcha import CaptchaSolver
+from .emt_trade_impl import EMTTrade
+from .emt_trade_encrypt import encrypt_password
+from .types import Asset, Position, OrderInfo, Direction, InstrumentID
+
+
+@dataclass
+class AccountConfig:
+    username: str
+    password: str
+    # 在线时长(分钟)
+    duration: int = 30
+
+
+class AccountPool:
+    """ 多账户交易池
+
+    每个账户一个 EMTTrade 会话, 在线程池中并发登录/查询/下单, 所有账户共享一个验证码识别模型.
+    precompute_password 为 True 时每个账户的密码只加密一次, 之后的登录直接使用加密后的密码.
+    批量接口返回 {username: 结果}, 单个账户的异常只记录日志, 结果为 None.
+    """
+
+    def __init__(
+        self,
+        accounts: list[AccountConfig],
+        max_workers: int = 8,
+        pool_size: int = 4,
+        captcha_solver: Optional[CaptchaSolver] = None,
+        precompute_password: bool = True
+    ):
+        """
+        :param accounts: 账户列表
+        :param max_workers: 并发处理的账户数
+        :param pool_size: 每个账户的连接池大小
+        :param captcha_solver: 所有账户共享的验证码识别器, 为空时新建
+        :param precompute_password: 是否缓存各账户加密后的密码
+        """
+        self._accounts: dict[str, AccountConfig] = {i.username: i for i in accounts}
+        self._captcha_solver = captcha_solver if captcha_solver is not None else CaptchaSolver()
+        self._traders: dict[str, EMTTrade] = {
+            i: EMTTrade(pool_size=pool_size, captcha_solver=self._captcha_solver) for i in self._accounts
+        }
+        self._precompute_password = precompute_password
+        # username -> (明文密码, 加密后的密码), 明文变化时重新加密
+        self._encrypted_passwords: dict[str, tuple[str, str]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix='emt_pool')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    @property
+    def captcha_solver(self) -> CaptchaSolver:
+        return self._captcha_solver
+
+    @property
+    def traders(self) -> dict[str, EMTTrade]:
+        return self._traders
+
+    def __getitem__(self, username: str) -> EMTTrade:
+        return self._traders[username]
+
+    def map(self, func: Callable[[str, EMTTrade], Any], usernames: Optional[list[str]] = None) -> dict[str, Any]:
+        """ 对每个账户并发执行 func(username, trade)
+
+        :param func: 执行函数
+        :param usernames: 指定账户, 为空时为全部账户
+        :return: {username: 返回值}, 异常时为 None
+        """
+        usernames = list(self._traders) if usernames is None else usernames
+        # 账户在任务中查找, 未知账户与其他异常一样只影响该账户的结果
+        futures = {i: self._executor.submit(lambda u: func(u, self._traders[u]), i) for i in usernames}
+        ret = {}
+        for username, future in futures.items():
+            try:
+                ret[username] = future.result()
+            except Exception as e:
+                logger.error("account [%s] found exception: [%s]", username, e)
+                ret[username] = None
+        return ret
+
+    def _encrypted_password(self, cfg: AccountConfig) -> str:
+        cached = self._encrypted_passwords.get(cfg.username)
+        if cached is None or cached[0] != cfg.password:
+            cached = self._encrypted_passwords[cfg.username] = (cfg.password, encrypt_password(cfg.password.strip()))
+        return cached[1]
+
+    def login(self) -> dict[str, bool]:
+        """ 登录全部账户, 返回各账户是否登录成功 """
+        self._captcha_solver.warm_up()
+        encrypted = {}
+        if self._precompute_password:
+            encrypted = {i: self._encrypted_password(cfg) for i, cfg in self._accounts.items()}
+
+        def _login(username: str, trade: EMTTrade) -> bool:
+            cfg = self._accounts[username]
+            if username in encrypted:
+                resp = trade.login(cfg.username, encrypted[username], cfg.duration, encrypted=True)
+            else:
+                resp = trade.login(cfg.username, cfg.password, cfg.duration)
+            return resp is not None and resp.is_ok()
+        return self.map(_login)
+
+    def query_asset(self) -> dict[str, Optional[Asset]]:
+        return self.map(lambda _, trade: trade.query_asset())
+
+    def query_position(self) -> dict[str, Optional[list[Position]]]:
+        return self.map(lambda _, trade: trade.query_position())
+
+    def query_orders(self) -> dict[str, Optional[list[OrderInfo]]]:
+        return self.map(lambda _, trade: trade.query_orders())
+
+    def insert_order(
+        self,
+        orders: dict[str, list[tuple[InstrumentID, Direction, float, int]]]
+    ) -> dict[str, Optional[list[Optional[OrderInfo]]]]:
+        """ 多账户下单
+
+        :param orders: {username: [(ins_id, side, price, qty), ...]}
+        :return: {username: [OrderInfo, ...]}, 与各账户的委托顺序一一对应
+        """
+        return self.map(lambda username, trade: trade.insert_orders(orders[username]), list(orders))
+
+    def cancel_alive_orders(self) -> dict[str, Optional[dict[str, bool]]]:
+        """ 撤销全部账户的未完结委托, 返回 {username: {撤单代码: 是否成功}} """
+        return self.map(lambda _, trade: trade.cancel_orders(trade.query_orders() or []))
@@ -0,0 +1,164 @@
+import io
+import random
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Callable, Any
+from .log import logger
+from .metrics import Histogram
+
+# OCR 常见的字母/数字混淆
+_digit_confusions = str.maketrans({
+    'o': '0', 'O': '0', 'D': '0', 'Q': '0',
+    'i': '1', 'l': '1', 'I': '1', '|': '1',
+    'z': '2', 'Z': '2',
+    's': '5', 'S': '5',
+    'b': '6', 'G': '6',
+    'T': '7',
+    'B': '8',
+    'g': '9', 'q': '9',
+})
+
+
+class CaptchaSolver:
+    """ 验证码识别
+
+    - 验证码图片只在内存中处理
+    - OCR 模型按需加载(或调用 warm_up 预热), 多个 EMTTrade 可共享同一个实例
+    - 识别结果限定为数字, 长度不符的结果视为不可信并重新获取
+    - 每轮并发获取 candidates 张验证码, 取第一个可信结果, 总获取次数不超过 max_attempts
+    - 记录识别耗时和登录反馈的准确率
+
+    注意: 若服务端每个会话只保留最后一张验证码, 并发获取的较早结果会失效, 此时应保持 candidates=1.
+    """
+
+    def __init__(
+        self,
+        ocr: Optional[Any] = None,
+        candidates: int = 1,
+        max_attempts: int = 5,
+        code_length: int = 4,
+        save_path: Optional[str] = None
+    ):
+        """
+        :param ocr: 识别模型(需提供 classification 方法), 为空时按需创建 DdddOcr
+        :param candidates: 每轮并发获取的验证码数量
+        :param max_attempts: 单次识别最多获取的验证码数量
+        :param code_length: 验证码位数, <= 0 时不校验长度
+        :param save_path: 调试用, 保存最后一张验证码图片的路径
+        """
+        self._ocr = ocr
+        self._candidates = max(candidates, 1)
+        self._max_attempts = max(max_attempts, 1)
+        self._code_length = code_length
+        self._save_path = save_path
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latency = Histogram()
+        self._stats = {
+            'solve': 0,
+            'solved': 0,
+            'fetched': 0,
+            'fetch_fail': 0,
+            'rejected': 0,
+            'login_ok': 0,
+            'login_fail': 0,
+        }
+
+    def _get_ocr(self) -> Any:
+        if self._ocr is None:
+            from ddddocr import DdddOcr
+            ocr = DdddOcr(show_ad=False)
+            if hasattr(ocr, 'set_ranges'):
+                # 只输出数字
+                ocr.set_ranges(0)
+            self._ocr = ocr
+        return self._ocr
+
+    def warm_up(self):
+        """ 加载模型并完成一次推理, 避免首次登录时承担模型初始化的耗时 """
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.new('RGB', (80, 30), 'white').save(buf, format='PNG')
+        self.classify(buf.getvalue())
+
+    def classify(self, img: bytes) -> str:
+        """ 识别图片, 返回原始识别结果 """
+        with self._lock:
+            return self._get_ocr().classification(img)
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def decode(self, img: bytes) -> Optional[str]:
+        """ 识别验证码, 结果不可信时返回 None """
+        text = self.classify(img)
+        code = ''.join(i for i in (text or '').translate(_digit_confusions) if i.isdigit())
+        if not code or (self._code_length > 0 and len(code) != self._code_length):
+            logger.debug("captcha rejected, ocr result=%s", text)
+            self._count('rejected')
+            return None
+        return code
+
+    def _candidate(self, fetch: Callable[[float], Optional[bytes]]) -> Optional[tuple[float, str]]:
+        random_num = random.random()
+        img = fetch(random_num)
+        if not img:
+            self._count('fetch_fail')
+            return None
+        self._count('fetched')
+        if self._save_path:
+            with open(self._save_path, 'wb') as f:
+                f.write(img)
+        code = self.decode(img)
+        return None if code is None else (random_num, code)
+
+    def solve(self, fetch: Callable[[float], Optional[bytes]]) -> Optional[tuple[float, str]]:
+        """ 获取并识别验证码
+
+        :param fetch: fetch(random_num) 返回验证码图片内容, 失败时返回 None
+        :return: (random_num, 验证码), 超出尝试次数时返回 None
+        """
+        start = time.perf_counter()
+        self._count('solve')
+        try:
+            remaining = self._max_attempts
+            while remaining > 0:
+                n = min(self._candidates, remaining)
+                remaining -= n
+                if n == 1:
+                    ret = self._candidate(fetch)
+                    if ret is not None:
+                        self._count('solved')
+                        return ret
+                    continue
+                executor = ThreadPoolExecutor(max_workers=n, thread_name_prefix='emt_captcha')
+                try:
+                    futures = [executor.submit(self._candidate, fetch) for _ in range(n)]
+                    for future in as_completed(futures):
+                        ret = future.result()
+                        if ret is not None:
+                            self._count('solved')
+                            return ret
+                finally:
+                    # 不等待其余候选, 第一个可信结果立即返回
+                    executor.shutdown(wait=False, cancel_futures=True)
+            logger.error("solve captcha fail after %d attempts", self._max_attempts)
+            return None
+        finally:
+            self._latency.record((time.perf_counter() - start) * 1e6)
+
+    def report(self, ok: bool):
+        """ 登录结果反馈, 用于统计识别准确率 """
+        self._count('login_ok' if ok else 'login_fail')
+
+    def stats(self) -> dict:
+        """ 识别统计, latency_us 为单次 solve 的耗时分布(微秒) """
+        with self._stats_lock:
+            ret = dict(self._stats)
+        feedback = ret['login_ok'] + ret['login_fail']
+        ret['accuracy'] = ret['login_ok'] / feedback if feedback else float('nan')
+        ret['latency_us'] = self._latency.snapshot()
+        return ret
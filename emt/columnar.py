@@ -0,0 +1,148 @@
+""" 列式反序列化
+
+将整页 Response.data 一次性转换为 NumPy 结构化数组, 用于大批量订单/持仓/成交数据的统计和对账,
+时间字段按固定格式做整数运算解析, 不使用 strptime.
+"""
+import datetime
+
+import numpy as np
+
+from .types import OrderStatus, Direction, order_status_parser
+
+order_dtype = np.dtype([
+    ('symbol_code', 'U8'),
+    ('order_id', 'i8'),
+    ('insert_qty', 'i8'),
+    ('canceled_qty', 'i8'),
+    ('trade_qty', 'i8'),
+    ('insert_price', 'f8'),
+    ('trade_price', 'f8'),
+    ('status', 'i1'),
+    ('side', 'i1'),
+    # 报盘时间, 当日秒数
+    ('quotation_time', 'i4'),
+    ('insert_time', 'M8[s]'),
+])
+
+position_dtype = np.dtype([
+    ('symbol_code', 'U8'),
+    ('symbol_name', 'U16'),
+    ('hold_qty', 'i8'),
+    ('free_qty', 'i8'),
+    ('frozen_qty', 'i8'),
+    ('price', 'f8'),
+    ('last_price', 'f8'),
+    ('float_ratio', 'f8'),
+    ('float_pnl', 'f8'),
+    ('last_market_value', 'f8'),
+])
+
+trade_dtype = np.dtype([
+    ('symbol_code', 'U8'),
+    ('order_id', 'i8'),
+    ('trade_id', 'U32'),
+    ('side', 'i1'),
+    ('trade_qty', 'i8'),
+    ('trade_price', 'f8'),
+    ('trade_amount', 'f8'),
+    ('trade_time', 'M8[s]'),
+])
+
+
+def _str_column(rows: list[dict], key: str) -> np.ndarray:
+    return np.char.strip(np.array([r[key] for r in rows], dtype=str))
+
+
+def _num_column(rows: list[dict], key: str, dtype) -> np.ndarray:
+    col = _str_column(rows, key)
+    col[col == ''] = '0'
+    return col.astype(dtype)
+
+
+def _seconds_of_day(hhmmss: np.ndarray) -> np.ndarray:
+    """ HHMMSS 整数 -> 当日秒数 """
+    return hhmmss // 10000 * 3600 + hhmmss // 100 % 100 * 60 + hhmmss % 100
+
+
+def _to_datetime64(yyyymmdd: np.ndarray, hhmmss: np.ndarray) -> np.ndarray:
+    """ YYYYMMDD, HHMMSS 整数 -> datetime64[s] """
+    months = (yyyymmdd // 10000 - 1970) * 12 + yyyymmdd // 100 % 100 - 1
+    days = months.astype('M8[M]').astype('M8[D]') + (yyyymmdd % 100 - 1).astype('m8[D]')
+    return days.astype('M8[s]') + _seconds_of_day(hhmmss).astype('m8[s]')
+
+
+def _status_column(rows: list[dict]) -> np.ndarray:
+    values, inverse = np.unique(_str_column(rows, 'Wtzt'), return_inverse=True)
+    codes = np.array([order_status_parser(str(v)) for v in values], dtype='i1')
+    return codes[inverse]
+
+
+def _side_column(rows: list[dict]) -> np.ndarray:
+    return np.where(_str_column(rows, 'Mmlb') == 'B', Direction.Buy, Direction.Sell).astype('i1')
+
+
+def orders_to_array(rows: list[dict]) -> np.ndarray:
+    """ 报单数据行 -> order_dtype 结构化数组, 字段与 OrderInfo 对应 """
+    ret = np.empty(len(rows), dtype=order_dtype)
+    if not rows:
+        return ret
+    ret['symbol_code'] = _str_column(rows, 'Zqdm')
+    ret['order_id'] = _num_column(rows, 'Wtbh', np.int64)
+    ret['insert_qty'] = _num_column(rows, 'Wtsl', np.int64)
+    ret['canceled_qty'] = _num_column(rows, 'Cdsl', np.int64)
+    ret['trade_qty'] = _num_column(rows, 'Cjsl', np.int64)
+    ret['insert_price'] = _num_column(rows, 'Wtjg', np.float64)
+    ret['trade_price'] = _num_column(rows, 'Cjje', np.float64)
+    ret['status'] = _status_column(rows)
+    ret['side'] = _side_column(rows)
+    ret['quotation_time'] = _seconds_of_day(_num_column(rows, 'Bpsj', np.int64))
+    ret['insert_time'] = _to_datetime64(_num_column(rows, 'Wtrq', np.int64), _num_column(rows, 'Wtsj', np.int64))
+    return ret
+
+
+def positions_to_array(rows: list[dict]) -> np.ndarray:
+    """ 持仓数据行 -> position_dtype 结构化数组, 字段与 Position 对应 """
+    ret = np.empty(len(rows), dtype=position_dtype)
+    if not rows:
+        return ret
+    ret['symbol_code'] = _str_column(rows, 'Zqdm')
+    ret['symbol_name'] = _str_column(rows, 'Zqmc')
+    ret['hold_qty'] = _num_column(rows, 'Zqsl', np.int64)
+    ret['free_qty'] = _num_column(rows, 'Kysl', np.int64)
+    ret['frozen_qty'] = _num_column(rows, 'Djsl', np.int64)
+    ret['price'] = _num_column(rows, 'Cbjg', np.float64)
+    ret['last_price'] = _num_column(rows, 'Zxjg', np.float64)
+    ret['float_ratio'] = _num_column(rows, 'Ykbl', np.float64)
+    ret['float_pnl'] = _num_column(rows, 'Ljyk', np.float64)
+    ret['last_market_value'] = _num_column(rows, 'Zxsz', np.float64)
+    return ret
+
+
+def trades_to_array(rows: list[dict]) -> np.ndarray:
+    """ 成交数据行 -> trade_dtype 结构化数组
+
+    当日成交数据不含成交日期(Cjrq)时使用当天日期.
+    """
+    ret = np.empty(len(rows), dtype=trade_dtype)
+    if not rows:
+        return ret
+    ret['symbol_code'] = _str_column(rows, 'Zqdm')
+    ret['order_id'] = _num_column(rows, 'Wtbh', np.int64)
+    ret['trade_id'] = _str_column(rows, 'Cjbh')
+    ret['side'] = _side_column(rows)
+    ret['trade_qty'] = _num_column(rows, 'Cjsl', np.int64)
+    ret['trade_price'] = _num_column(rows, 'Cjjg', np.float64)
+    ret['trade_amount'] = _num_column(rows, 'Cjje', np.float64)
+    if 'Cjrq' in rows[0]:
+        dates = _num_column(rows, 'Cjrq', np.int64)
+    else:
+        dates = np.full(len(rows), int(datetime.date.today().strftime('%Y%m%d')), dtype=np.int64)
+    ret['trade_time'] = _to_datetime64(dates, _num_column(rows, 'Cjsj', np.int64))
+    return ret
+
+
+def alive_mask(orders: np.ndarray) -> np.ndarray:
+    """ 未完结订单掩码, 同 OrderInfo.is_alive """
+    return np.isin(orders['status'], [
+        OrderStatus.PART_TRADED, OrderStatus.INSERT_ACCEPTED, OrderStatus.INSERT_SUBMITTED
+    ])
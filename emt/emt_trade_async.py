@@ -0,0 +1,143 @@
+import asyncio
+import datetime
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Any, Iterator, AsyncIterator, Union
+from .emt_trade_impl import EMTTrade
+from .types import Response, Position, Asset, Account, \
+    OrderInfo, TradeInfo, Direction, InstrumentID
+from .utils import get_last_price
+
+
+class AsyncEMTTrade:
+    """ EMTTrade 的 asyncio 版本
+
+    所有请求都复用同一个 EMTTrade 的连接池(requests.Session), 在线程池中执行,
+    ``max_concurrency`` 同时限制在途请求数和连接池大小.
+    """
+
+    def __init__(self, max_concurrency: int = 16, trade: Optional[EMTTrade] = None):
+        """
+        :param max_concurrency: 最大在途请求数
+        :param trade: 复用已有的 EMTTrade 实例, 为空时新建
+        """
+        self._max_concurrency = max(max_concurrency, 1)
+        self._trade = trade if trade is not None else EMTTrade(pool_size=self._max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency, thread_name_prefix='emt_async')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    @property
+    def trade(self) -> EMTTrade:
+        """ 底层的同步 EMTTrade """
+        return self._trade
+
+    @property
+    def account(self) -> Account:
+        return self._trade.account
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def login(
+        self,
+        username: str,
+        password: str,
+        duration: int = 30,
+        encrypted: bool = False
+    ) -> Optional[Response]:
+        """ 登录, 参数同 EMTTrade.login """
+        return await self._run(self._trade.login, username, password, duration, encrypted)
+
+    async def query_asset_and_position(self):
+        await self._run(self._trade.query_asset_and_position)
+
+    async def query_asset(self) -> Asset:
+        return await self._run(self._trade.query_asset)
+
+    async def query_position(self) -> list[Position]:
+        return await self._run(self._trade.query_position)
+
+    async def query_orders(self) -> Optional[list[OrderInfo]]:
+        return await self._run(self._trade.query_orders)
+
+    async def insert_order(
+        self,
+        ins_id: InstrumentID,
+        side: Direction,
+        price: float,
+        qty: int
+    ) -> Optional[OrderInfo]:
+        return await self._run(self._trade.insert_order, ins_id, side, price, qty)
+
+    async def insert_orders(
+        self,
+        orders: list[tuple[InstrumentID, Direction, float, int]]
+    ) -> list[Optional[OrderInfo]]:
+        """ 并发下单, 返回结果与 orders 顺序一一对应
+
+        :param orders: (ins_id, side, price, qty) 列表
+        :return:
+        """
+        return list(await asyncio.gather(*(self.insert_order(*i) for i in orders)))
+
+    async def _iter_pages(self, pages: Iterator[list]) -> AsyncIterator:
+        """ 在线程池中逐页拉取同步分页迭代器, 逐条返回 """
+        end = object()
+        while True:
+            page = await self._run(next, pages, end)
+            if page is end:
+                return
+            for i in page:
+                yield i
+
+    def iter_trades(self, page_size: int = 1000) -> AsyncIterator[TradeInfo]:
+        """ 逐页查询当日成交 """
+        return self._iter_pages(self._trade._trade_pages(page_size))
+
+    def iter_history_orders(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> AsyncIterator[OrderInfo]:
+        """ 逐页查询历史报单, 参数同 EMTTrade.iter_history_orders """
+        return self._iter_pages(self._trade._history_order_pages(start_date, end_date, page_size))
+
+    def iter_history_trades(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> AsyncIterator[TradeInfo]:
+        """ 逐页查询历史成交, 参数同 EMTTrade.iter_history_trades """
+        return self._iter_pages(self._trade._history_trade_pages(start_date, end_date, page_size))
+
+    def iter_funds_flow(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> AsyncIterator[dict]:
+        """ 逐页查询资金流水, 参数同 EMTTrade.iter_funds_flow """
+        return self._iter_pages(self._trade._funds_flow_pages(start_date, end_date, page_size))
+
+    async def cancel_order(self, code: str) -> bool:
+        return await self._run(self._trade.cancel_order, code)
+
+    async def cancel_orders(self, orders: list[Union[OrderInfo, str]], batch_size: int = 50) -> dict[str, bool]:
+        """ 批量撤单, 参数同 EMTTrade.cancel_orders """
+        return await self._run(self._trade.cancel_orders, orders, batch_size)
+
+    async def get_last_price(self, symbol_code: str, market: str, max_age: float = 0) -> float:
+        """ 获取最新价, 与下单请求共享并发限制 """
+        return await self._run(get_last_price, symbol_code, market, max_age)
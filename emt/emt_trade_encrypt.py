@@ -1,7 +1,7 @@
 import base64
+import threading
 
-from cryptography.hazmat.primitives.asymmetric import padding, rsa
-from cryptography.hazmat.primitives import serialization
+from typing import Any
 
 rsa_public_key = '''
 -----BEGIN PUBLIC KEY-----
@@ -13,11 +13,33 @@ c0AT4qIJ/xtbBcHkFPK77upnsfDTJiVEuQDH+MiMeb+XhCLNKZGp0yaUU6GlxZdp
 '''
 
 
-class EMTradeEncrypt:
+# 解析后的公钥, 进程内所有 EMTradeEncrypt 共享, 第一次加密时加载, cryptography 也在那时才导入
+_pub_key: Any = None
+_pub_key_lock = threading.Lock()
+
+
+def load_public_key() -> Any:
+    """ 获取解析后的公钥, 只在第一次调用时解析 PEM, 线程安全 """
+    global _pub_key
+    if _pub_key is None:
+        with _pub_key_lock:
+            if _pub_key is None:
+                from cryptography.hazmat.primitives import serialization
+                _pub_key = serialization.load_pem_public_key(rsa_public_key.encode('utf-8'))
+    return _pub_key
+
 
-    def __init__(self):
-        self._pub_key: rsa.RSAPublicKey = serialization.load_pem_public_key(rsa_public_key.encode('utf-8'))
+def encrypt_password(password: str) -> str:
+    """ 加密登录密码(RSA PKCS1v15, base64)
+
+    每次调用的密文不同(随机填充), 但都可用于登录, 同一凭证可以只加密一次后重复使用.
+    """
+    from cryptography.hazmat.primitives.asymmetric import padding
+    encrypt_text = load_public_key().encrypt(password.encode(), padding.PKCS1v15())
+    return base64.b64encode(encrypt_text).decode('utf-8')
+
+
+class EMTradeEncrypt:
 
     def encrypt(self, content: str) -> str:
-        encrypt_text = self._pub_key.encrypt(content.encode(), padding.PKCS1v15())
-        return base64.b64encode(encrypt_text).decode('utf-8')
+        return encrypt_password(content)
@@ -1,47 +1,143 @@
+import contextlib
 import datetime
+import json
+import logging
+import os
 import re
-import random
+import time
+import threading
 import requests
 
-from typing import Optional, Any
-from ddddocr import DdddOcr
-from .log import logger
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from typing import Optional, Any, Callable, Iterator, Union
+from .log import logger, RequestJournal
 from .api import TradeApi
 from .emt_trade_encrypt import EMTradeEncrypt
+from .captcha import CaptchaSolver
+from .rate_limit import RateLimiter, Priority
+from .metrics import MetricsRegistry, TimedHTTPAdapter, metrics as default_metrics
 from .types import Response, response_deserialize, \
-    Position, position_deserialize, \
     Asset, Account, account_deserialize, \
     OrderInfo, order_deserialize, \
+    TradeInfo, trade_deserialize, \
     Direction, InstrumentID, MarketType, OrderStatus
 
 
+class PageQueryError(Exception):
+    """ 分页查询中某一页请求失败, 已返回的数据不完整 """
+
+    def __init__(self, tag: str, dwc: str):
+        super().__init__(f"use [{tag}] to query page fail, dwc={dwc}")
+        self.tag = tag
+        self.dwc = dwc
+
+
+def _date_range_data(
+    start_date: Optional[datetime.date],
+    end_date: Optional[datetime.date]
+) -> dict:
+    data = {}
+    if start_date is not None:
+        data['st'] = start_date.strftime('%Y-%m-%d')
+    if end_date is not None:
+        data['et'] = end_date.strftime('%Y-%m-%d')
+    return data
+
+
+def _in_date_range(
+    date: Optional[datetime.date],
+    start_date: Optional[datetime.date],
+    end_date: Optional[datetime.date]
+) -> bool:
+    if date is None:
+        return True
+    if start_date is not None and date < start_date:
+        return False
+    if end_date is not None and date > end_date:
+        return False
+    return True
+
+
+# 请求类型对应的限流优先级, 未列出的为 Priority.QUERY
+_tag_priority = {
+    'cancel_order': Priority.CANCEL,
+    'insert_order': Priority.INSERT,
+}
+
+
+# 撤单结果中表示失败的关键字
+_revoke_fail_words = ('失败', '错误', '不能', '不允许')
+
+
 class EMTTrade(TradeApi):
 
-    def __init__(self):
+    def __init__(
+        self,
+        pool_size: int = 10,
+        ocr: Optional[Any] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        captcha_solver: Optional[CaptchaSolver] = None,
+        base_url: str = 'https://jywg.18.cn',
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        """
+        :param pool_size: 连接池大小, 并发请求(如 AsyncEMTTrade)时应不小于最大并发数
+        :param ocr: 共享的验证码识别模型(需提供 classification 方法), 为空时按需创建 DdddOcr
+        :param metrics: 指标统计, 为空时使用全局的 emt.metrics.metrics
+        :param captcha_solver: 共享的验证码识别器, 优先于 ocr
+        :param base_url: 交易服务地址, 可指向本地模拟服务(见 benchmarks.mock_broker)
+        :param rate_limiter: 交易/查询请求的限流器(如 emt.rate_limit.RateLimiter(rate=10, burst=20)), 默认不限流
+        """
         super().__init__()
         self._emt_trade_encrypt = EMTradeEncrypt()
         self._em_validatekey: str = ''
+        self._base_url = base_url = base_url.rstrip('/')
         self._base_headers: dict = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) '
                           'Chrome/114.0.0.0 Safari/537.36',
-            'Origin': 'https://jywg.18.cn',
-            'Host': 'jywg.18.cn'
+            'Origin': base_url,
+            'Host': urlparse(base_url).netloc
         }
         self._account: Optional[Account] = None
         self._session: requests.Session = requests.Session()
-        self._ocr = DdddOcr(show_ad=False)
+        self._pool_size = max(pool_size, 1)
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._captcha_solver: CaptchaSolver = captcha_solver if captcha_solver is not None else CaptchaSolver(ocr)
+        self._username: str = ''
+        # 会话过期时间(unix 时间戳), 0 表示未登录
+        self._session_expires_at: float = 0
+        # 重新登录所需的 (用户名, 加密后的密码, 在线时长)
+        self._credentials: Optional[tuple[str, str, int]] = None
+        # 会话失效时是否自动重新登录并重试请求
+        self.auto_relogin: bool = True
+        # 重新登录期间其他线程的请求最多等待的时间(秒)
+        self.relogin_wait: float = 30
+        self._auth_lock = threading.RLock()
+        self._auth_owner: Optional[int] = None
+        self._session_ready = threading.Event()
+        self._session_ready.set()
+        # 交易/查询请求的限流器, 为 None 时不限流
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        # 下单前风控(emt.risk.PreTradeRisk), 设置后 insert_order / insert_orders 在请求前校验委托
+        self.risk: Optional[Any] = None
         self._orders = {}
+        self.metrics: MetricsRegistry = metrics if metrics is not None else default_metrics
+        # 请求流水, 配置后代替 DEBUG 日志中的完整响应内容
+        self.journal: Optional[RequestJournal] = None
         self._urls: dict = {
-            'login': 'https://jywg.18.cn/Login/Authentication?validatekey=',
-            'query_asset_and_pos': 'https://jywg.18.cn/Com/queryAssetAndPositionV1?validatekey=',
-            'query_orders': 'https://jywg.18.cn/Search/GetOrdersData?validatekey=',
-            'query_trades': 'https://jywg.18.cn/Search/GetDealData?validatekey=',
-            'query_his_orders': 'https://jywg.18.cn/Search/GetHisOrdersData?validatekey=',
-            'query_his_trades': 'https://jywg.18.cn/Search/GetHisDealData?validatekey=',
-            'query_funds_flow': 'https://jywg.18.cn/Search/GetFundsFlow?validatekey=',
-            'query_positions': 'https://jywg.18.cn/Search/GetStockList?validatekey=',
-            'insert_order': 'https://jywg.18.cn/Trade/SubmitTradeV2?validatekey=',
-            'cancel_order': 'https://jywg.18.cn/Trade/RevokeOrders?validatekey=',
+            'login': f'{base_url}/Login/Authentication?validatekey=',
+            'query_asset_and_pos': f'{base_url}/Com/queryAssetAndPositionV1?validatekey=',
+            'query_orders': f'{base_url}/Search/GetOrdersData?validatekey=',
+            'query_trades': f'{base_url}/Search/GetDealData?validatekey=',
+            'query_his_orders': f'{base_url}/Search/GetHisOrdersData?validatekey=',
+            'query_his_trades': f'{base_url}/Search/GetHisDealData?validatekey=',
+            'query_funds_flow': f'{base_url}/Search/GetFundsFlow?validatekey=',
+            'query_positions': f'{base_url}/Search/GetStockList?validatekey=',
+            'insert_order': f'{base_url}/Trade/SubmitTradeV2?validatekey=',
+            'cancel_order': f'{base_url}/Trade/RevokeOrders?validatekey=',
         }
 
     def query_asset(self) -> Asset:
@@ -49,8 +145,14 @@ class EMTTrade(TradeApi):
         self.query_asset_and_position()
         return self._account.asset
 
-    def query_position(self) -> list[Position]:
-        """ 请求查询投资者持仓 """
+    def query_position(self, columnar: bool = False):
+        """ 请求查询投资者持仓
+
+        :param columnar: 为 True 时返回 NumPy 结构化数组(见 emt.columnar.positions_to_array)
+        :return:
+        """
+        if columnar:
+            return self._query_position_array()
         self.query_asset_and_position()
         return self._account.positions
 
@@ -58,31 +160,131 @@ class EMTTrade(TradeApi):
     def account(self) -> Account:
         return self._account
 
+    @property
+    def captcha_solver(self) -> CaptchaSolver:
+        return self._captcha_solver
+
+    @property
+    def session_expires_at(self) -> float:
+        """ 会话过期时间(unix 时间戳), 未登录时为 0 """
+        return self._session_expires_at
+
+    def is_session_valid(self) -> bool:
+        """ 本地判断会话是否仍在有效期内 """
+        return bool(self._em_validatekey) and time.time() < self._session_expires_at
+
+    def dump_session(self) -> dict:
+        """ 导出可序列化的会话状态(cookies, em_validatekey, 过期时间) """
+        cookies = [
+            {
+                'name': c.name,
+                'value': c.value,
+                'domain': c.domain,
+                'path': c.path,
+                'expires': c.expires,
+                'secure': c.secure,
+            }
+            for c in self._session.cookies
+        ]
+        return {
+            'username': self._username,
+            'em_validatekey': self._em_validatekey,
+            'expires_at': self._session_expires_at,
+            'cookies': cookies,
+        }
+
+    def load_session(self, state: dict) -> bool:
+        """ 恢复 dump_session 导出的会话状态
+
+        :param state: 会话状态
+        :return: 会话是否仍在有效期内
+        """
+        self._session.cookies.clear()
+        for c in state.get('cookies', []):
+            self._session.cookies.set(
+                c['name'], c['value'],
+                domain=c.get('domain', ''), path=c.get('path', '/'),
+                expires=c.get('expires'), secure=c.get('secure', False)
+            )
+        self._username = state.get('username', '')
+        self._em_validatekey = state.get('em_validatekey', '')
+        self._session_expires_at = float(state.get('expires_at', 0))
+        return self.is_session_valid()
+
+    def save_session(self, path: str):
+        """ 将会话状态写入文件, 文件内容等同登录凭证, 仅当前用户可读写 """
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.dump_session(), f)
+
+    def restore_session(self, path: str, verify: bool = True) -> bool:
+        """ 从文件恢复会话, 用于进程重启后跳过验证码登录
+
+        文件中不保存密码, 恢复后需调用 set_credentials 才能在会话过期时自动重新登录.
+
+        :param path: save_session 写入的文件
+        :param verify: 是否请求一次资产持仓以确认会话在服务端仍然有效
+        :return: 是否恢复成功
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("load session from %s found exception: [%s]", path, e)
+            return False
+
+        if not self.load_session(state):
+            logger.info("session in %s is expired", path)
+            return False
+        if verify:
+            self._account = None
+            self.query_asset_and_position()
+            if self._account is None:
+                logger.info("session in %s is rejected by server", path)
+                self._session_expires_at = 0
+                return False
+        logger.info("resume session for %s, expires at %s", self._username, self._session_expires_at)
+        return True
+
     def login(
         self,
         username: str,
         password: str,
-        duration: int = 30
+        duration: int = 30,
+        encrypted: bool = False
     ) -> Optional[Response]:
         """ 登录
 
         :param username: 用户名
-        :param password: 密码(明文)
+        :param password: 密码(明文), encrypted 为 True 时为 emt.emt_trade_encrypt.encrypt_password 加密后的密码
         :param duration: 在线时长(分钟)
+        :param encrypted: password 是否已加密
         :return:
         """
+        encrypted_password = password if encrypted else self._emt_trade_encrypt.encrypt(password.strip())
+        with self._authenticating(), self.metrics.timer('login', 'login_total'):
+            return self._login(username, encrypted_password, duration)
+
+    def _login(
+        self,
+        username: str,
+        encrypted_password: str,
+        duration: int
+    ) -> Optional[Response]:
         if (ret := self._get_captcha_code()) is None:
             return
         random_num, code = ret
 
         headers = self._base_headers.copy()
         headers['X-Requested-With'] = 'XMLHttpRequest'
-        headers['Referer'] = 'https://jywg.18.cn/Login?el=1&clear=&returl=%2fTrade%2fBuy'
+        headers['Referer'] = f'{self._base_url}/Login?el=1&clear=&returl=%2fTrade%2fBuy'
         headers['Content-Type'] = 'application/x-www-form-urlencoded'
         url = self._urls['login']
         data = {
             'userId': username.strip(),
-            'password': self._emt_trade_encrypt.encrypt(password.strip()),
+            'password': encrypted_password,
             'randNumber': random_num,
             'identifyCode': code,
             'duration': duration,
@@ -90,36 +292,107 @@ class EMTTrade(TradeApi):
             'type': 'Z',
             'secInfo': '',
         }
-        resp = self._session.post(url, headers=headers, data=data)
+        resp = self._request('login', 'POST', url, headers=headers, data=data)
         if resp.status_code != 200:
-            logger.error(f"user [{username}] login fail, code={resp.status_code}, response={resp.text}")
+            logger.error("user [%s] login fail, code=%s, response=%s", username, resp.status_code, resp.text)
             return
 
         data = resp.json()
         try:
             resp = response_deserialize(data)
+            if resp.is_ok():
+                self._captcha_solver.report(True)
+            elif '验证码' in resp.message:
+                self._captcha_solver.report(False)
             if resp.status == 0 and resp.message.strip() == '':
-                logger.info(f"login success for {resp.data[0]['khmc']}({username})")
+                logger.info("login success for %s(%s)", resp.data[0]['khmc'], username)
+                self._username = username.strip()
+                self._credentials = (self._username, encrypted_password, duration)
+                self._session_expires_at = time.time() + duration * 60
                 self._get_em_validatekey()
                 if self._em_validatekey:
                     self.query_asset_and_position()
             return resp
         except KeyError as e:
-            logger.error(f"param data found exception:[{e}], [data={data}]")
+            logger.error("param data found exception:[%s], [data=%s]", e, data)
             return None
 
+    @contextlib.contextmanager
+    def _authenticating(self):
+        """ 持有登录锁并暂停其他线程的请求, 当前线程的请求不受影响 """
+        with self._auth_lock:
+            owner = self._auth_owner
+            self._auth_owner = threading.get_ident()
+            self._session_ready.clear()
+            try:
+                yield
+            finally:
+                self._auth_owner = owner
+                if owner is None:
+                    self._session_ready.set()
+
+    def set_credentials(self, username: str, password: str, duration: int = 30, encrypted: bool = False):
+        """ 设置重新登录使用的凭证, 用于 restore_session 恢复的会话, encrypted 同 login """
+        encrypted_password = password if encrypted else self._emt_trade_encrypt.encrypt(password.strip())
+        self._credentials = (username.strip(), encrypted_password, duration)
+
+    def relogin(self, stale_key: Optional[str] = None, attempts: int = 3) -> bool:
+        """ 使用上次登录的凭证重新登录, 期间其他线程的请求会等待登录完成
+
+        :param stale_key: 调用方发现失效的 em_validatekey, 若已被其他线程刷新则直接返回
+        :param attempts: 最大尝试次数(验证码识别错误时重试)
+        :return: 是否登录成功
+        """
+        if self._credentials is None:
+            logger.error("relogin without credentials, call login first")
+            return False
+
+        with self._authenticating():
+            if stale_key is not None and stale_key != self._em_validatekey and self.is_session_valid():
+                return True
+            username, encrypted_password, duration = self._credentials
+            for i in range(max(attempts, 1)):
+                self._em_validatekey = ''
+                resp = self._login(username, encrypted_password, duration)
+                if resp is not None and resp.is_ok() and self._em_validatekey:
+                    return True
+                logger.warning("relogin for %s fail (%d/%d), response=%s", username, i + 1, attempts, resp)
+            self._session_expires_at = 0
+            return False
+
+    def refresh_session(self) -> bool:
+        """ 刷新 em_validatekey 并确认会话有效, 失效时重新登录 """
+        with self._authenticating():
+            stale_key = self._em_validatekey
+            self._get_em_validatekey()
+            if self._em_validatekey and self._em_validatekey != stale_key:
+                logger.debug("em_validatekey refreshed")
+        if self.is_session_valid():
+            self._account = None
+            self.query_asset_and_position()
+            if self._account is not None:
+                return True
+        return self.relogin()
+
+    @staticmethod
+    def _is_session_expired(resp: requests.Response) -> bool:
+        """ 会话失效时接口返回 401/403 或被重定向到登录页 """
+        if resp.status_code in (401, 403):
+            return True
+        return any(i.is_redirect for i in resp.history) and '/Login' in resp.url
+
     def _get_em_validatekey(self):
         """ 获取 em_validatekey """
-        url = 'https://jywg.18.cn/Trade/Buy'
-        resp = self._session.get(url, headers=self._base_headers)
+        url = f'{self._base_url}/Trade/Buy'
+        resp = self._request('validatekey', 'GET', url, headers=self._base_headers)
         if resp.status_code != 200:
-            logger.error(f'get em validatekey fail, code={resp.status_code}, response={resp.text}')
+            logger.error('get em validatekey fail, code=%s, response=%s', resp.status_code, resp.text)
             return
 
         match_result = re.findall(r'id="em_validatekey" type="hidden" value="(.*?)"', resp.text)
         if match_result:
             self._em_validatekey = match_result[0].strip()
-            logger.debug(f"success to get em_validatekey={self._em_validatekey}")
+            logger.debug("success to get em_validatekey=%s", self._em_validatekey)
 
     def _query_something(
         self,
@@ -134,10 +407,12 @@ class EMTTrade(TradeApi):
         :param data: 请求提交数据，可选
         :return:
         """
-        assert self._em_validatekey, "em_validatekey is empty"
         assert self._session is not None, "session is None"
         assert tag in self._urls, f"{tag} not in url list"
-        url = self._urls[tag] + self._em_validatekey
+        if self._auth_owner != threading.get_ident() and not self._session_ready.wait(self.relogin_wait):
+            logger.error("use [%s] to query fail, wait for relogin timeout", tag)
+            return None
+        assert self._em_validatekey, "em_validatekey is empty"
         if data is None:
             if count <= 0:
                 count = 100
@@ -149,74 +424,346 @@ class EMTTrade(TradeApi):
             }
         headers = self._base_headers.copy()
         headers['X-Requested-With'] = 'XMLHttpRequest'
-        logger.debug(f"(tag={tag}), (data={data}), (url={url})")
-        resp = self._session.post(url, headers=headers, data=data)
+        key = self._em_validatekey
+        url = self._urls[tag] + key
+        logger.debug("(tag=%s), (data=%s), (url=%s)", tag, data, url)
+        resp = self._post(tag, url, headers, data)
+        if self._is_session_expired(resp) and self.auto_relogin and self._auth_owner != threading.get_ident():
+            logger.warning("use [%s] to query found session expired, relogin and retry", tag)
+            if self.relogin(stale_key=key):
+                self.metrics.count_retry(tag)
+                url = self._urls[tag] + self._em_validatekey
+                resp = self._post(tag, url, headers, data)
+        if self.journal is not None:
+            self.journal.record(
+                tag=tag, status=resp.status_code, size=len(resp.content),
+                elapsed_ms=round(resp.elapsed.total_seconds() * 1000, 3)
+            )
         if resp.status_code != 200:
-            logger.error(f"use [{tag}] to query fail, code={resp.status_code}, response={resp.text}")
+            logger.error("use [%s] to query fail, code=%s, response=%s", tag, resp.status_code, resp.text)
             return None
 
-        logger.debug(resp.text)
-        # return response_deserialize(resp.json())
+        # 完整响应内容只在 DEBUG 级别且没有配置请求流水时记录, 避免无谓的解码
+        if self.journal is None and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s", resp.text)
         return resp
 
-    def _get_captcha_code(self) -> Optional[tuple[float, Any]]:
-        """ get random number and captcha code """
-        random_num = random.random()
-        resp = self._session.get(f'https://jywg.18.cn/Login/YZM?randNum={random_num}', headers=self._base_headers)
+    def _request(self, endpoint: str, method: str, url: str, **kwargs) -> requests.Response:
+        """ 发送请求并记录指标 """
+        start = time.perf_counter()
+        try:
+            resp = self._session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self.metrics.count_status(endpoint, 0)
+            raise
+        self.metrics.observe_response(endpoint, resp, time.perf_counter() - start)
+        return resp
+
+    def _post(self, tag: str, url: str, headers: dict, data: dict) -> requests.Response:
+        """ 经过限流器发送请求, 并根据结果调整限流速率 """
+        limiter = self.rate_limiter
+        if limiter is None:
+            return self._request(tag, 'POST', url, headers=headers, data=data)
+
+        with self.metrics.timer(tag, 'throttle'):
+            limiter.acquire(_tag_priority.get(tag, Priority.QUERY))
+        try:
+            resp = self._request(tag, 'POST', url, headers=headers, data=data)
+        except requests.RequestException:
+            limiter.on_error()
+            raise
+        if resp.status_code == 429 or resp.status_code >= 500:
+            limiter.on_error()
+        else:
+            limiter.on_success()
+        return resp
+
+    def _fetch_captcha(self, random_num: float) -> Optional[bytes]:
+        """ 获取验证码图片 """
+        resp = self._request('captcha', 'GET', f'{self._base_url}/Login/YZM?randNum={random_num}',
+                             headers=self._base_headers)
         if resp.status_code != 200:
-            logger.error(f"get captcha code fail, code={resp.status_code}, response={resp.text}")
+            logger.error("get captcha code fail, code=%s, response=%s", resp.status_code, resp.text)
             return None
+        return resp.content
 
-        with open('.jywg_code.jpg', 'wb') as f:
-            f.write(resp.content)
-        code = self._ocr.classification(resp.content)
-        logger.debug(f'random_num={random_num}, code={code}')
-        if code:
-            try:
-                return random_num, int(code)
-            except Exception as e:
-                logger.error(f'get_captcha_code found exception: {e}, ocr result={code}')
-                return self._get_captcha_code()
-        return None
+    def _get_captcha_code(self) -> Optional[tuple[float, str]]:
+        """ get random number and captcha code """
+        with self.metrics.timer('captcha', 'solve'):
+            ret = self._captcha_solver.solve(self._fetch_captcha)
+        logger.debug('captcha result=%s', ret)
+        return ret
 
     def query_asset_and_position(self):
         resp = self._query_something('query_asset_and_pos')
+        if resp is None:
+            return
         try:
-            resp = response_deserialize(resp.json())
+            with self.metrics.timer('query_asset_and_pos', 'parse'):
+                resp = response_deserialize(resp.json())
+                if resp and resp.is_ok():
+                    self._account = account_deserialize(resp.data[0])
         except Exception as e:
-            logger.error(f"request response deserialize found exception {e}")
+            logger.error("request response deserialize found exception %s", e)
             return
 
-        if resp and resp.is_ok():
-            self._account = account_deserialize(resp.data[0])
+    def _query_position_array(self):
+        rows = self._query_rows('query_asset_and_pos')
+        if not rows:
+            return None
+        try:
+            with self.metrics.timer('query_asset_and_pos', 'parse'):
+                from .columnar import positions_to_array
+                self._account = account_deserialize(rows[0])
+                return positions_to_array(rows[0]['positions'])
+        except Exception as e:
+            logger.error("request response deserialize found exception %s", e)
+            return None
 
-    def query_orders(self):
-        resp = self._query_something('query_orders')
+    def _query_rows(
+        self,
+        tag: str,
+        count: int = 100,
+        data: Optional[dict] = None
+    ) -> Optional[list[dict]]:
+        """ 查询并返回未解析的数据行, 请求失败或服务端返回错误时返回 None """
+        resp = self._query_something(tag, count, data)
+        if resp is None:
+            return None
         try:
-            resp = response_deserialize(resp.json())
+            with self.metrics.timer(tag, 'parse'):
+                resp = response_deserialize(resp.json())
         except Exception as e:
-            logger.error(f"request response deserialize found exception {e}")
+            logger.error("request response deserialize found exception %s", e)
+            return None
+
+        if resp is None or not resp.is_ok():
+            logger.error("use [%s] to query fail, response=%s", tag, resp)
+            return None
+        return resp.data or []
+
+    def query_orders(self, columnar: bool = False):
+        """ 请求查询报单
+
+        :param columnar: 为 True 时返回 NumPy 结构化数组(见 emt.columnar.orders_to_array)
+        :return:
+        """
+        rows = self._query_rows('query_orders')
+        if rows is None:
             return
+        with self.metrics.timer('query_orders', 'parse_records'):
+            if columnar:
+                from .columnar import orders_to_array
+                return orders_to_array(rows)
+
+            return [self._parse_order(i) for i in rows]
+
+    def _iter_pages(
+        self,
+        tag: str,
+        page_size: int = 1000,
+        data: Optional[dict] = None
+    ) -> Iterator[list[dict]]:
+        """ 按 dwc 翻页游标逐页查询, 返回每页未解析的数据行
+
+        服务端可能把每页数量限制在 page_size 以下, 所以只在返回空页或游标不再前进时结束.
 
-        orders = []
-        if resp and resp.is_ok():
-            for i in resp.data:
-                order_info = order_deserialize(i)
-                order_info._api = self
-                orders.append(order_info)
-        return orders
+        :param tag: 请求类型
+        :param page_size: 每页数量, 最大 1000
+        :param data: 除 qqhs/dwc 外的请求数据, 可选
+        :return:
+        :raises PageQueryError: 某一页请求失败
+        """
+        page_size = min(max(page_size, 1), 1000)
+        dwc = ''
+        while True:
+            req = dict(data) if data else {}
+            req['qqhs'] = page_size
+            req['dwc'] = dwc
+            rows = self._query_rows(tag, data=req)
+            if rows is None:
+                logger.error("use [%s] to query page fail, dwc=%s", tag, dwc)
+                raise PageQueryError(tag, dwc)
+            if not rows:
+                return
+            yield rows
 
-    def query_trades(self):
-        self._query_something('query_trades')
+            next_dwc = str(rows[-1].get('Dwc', '')).strip()
+            if not next_dwc or next_dwc == dwc:
+                return
+            dwc = next_dwc
 
-    def query_history_orders(self):
-        self._query_something('query_his_orders')
+    def _iter_record_pages(
+        self,
+        tag: str,
+        parser: Callable[[dict], Any],
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000,
+        date_of: Optional[Callable[[Any], Optional[datetime.date]]] = None
+    ) -> Iterator[list[Any]]:
+        """ 逐页查询并解析, 按 [start_date, end_date] 过滤 """
+        for rows in self._iter_pages(tag, page_size, _date_range_data(start_date, end_date)):
+            with self.metrics.timer(tag, 'parse_records'):
+                records = [parser(i) for i in rows]
+            if date_of is not None and (start_date is not None or end_date is not None):
+                records = [i for i in records if _in_date_range(date_of(i), start_date, end_date)]
+            yield records
 
-    def query_history_trades(self):
-        self._query_something('query_his_trades')
+    def _query_array(
+        self,
+        tag: str,
+        to_array: Callable[[list[dict]], Any],
+        time_field: str,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ):
+        """ 逐页查询并转换为结构化数组, 按 [start_date, end_date] 过滤后合并为一个数组 """
+        import numpy as np
 
-    def query_funds_flow(self):
-        self._query_something('query_funds_flow')
+        arrays = []
+        for rows in self._iter_pages(tag, page_size, _date_range_data(start_date, end_date)):
+            with self.metrics.timer(tag, 'parse_records'):
+                arr = to_array(rows)
+            if start_date is not None or end_date is not None:
+                days = arr[time_field].astype('M8[D]')
+                mask = np.ones(len(arr), dtype=bool)
+                if start_date is not None:
+                    mask &= days >= np.datetime64(start_date, 'D')
+                if end_date is not None:
+                    mask &= days <= np.datetime64(end_date, 'D')
+                arr = arr[mask]
+            arrays.append(arr)
+        return np.concatenate(arrays) if arrays else to_array([])
+
+    def _parse_order(self, data: dict) -> OrderInfo:
+        order_info = order_deserialize(data)
+        order_info._api = self
+        return order_info
+
+    def _history_order_pages(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> Iterator[list[OrderInfo]]:
+        return self._iter_record_pages(
+            'query_his_orders', self._parse_order, start_date, end_date, page_size,
+            lambda i: i.insert_time.date() if i.insert_time else None
+        )
+
+    def _history_trade_pages(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> Iterator[list[TradeInfo]]:
+        return self._iter_record_pages(
+            'query_his_trades', trade_deserialize, start_date, end_date, page_size,
+            lambda i: i.trade_time.date() if i.trade_time else None
+        )
+
+    def _trade_pages(self, page_size: int = 1000) -> Iterator[list[TradeInfo]]:
+        return self._iter_record_pages('query_trades', trade_deserialize, page_size=page_size)
+
+    def _funds_flow_pages(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> Iterator[list[dict]]:
+        return self._iter_record_pages('query_funds_flow', lambda i: i, start_date, end_date, page_size)
+
+    def iter_trades(self, page_size: int = 1000) -> Iterator[TradeInfo]:
+        """ 逐页查询当日成交 """
+        for page in self._trade_pages(page_size):
+            yield from page
+
+    def iter_history_orders(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> Iterator[OrderInfo]:
+        """ 逐页查询历史报单, 某一页请求失败时抛出 PageQueryError, 不会返回不完整的结果
+
+        :param start_date: 开始日期(含), 可选
+        :param end_date: 结束日期(含), 可选
+        :param page_size: 每页数量, 最大 1000
+        :return:
+        """
+        for page in self._history_order_pages(start_date, end_date, page_size):
+            yield from page
+
+    def iter_history_trades(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> Iterator[TradeInfo]:
+        """ 逐页查询历史成交, 参数同 iter_history_orders """
+        for page in self._history_trade_pages(start_date, end_date, page_size):
+            yield from page
+
+    def iter_funds_flow(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        page_size: int = 1000
+    ) -> Iterator[dict]:
+        """ 逐页查询资金流水, 返回未解析的数据行, 参数同 iter_history_orders """
+        for page in self._funds_flow_pages(start_date, end_date, page_size):
+            yield from page
+
+    def query_trades(self, columnar: bool = False):
+        """ 请求查询成交
+
+        :param columnar: 为 True 时返回 NumPy 结构化数组(见 emt.columnar.trades_to_array)
+        :return:
+        """
+        if columnar:
+            from .columnar import trades_to_array
+            return self._query_array('query_trades', trades_to_array, 'trade_time')
+        return list(self.iter_trades())
+
+    def query_history_orders(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        columnar: bool = False
+    ):
+        """ 请求查询历史报单
+
+        :param start_date: 开始日期(含), 可选
+        :param end_date: 结束日期(含), 可选
+        :param columnar: 为 True 时逐页转换并合并为 NumPy 结构化数组(见 emt.columnar.orders_to_array)
+        :return:
+        """
+        if columnar:
+            from .columnar import orders_to_array
+            return self._query_array('query_his_orders', orders_to_array, 'insert_time', start_date, end_date)
+        return list(self.iter_history_orders(start_date, end_date))
+
+    def query_history_trades(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        columnar: bool = False
+    ):
+        """ 请求查询历史成交, 参数同 query_history_orders, 数组格式见 emt.columnar.trades_to_array """
+        if columnar:
+            from .columnar import trades_to_array
+            return self._query_array('query_his_trades', trades_to_array, 'trade_time', start_date, end_date)
+        return list(self.iter_history_trades(start_date, end_date))
+
+    def query_funds_flow(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> list[dict]:
+        """ 请求查询资金流水 """
+        return list(self.iter_funds_flow(start_date, end_date))
 
     def insert_order(
         self,
@@ -224,6 +771,24 @@ class EMTTrade(TradeApi):
         side: Direction,
         price: float,
         qty: int
+    ) -> Optional[OrderInfo]:
+        if self.risk is not None:
+            reason = self.risk.check(ins_id, side, price, qty)
+            if reason:
+                logger.warning("insert order %s %s %s@%s rejected by pre-trade risk: %s",
+                               ins_id.symbol_code, side.name, qty, price, reason.name)
+                return None
+        order = self._insert_order(ins_id, side, price, qty)
+        if order is not None and self.risk is not None:
+            self.risk.on_insert(order)
+        return order
+
+    def _insert_order(
+        self,
+        ins_id: InstrumentID,
+        side: Direction,
+        price: float,
+        qty: int
     ) -> Optional[OrderInfo]:
         data = {
             'stockCode': ins_id.symbol_code,
@@ -234,13 +799,16 @@ class EMTTrade(TradeApi):
             'amount': qty,
         }
         resp = self._query_something('insert_order', data=data)
+        if resp is None:
+            return None
         try:
-            resp = response_deserialize(resp.json())
+            with self.metrics.timer('insert_order', 'parse'):
+                resp = response_deserialize(resp.json())
         except Exception as e:
-            logger.error(f"request response deserialize found exception {e}")
+            logger.error("request response deserialize found exception %s", e)
             return
 
-        logger.debug(f"insert_order> {resp}")
+        logger.debug("insert_order> %s", resp)
         if resp is None or not resp.is_ok() or not resp.data:
             return None
 
@@ -260,15 +828,112 @@ class EMTTrade(TradeApi):
         )
         return order
 
-    def cancel_order(self, code: str) -> bool:
-        data = dict(revokes=code.strip())
+    def insert_orders(
+        self,
+        orders: list[tuple[InstrumentID, Direction, float, int]],
+        max_workers: Optional[int] = None
+    ) -> list[Optional[OrderInfo]]:
+        """ 批量下单, 在连接池上并发提交
+
+        :param orders: (ins_id, side, price, qty) 列表
+        :param max_workers: 最大并发数, 默认为连接池大小
+        :return: 与 orders 顺序一一对应的结果, 失败或被风控拒绝为 None
+        """
+        if not orders:
+            return []
+        ret: list[Optional[OrderInfo]] = [None] * len(orders)
+        indexes = list(range(len(orders)))
+        if self.risk is not None:
+            from .risk import RiskReject
+
+            # 整个篮子一次校验, 被拒绝的委托不发送
+            reasons = self.risk.check_basket(orders)
+            for i in indexes:
+                if reasons[i]:
+                    ins_id, side, price, qty = orders[i]
+                    logger.warning("insert order %s %s %s@%s rejected by pre-trade risk: %s",
+                                   ins_id.symbol_code, side.name, qty, price, RiskReject(int(reasons[i])).name)
+            indexes = [i for i in indexes if not reasons[i]]
+        if not indexes:
+            return ret
+        workers = min(max_workers or self._pool_size, self._pool_size, len(indexes))
+        if workers <= 1:
+            results = [self._insert_order(*orders[i]) for i in indexes]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='emt_insert') as executor:
+                results = list(executor.map(lambda i: self._insert_order(*orders[i]), indexes))
+        for i, order in zip(indexes, results):
+            ret[i] = order
+            if order is not None and self.risk is not None:
+                self.risk.on_insert(order)
+        return ret
+
+    def _revoke(self, codes: list[str]) -> dict[str, bool]:
+        """ 一次请求撤销多个委托, 返回 {撤单代码: 是否成功} """
+        data = dict(revokes=','.join(codes))
         resp = self._query_something('cancel_order', data=data)
+        if resp is None:
+            return {i: False for i in codes}
         try:
-            resp = response_deserialize(resp.json())
-            logger.error(f"cancel order {code} fail, message={resp}")
-            return False
+            ret = response_deserialize(resp.json())
+            logger.error("cancel order %s fail, message=%s", data['revokes'], ret)
+            return {i: False for i in codes}
         except Exception as e:
-            logger.error(f"cancel order to parse response found exception: [{e}]")
+            # 撤单成功时返回的是文本而不是 json
+            logger.debug("cancel order to parse response found exception: [%s]", e)
 
-        logger.debug(f"cancel_order> {resp.text}")
-        return True
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("cancel_order> %s", resp.text)
+        # 批量撤单按行返回每个委托的结果, 按完整的撤单代码匹配, 没有对应行的委托视为撤单失败
+        lines = [i.strip() for i in re.split(r'[\r\n]+', resp.text) if i.strip()]
+        ret = {}
+        for code in codes:
+            if len(codes) == 1 and len(lines) == 1:
+                # 单个撤单的结果不一定包含撤单代码
+                line = lines[0]
+            else:
+                pattern = re.compile(r'(?<!\d)' + re.escape(code) + r'(?!\d)')
+                line = next((i for i in lines if pattern.search(i)), None)
+            if line is None:
+                logger.error("cancel order %s fail, no result in response", code)
+                ret[code] = False
+            else:
+                ret[code] = not any(k in line for k in _revoke_fail_words)
+        return ret
+
+    def cancel_order(self, code: str) -> bool:
+        return self._revoke([code.strip()])[code.strip()]
+
+    def cancel_orders(
+        self,
+        orders: list[Union[OrderInfo, str]],
+        batch_size: int = 50
+    ) -> dict[str, bool]:
+        """ 批量撤单, 每个请求撤销至多 batch_size 个委托, 多个请求并发发送
+
+        :param orders: OrderInfo 或撤单代码(委托日期_委托编号)列表, 已完结的 OrderInfo 会被跳过
+        :param batch_size: 单个撤单请求包含的委托数
+        :return: {撤单代码: 是否成功}
+        """
+        codes = []
+        for i in orders:
+            if isinstance(i, OrderInfo):
+                if i.is_alive():
+                    codes.append(i.cancel_code)
+            else:
+                codes.append(i.strip())
+        codes = list(dict.fromkeys(codes))
+        if not codes:
+            return {}
+
+        batch_size = max(batch_size, 1)
+        batches = [codes[i:i + batch_size] for i in range(0, len(codes), batch_size)]
+        ret = {}
+        if len(batches) == 1:
+            ret.update(self._revoke(batches[0]))
+            return ret
+        workers = min(self._pool_size, len(batches))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='emt_cancel') as executor:
+            for i in executor.map(self._revoke, batches):
+                ret.update(i)
+        return ret
@@ -0,0 +1,267 @@
+import datetime
+import sqlite3
+import threading
+
+from typing import Optional, Iterable
+from .log import logger
+from .emt_trade_impl import EMTTrade
+from .types import OrderInfo, TradeInfo, OrderStatus, Direction
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS orders (
+    trade_date TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    symbol_code TEXT NOT NULL,
+    side INTEGER NOT NULL,
+    insert_qty INTEGER NOT NULL,
+    canceled_qty INTEGER NOT NULL,
+    trade_qty INTEGER NOT NULL,
+    insert_price REAL NOT NULL,
+    trade_price REAL NOT NULL,
+    status INTEGER NOT NULL,
+    quotation_time TEXT,
+    insert_time TEXT,
+    PRIMARY KEY (trade_date, order_id)
+);
+CREATE INDEX IF NOT EXISTS idx_orders_symbol ON orders (symbol_code, trade_date);
+CREATE INDEX IF NOT EXISTS idx_orders_order_id ON orders (order_id);
+
+CREATE TABLE IF NOT EXISTS trades (
+    trade_date TEXT NOT NULL,
+    trade_id TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    symbol_code TEXT NOT NULL,
+    side INTEGER NOT NULL,
+    trade_qty INTEGER NOT NULL,
+    trade_price REAL NOT NULL,
+    trade_amount REAL NOT NULL,
+    trade_time TEXT,
+    PRIMARY KEY (trade_date, trade_id)
+);
+CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades (symbol_code, trade_date);
+CREATE INDEX IF NOT EXISTS idx_trades_order_id ON trades (order_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    watermark TEXT NOT NULL
+);
+'''
+
+_order_columns = ('trade_date', 'order_id', 'symbol_code', 'side', 'insert_qty', 'canceled_qty', 'trade_qty',
+                  'insert_price', 'trade_price', 'status', 'quotation_time', 'insert_time')
+_trade_columns = ('trade_date', 'trade_id', 'order_id', 'symbol_code', 'side', 'trade_qty', 'trade_price',
+                  'trade_amount', 'trade_time')
+
+
+def _fmt_date(date: datetime.date) -> str:
+    return date.strftime('%Y%m%d')
+
+
+def _order_row(order: OrderInfo) -> tuple:
+    return (
+        _fmt_date(order.insert_time), order.order_id, order.symbol_code, int(order.side),
+        order.insert_qty, order.canceled_qty, order.trade_qty, order.insert_price, order.trade_price,
+        int(order.status),
+        order.quotation_time.isoformat() if order.quotation_time else None,
+        order.insert_time.isoformat()
+    )
+
+
+def _trade_row(trade: TradeInfo) -> tuple:
+    return (
+        _fmt_date(trade.trade_time), trade.trade_id, trade.order_id, trade.symbol_code, int(trade.side),
+        trade.trade_qty, trade.trade_price, trade.trade_amount, trade.trade_time.isoformat()
+    )
+
+
+def _row_order(row: sqlite3.Row) -> OrderInfo:
+    return OrderInfo(
+        symbol_code=row['symbol_code'],
+        order_id=row['order_id'],
+        insert_qty=row['insert_qty'],
+        canceled_qty=row['canceled_qty'],
+        insert_price=row['insert_price'],
+        trade_price=row['trade_price'],
+        status=OrderStatus(row['status']),
+        side=Direction(row['side']),
+        quotation_time=datetime.time.fromisoformat(row['quotation_time']) if row['quotation_time'] else None,
+        insert_time=datetime.datetime.fromisoformat(row['insert_time']) if row['insert_time'] else None,
+        trade_qty=row['trade_qty']
+    )
+
+
+def _row_trade(row: sqlite3.Row) -> TradeInfo:
+    return TradeInfo(
+        symbol_code=row['symbol_code'],
+        order_id=row['order_id'],
+        trade_id=row['trade_id'],
+        side=Direction(row['side']),
+        trade_qty=row['trade_qty'],
+        trade_price=row['trade_price'],
+        trade_amount=row['trade_amount'],
+        trade_time=datetime.datetime.fromisoformat(row['trade_time']) if row['trade_time'] else None
+    )
+
+
+class HistoryStore:
+    """ 历史报单/成交的本地 SQLite 存储
+
+    按 (日期, 委托编号)/(日期, 成交编号) 去重, 并按日期, 股票代码, 委托编号建索引.
+    sync 只拉取上次同步水位(委托/成交时间)之后的记录.
+    """
+
+    def __init__(self, path: str = 'emt_history.db'):
+        """
+        :param path: 数据库文件路径, ':memory:' 为内存数据库
+        """
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(_schema)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def watermark(self, name: str) -> Optional[datetime.datetime]:
+        """ 同步水位, name 为 orders/trades """
+        with self._lock:
+            row = self._conn.execute('SELECT watermark FROM sync_state WHERE name = ?', (name,)).fetchone()
+        return datetime.datetime.fromisoformat(row['watermark']) if row else None
+
+    def _set_watermark(self, name: str, watermark: datetime.datetime):
+        self._conn.execute(
+            'INSERT INTO sync_state (name, watermark) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET watermark = excluded.watermark',
+            (name, watermark.isoformat())
+        )
+
+    def add_orders(self, orders: Iterable[OrderInfo]) -> int:
+        """ 写入报单, 已存在的记录会被覆盖, 返回写入数量 """
+        return self._add('orders', _order_columns, [_order_row(i) for i in orders if i.insert_time is not None])
+
+    def add_trades(self, trades: Iterable[TradeInfo]) -> int:
+        """ 写入成交, 已存在的记录会被覆盖, 返回写入数量 """
+        return self._add('trades', _trade_columns, [_trade_row(i) for i in trades if i.trade_time is not None])
+
+    def _add(self, table: str, columns: tuple, rows: list[tuple], watermark: bool = True) -> int:
+        """ 写入数据行, watermark 为 True 时将水位推进到最后一列(委托/成交时间)的最大值 """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+            if watermark and rows:
+                self._update_watermark(table, max(datetime.datetime.fromisoformat(i[-1]) for i in rows))
+        return len(rows)
+
+    def _update_watermark(self, name: str, watermark: datetime.datetime):
+        row = self._conn.execute('SELECT watermark FROM sync_state WHERE name = ?', (name,)).fetchone()
+        if row is None or datetime.datetime.fromisoformat(row['watermark']) < watermark:
+            self._set_watermark(name, watermark)
+
+    def sync(
+        self,
+        api: EMTTrade,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> tuple[int, int]:
+        """ 增量同步历史报单和成交
+
+        从各自水位所在的日期开始查询, 只写入不早于水位的记录; 首次同步时从 start_date 开始.
+
+        :param api: 已登录的 EMTTrade
+        :param start_date: 首次同步的开始日期, 为空时为一年前
+        :param end_date: 结束日期, 为空时为今天
+        :return: (写入的报单数, 写入的成交数), 含覆盖水位时刻的已有记录
+        :raises PageQueryError: 某一页查询失败, 已写入的记录保留, 该类记录的水位不变, 下次同步会重新拉取
+        """
+        end_date = end_date or datetime.date.today()
+        default_start = start_date or end_date - datetime.timedelta(days=365)
+
+        order_mark = self.watermark('orders')
+        orders = api.iter_history_orders(order_mark.date() if order_mark else default_start, end_date)
+        n_orders = self._sync_pages('orders', _order_columns, orders, lambda i: i.insert_time, _order_row, order_mark)
+
+        trade_mark = self.watermark('trades')
+        trades = api.iter_history_trades(trade_mark.date() if trade_mark else default_start, end_date)
+        n_trades = self._sync_pages('trades', _trade_columns, trades, lambda i: i.trade_time, _trade_row, trade_mark)
+        logger.info("history store synced, orders=%d, trades=%d", n_orders, n_trades)
+        return n_orders, n_trades
+
+    def _sync_pages(self, table, columns, records, time_of, to_row, watermark, batch_size: int = 1000) -> int:
+        """ 分批写入记录, 全部拉取完成后才推进水位; 某一页查询失败时异常向上抛出, 水位保持不变 """
+        count = 0
+        latest = None
+        batch = []
+        for i in records:
+            t = time_of(i)
+            if t is None or (watermark is not None and t < watermark):
+                continue
+            batch.append(to_row(i))
+            latest = t if latest is None or t > latest else latest
+            if len(batch) >= batch_size:
+                count += self._add(table, columns, batch, watermark=False)
+                batch = []
+        if batch:
+            count += self._add(table, columns, batch, watermark=False)
+        if latest is not None:
+            with self._lock, self._conn:
+                self._update_watermark(table, latest)
+        return count
+
+    @staticmethod
+    def _where(
+        start_date: Optional[datetime.date],
+        end_date: Optional[datetime.date],
+        symbol_code: Optional[str],
+        order_id: Optional[int]
+    ) -> tuple[str, list]:
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append('trade_date >= ?')
+            params.append(_fmt_date(start_date))
+        if end_date is not None:
+            conditions.append('trade_date <= ?')
+            params.append(_fmt_date(end_date))
+        if symbol_code is not None:
+            conditions.append('symbol_code = ?')
+            params.append(symbol_code)
+        if order_id is not None:
+            conditions.append('order_id = ?')
+            params.append(order_id)
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    def query_orders(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        symbol_code: Optional[str] = None,
+        order_id: Optional[int] = None
+    ) -> list[OrderInfo]:
+        """ 按日期范围(含), 股票代码, 委托编号查询本地报单 """
+        where, params = self._where(start_date, end_date, symbol_code, order_id)
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM orders{where} ORDER BY insert_time', params).fetchall()
+        return [_row_order(i) for i in rows]
+
+    def query_trades(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        symbol_code: Optional[str] = None,
+        order_id: Optional[int] = None
+    ) -> list[TradeInfo]:
+        """ 按日期范围(含), 股票代码, 委托编号查询本地成交 """
+        where, params = self._where(start_date, end_date, symbol_code, order_id)
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM trades{where} ORDER BY trade_time', params).fetchall()
+        return [_row_trade(i) for i in rows]
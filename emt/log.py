@@ -1,25 +1,140 @@
 import os
+import copy
+import json
+import queue
+import atexit
 import logging
+import threading
+import logging.handlers
 from datetime import datetime
+from typing import Optional
 
 log_level = logging.DEBUG
 log_save_path = "emt_logs"
-if not os.path.exists(log_save_path):
-    os.mkdir(log_save_path)
 
-today_dt = datetime.today().strftime("%Y%m%d")
 logger = logging.getLogger('emttrade_logger')
-logger.setLevel(log_level)
+# 默认不输出日志, 调用 setup_logging 后写入文件
+logger.addHandler(logging.NullHandler())
+_fmt = logging.Formatter('%(asctime)s - %(levelname)s - %(module)s:%(funcName)s:%(lineno)d - %(message)s')
+_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
 
-file_handler = logging.FileHandler(os.path.join(log_save_path, f'emttrade_{today_dt}.log'))
-file_handler.setLevel(log_level)
 
-fmt = logging.Formatter('%(asctime)s - %(levelname)s - %(module)s:%(funcName)s:%(lineno)d - %(message)s')
-file_handler.setFormatter(fmt)
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """ 调用线程只渲染消息文本, 时间, 位置等格式化在后台线程写入文件时才进行
 
-logger.addHandler(file_handler)
+    参数可能是之后会被修改的对象(OrderInfo, dict 等), 必须在调用时渲染, 日志才反映调用时的状态.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # traceback 不能跨线程延迟处理, 这里先格式化异常
+            record.exc_text = _fmt.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(
+    level: int = log_level,
+    path: str = log_save_path,
+    background: bool = True
+) -> logging.Logger:
+    """ 配置文件日志, 重复调用会替换之前的配置
+
+    :param level: 日志级别
+    :param path: 日志目录
+    :param background: 为 True 时日志经队列由后台线程写入文件, 调用线程不阻塞在磁盘 IO 上
+    :return:
+    """
+    global _handler, _listener
+    shutdown_logging()
+    os.makedirs(path, exist_ok=True)
+
+    today_dt = datetime.today().strftime("%Y%m%d")
+    file_handler = logging.FileHandler(os.path.join(path, f'emttrade_{today_dt}.log'))
+    file_handler.setLevel(level)
+    file_handler.setFormatter(_fmt)
+
+    if background:
+        q = queue.SimpleQueue()
+        _handler = _LazyQueueHandler(q)
+        _listener = logging.handlers.QueueListener(q, file_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        _handler = file_handler
+    logger.setLevel(level)
+    logger.addHandler(_handler)
+    return logger
+
+
+def shutdown_logging():
+    """ 刷新并移除 setup_logging 添加的日志处理器 """
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        for h in _listener.handlers:
+            h.close()
+        _listener = None
+    if _handler is not None:
+        logger.removeHandler(_handler)
+        _handler.close()
+        _handler = None
+
+
+atexit.register(shutdown_logging)
+
+
+class RequestJournal:
+    """ 请求流水, 每个请求一行 JSON(JSONL), 由后台线程写入
+
+    只记录请求类型, 状态码, 响应大小, 耗时等概要字段, 用于代替 DEBUG 日志中的完整响应内容.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 流水文件路径, 追加写入
+        """
+        self._file = open(path, 'a', encoding='utf-8')
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='emt_journal', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, **fields):
+        """ 记录一条流水, 字段需可 JSON 序列化 """
+        fields.setdefault('ts', datetime.now().isoformat(timespec='microseconds'))
+        self._queue.put(fields)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            lines = [item]
+            # 批量取出已排队的记录, 减少写入次数
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(lines)
+                    return
+                lines.append(item)
+            self._write(lines)
+
+    def _write(self, items: list[dict]):
+        self._file.write(''.join(json.dumps(i, ensure_ascii=False, separators=(',', ':')) + '\n' for i in items))
+        self._file.flush()
+
+    def close(self):
+        atexit.unregister(self.close)
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if not self._file.closed:
+            self._file.close()
 
-logger.debug('logger init')
-logger.info('logger init')
-logger.warning('logger init')
-logger.error('logger init')
@@ -0,0 +1,275 @@
+import math
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Optional, Iterator
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from requests.adapters import HTTPAdapter
+
+
+class Histogram:
+    """ HDR 风格的对数-线性直方图
+
+    每个 2 的幂区间再线性切分为 2^precision 个桶, 相对误差不超过 2^-precision, 内存占用与样本数无关.
+    数值单位由调用方决定(耗时为微秒, 大小为字节).
+    """
+
+    def __init__(self, precision: int = 5):
+        self._sub_buckets = 1 << precision
+        self._counts: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.count: int = 0
+        self.total: float = 0
+        self.min: float = math.inf
+        self.max: float = 0
+
+    def _index(self, value: float) -> int:
+        if value < self._sub_buckets:
+            return int(value)
+        exp = int(value).bit_length() - 1
+        shift = exp - (self._sub_buckets.bit_length() - 1)
+        return (shift + 1) * self._sub_buckets + (int(value) >> shift) - self._sub_buckets
+
+    def _lower_bound(self, index: int) -> float:
+        if index < self._sub_buckets:
+            return index
+        shift = index // self._sub_buckets - 1
+        return (index % self._sub_buckets + self._sub_buckets) << shift
+
+    def record(self, value: float):
+        value = max(value, 0)
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        """ 第 p 百分位(0-100)的近似值 """
+        with self._lock:
+            if not self.count:
+                return 0
+            target = max(1, math.ceil(self.count * p / 100))
+            seen = 0
+            for index in sorted(self._counts):
+                seen += self._counts[index]
+                if seen >= target:
+                    return min(self._lower_bound(index), self.max)
+            return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else 0,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else 0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+        }
+
+
+class MetricsRegistry:
+    """ 按接口统计的指标
+
+    - 耗时直方图(微秒), 阶段包括 connect(DNS+TCP), tls, server(发出请求到收到响应头), transfer(读取响应体),
+      total, parse(反序列化) 等
+    - 状态码计数, 重试次数, 响应大小直方图(字节)
+    """
+
+    def __init__(self):
+        self._latency: dict[tuple[str, str], Histogram] = {}
+        self._sizes: dict[str, Histogram] = {}
+        self._status: dict[tuple[str, int], int] = {}
+        self._retries: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.enabled: bool = True
+
+    def _histogram(self, table: dict, key) -> Histogram:
+        h = table.get(key)
+        if h is None:
+            with self._lock:
+                h = table.setdefault(key, Histogram())
+        return h
+
+    def observe(self, endpoint: str, phase: str, seconds: float):
+        """ 记录耗时 """
+        if self.enabled:
+            self._histogram(self._latency, (endpoint, phase)).record(seconds * 1e6)
+
+    def observe_size(self, endpoint: str, size: int):
+        if self.enabled:
+            self._histogram(self._sizes, endpoint).record(size)
+
+    def count_status(self, endpoint: str, status_code: int):
+        if self.enabled:
+            with self._lock:
+                key = (endpoint, status_code)
+                self._status[key] = self._status.get(key, 0) + 1
+
+    def count_retry(self, endpoint: str):
+        if self.enabled:
+            with self._lock:
+                self._retries[endpoint] = self._retries.get(endpoint, 0) + 1
+
+    @contextmanager
+    def timer(self, endpoint: str, phase: str) -> Iterator[None]:
+        """ 记录代码块耗时 """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(endpoint, phase, time.perf_counter() - start)
+
+    def observe_response(self, endpoint: str, resp, total: float):
+        """ 记录一次 HTTP 请求的状态码, 大小和各阶段耗时 """
+        if not self.enabled:
+            return
+        self.count_status(endpoint, resp.status_code)
+        self.observe_size(endpoint, len(resp.content))
+        self.observe(endpoint, 'total', total)
+        server = resp.elapsed.total_seconds()
+        timing = pop_connect_timing()
+        if timing is not None:
+            connect, tls = timing
+            self.observe(endpoint, 'connect', connect)
+            if tls > 0:
+                self.observe(endpoint, 'tls', tls)
+            server = max(server - connect - tls, 0)
+        self.observe(endpoint, 'server', server)
+        self.observe(endpoint, 'transfer', max(total - resp.elapsed.total_seconds(), 0))
+
+    def snapshot(self) -> dict:
+        """ 当前指标快照
+
+        :return: {'latency_us': {endpoint: {phase: {...}}}, 'size_bytes': {endpoint: {...}},
+                  'status': {endpoint: {code: count}}, 'retries': {endpoint: count}}
+        """
+        with self._lock:
+            latency_items = list(self._latency.items())
+            size_items = list(self._sizes.items())
+            status = dict(self._status)
+            retries = dict(self._retries)
+        ret = {'latency_us': {}, 'size_bytes': {}, 'status': {}, 'retries': retries}
+        for (endpoint, phase), h in latency_items:
+            ret['latency_us'].setdefault(endpoint, {})[phase] = h.snapshot()
+        for endpoint, h in size_items:
+            ret['size_bytes'][endpoint] = h.snapshot()
+        for (endpoint, code), n in status.items():
+            ret['status'].setdefault(endpoint, {})[code] = n
+        return ret
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._sizes.clear()
+            self._status.clear()
+            self._retries.clear()
+
+
+class PrometheusTextExporter:
+    """ 以 Prometheus 文本格式导出指标, 可配合 node_exporter textfile collector 使用 """
+
+    def __init__(self, path: str, prefix: str = 'emt'):
+        self._path = path
+        self._prefix = prefix
+
+    def render(self, registry: MetricsRegistry) -> str:
+        snap = registry.snapshot()
+        p = self._prefix
+        lines = [
+            f'# TYPE {p}_latency_microseconds summary',
+        ]
+        for endpoint, phases in sorted(snap['latency_us'].items()):
+            for phase, s in sorted(phases.items()):
+                labels = f'endpoint="{endpoint}",phase="{phase}"'
+                for q, k in (('0.5', 'p50'), ('0.9', 'p90'), ('0.99', 'p99'), ('0.999', 'p999')):
+                    lines.append(f'{p}_latency_microseconds{{{labels},quantile="{q}"}} {s[k]}')
+                lines.append(f'{p}_latency_microseconds_sum{{{labels}}} {s["sum"]}')
+                lines.append(f'{p}_latency_microseconds_count{{{labels}}} {s["count"]}')
+        lines.append(f'# TYPE {p}_response_bytes summary')
+        for endpoint, s in sorted(snap['size_bytes'].items()):
+            labels = f'endpoint="{endpoint}"'
+            lines.append(f'{p}_response_bytes{{{labels},quantile="0.5"}} {s["p50"]}')
+            lines.append(f'{p}_response_bytes{{{labels},quantile="0.99"}} {s["p99"]}')
+            lines.append(f'{p}_response_bytes_sum{{{labels}}} {s["sum"]}')
+            lines.append(f'{p}_response_bytes_count{{{labels}}} {s["count"]}')
+        lines.append(f'# TYPE {p}_responses_total counter')
+        for endpoint, codes in sorted(snap['status'].items()):
+            for code, n in sorted(codes.items()):
+                lines.append(f'{p}_responses_total{{endpoint="{endpoint}",code="{code}"}} {n}')
+        lines.append(f'# TYPE {p}_retries_total counter')
+        for endpoint, n in sorted(snap['retries'].items()):
+            lines.append(f'{p}_retries_total{{endpoint="{endpoint}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, registry: MetricsRegistry):
+        """ 原子地写入文件(先写临时文件再替换) """
+        tmp = f'{self._path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render(registry))
+        os.replace(tmp, self._path)
+
+
+# 默认的全局指标
+metrics = MetricsRegistry()
+
+# 当前线程最近一次新建连接的 (connect 耗时, tls 耗时), 由 TimedHTTPAdapter 记录
+_connect_timing = threading.local()
+
+
+def pop_connect_timing() -> Optional[tuple[float, float]]:
+    """ 取出当前线程最近一次新建连接的耗时, 复用连接时返回 None """
+    timing = getattr(_connect_timing, 'value', None)
+    _connect_timing.value = None
+    return timing
+
+
+class _TimedHTTPConnection(HTTPConnection):
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.value = (time.perf_counter() - start, 0.0)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        self._emt_connect_time = time.perf_counter() - start
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        self._emt_connect_time = 0.0
+        super().connect()
+        total = time.perf_counter() - start
+        _connect_timing.value = (self._emt_connect_time, max(total - self._emt_connect_time, 0))
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """ 记录新建连接的 DNS+TCP 和 TLS 握手耗时的 HTTPAdapter """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
@@ -0,0 +1,251 @@
+import queue
+import threading
+import time
+
+from typing import Callable, Optional, Union
+from .log import logger
+from .emt_trade_impl import EMTTrade
+from .order_tracker import OrderTracker
+from .types import Order, OrderInfo, OrderStatus, TradeInfo, Direction, InstrumentID
+
+OnOrder = Callable[[Order], None]
+OnTrade = Callable[[Order, TradeInfo], None]
+
+
+class OrderManager:
+    """ 订单生命周期管理
+
+    持有账户的全部当日订单(Order), 由一个事件线程通过 OrderTracker 增量轮询 query_orders,
+    在订单成交数量增加或存在未对齐的成交时才查询 query_trades, 将结果合并为订单状态变化和逐笔成交:
+
+    - ``on_order(order)``: 订单新增(含通过 insert_order 提交), 状态, 成交数量或撤单数量变化
+    - ``on_trade(order, trade)``: 收到新的逐笔成交, 此时 order 已包含该成交
+
+    所有回调都在事件线程中按发生顺序执行, 回调中不需要加锁, 也不应阻塞.
+    也可以不启动线程, 由调用方周期性调用 run_once.
+    """
+
+    def __init__(
+        self,
+        api: EMTTrade,
+        on_order: Optional[OnOrder] = None,
+        on_trade: Optional[OnTrade] = None,
+        alive_interval: float = 0.5,
+        idle_interval: float = 5.0,
+        count: int = 1000
+    ):
+        """
+        :param api: 已登录的 EMTTrade
+        :param on_order: 订单变化回调
+        :param on_trade: 成交回调
+        :param alive_interval: 存在未完结订单时的轮询间隔(秒)
+        :param idle_interval: 没有未完结订单时的轮询间隔(秒)
+        :param count: 每页查询的订单数量, 最大 1000
+        """
+        self._api = api
+        self._on_order: list[OnOrder] = [on_order] if on_order else []
+        self._on_trade: list[OnTrade] = [on_trade] if on_trade else []
+        self._alive_interval = alive_interval
+        self._idle_interval = max(idle_interval, alive_interval)
+        # 只用于查询和比对委托数据行, 不启动其轮询线程
+        self._tracker = OrderTracker(api, count=count)
+        self._last_poll = float('-inf')
+        self._orders: dict[int, Order] = {}
+        self._trade_ids: set[tuple[int, str]] = set()
+        self._lock = threading.Lock()
+        self._events: queue.SimpleQueue = queue.SimpleQueue()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def orders(self) -> dict[int, Order]:
+        """ 当前已知订单, {order_id: Order} """
+        with self._lock:
+            return dict(self._orders)
+
+    def get(self, order_id: int) -> Optional[Order]:
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def alive_orders(self) -> list[Order]:
+        with self._lock:
+            return [i for i in self._orders.values() if i.is_alive()]
+
+    def subscribe(self, on_order: Optional[OnOrder] = None, on_trade: Optional[OnTrade] = None):
+        if on_order:
+            self._on_order.append(on_order)
+        if on_trade:
+            self._on_trade.append(on_trade)
+
+    def insert_order(
+        self,
+        ins_id: InstrumentID,
+        side: Direction,
+        price: float,
+        qty: int
+    ) -> Optional[Order]:
+        """ 下单并由管理器跟踪, 失败时返回 None """
+        info = self._api.insert_order(ins_id, side, price, qty)
+        if info is None:
+            return None
+        order = Order(
+            symbol_code=ins_id.symbol_code,
+            side=side,
+            price=price,
+            qty=qty,
+            order_id=int(info.order_id),
+            insert_time=info.insert_time,
+            status=OrderStatus.INSERT_SUBMITTED,
+            api=self._api
+        )
+        with self._lock:
+            # 事件线程可能已经通过查询收录并回调了该订单, 此时不再重复通知
+            known = self._orders.setdefault(order.order_id, order)
+        if known is order:
+            self._events.put(('order', order))
+        return known
+
+    def cancel_order(self, order: Union[Order, int]) -> bool:
+        """ 撤单, 撤单结果通过 on_order 回调通知 """
+        if not isinstance(order, Order):
+            order = self.get(order)
+        if order is None or not order.is_alive():
+            return False
+        ok = order.cancel()
+        if ok:
+            self.wakeup()
+        return ok
+
+    def cancel_all(self) -> dict[str, bool]:
+        """ 撤销全部未完结订单 """
+        ret = self._api.cancel_orders([i.cancel_code for i in self.alive_orders()])
+        if ret:
+            self.wakeup()
+        return ret
+
+    def wakeup(self):
+        """ 立即进行下一次轮询 """
+        self._events.put(('poll',))
+
+    def _merge_orders(self, infos: list[OrderInfo]) -> list[Order]:
+        """ 合并发生变化的委托, 返回变化的订单 """
+        changed = []
+        with self._lock:
+            for info in infos:
+                order_id = int(info.order_id)
+                order = self._orders.get(order_id)
+                if order is None:
+                    order = Order(
+                        symbol_code=info.symbol_code,
+                        side=info.side,
+                        price=info.insert_price,
+                        qty=info.insert_qty,
+                        order_id=order_id,
+                        insert_time=info.insert_time,
+                        status=info.status,
+                        api=self._api
+                    )
+                    self._orders[order_id] = order
+                    order.update(info)
+                    changed.append(order)
+                elif order.update(info):
+                    changed.append(order)
+        return changed
+
+    def _merge_trades(self, trades: list[TradeInfo]) -> list[tuple[Order, TradeInfo]]:
+        ret = []
+        with self._lock:
+            for trade in trades:
+                key = (trade.order_id, trade.trade_id)
+                if key in self._trade_ids:
+                    continue
+                order = self._orders.get(trade.order_id)
+                if order is None:
+                    # 委托尚未查询到, 下次轮询再处理
+                    continue
+                self._trade_ids.add(key)
+                order.add_trade(trade)
+                ret.append((order, trade))
+        return ret
+
+    def _has_unmatched_trades(self) -> bool:
+        """ 是否有订单的成交数量多于已收到的逐笔成交 """
+        with self._lock:
+            return any(i.traded_qty > sum(t.trade_qty for t in i.trades) for i in self._orders.values())
+
+    def poll(self) -> bool:
+        """ 查询并合并一次委托和成交, 在当前线程触发回调, 返回是否有变化 """
+        self._last_poll = time.monotonic()
+        changed = self._merge_orders(self._tracker.poll())
+        # 已合并的变化先回调, 成交查询失败时不会丢失; 未对齐的成交在下次轮询时重新查询
+        for order in changed:
+            self._dispatch_order(order)
+        fills = []
+        if self._has_unmatched_trades():
+            fills = self._merge_trades(self._api.query_trades())
+        for order, trade in fills:
+            self._dispatch_trade(order, trade)
+        return bool(changed or fills)
+
+    def _dispatch_order(self, order: Order):
+        for callback in self._on_order:
+            try:
+                callback(order)
+            except Exception as e:
+                logger.error("order manager on_order callback found exception: [%s], order=%s", e, order)
+
+    def _dispatch_trade(self, order: Order, trade: TradeInfo):
+        for callback in self._on_trade:
+            try:
+                callback(order, trade)
+            except Exception as e:
+                logger.error("order manager on_trade callback found exception: [%s], trade=%s", e, trade)
+
+    def run_once(self, timeout: float = 0) -> bool:
+        """ 处理已排队的事件, 距上次轮询已满 timeout 秒或收到唤醒请求时轮询, 返回是否进行了轮询
+
+        持续到达的事件不会推迟轮询, 频繁下单时仍按间隔发现成交和撤单.
+        """
+        deadline = self._last_poll + timeout
+        wait = deadline - time.monotonic()
+        try:
+            event = self._events.get(timeout=wait) if wait > 0 else self._events.get_nowait()
+        except queue.Empty:
+            event = None
+        wakeup = False
+        while event is not None:
+            if event[0] == 'order':
+                self._dispatch_order(event[1])
+            elif event[0] == 'poll':
+                # 合并连续的唤醒请求
+                wakeup = True
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+        if wakeup or time.monotonic() >= deadline:
+            self.poll()
+            return True
+        return False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='emt_order_manager', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._events.put(('stop',))
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            interval = self._alive_interval if self.alive_orders() else self._idle_interval
+            try:
+                self.run_once(interval)
+            except Exception as e:
+                logger.error("order manager found exception: [%s]", e)
@@ -0,0 +1,143 @@
+import threading
+
+from typing import Callable, Optional
+from .log import logger
+from .emt_trade_impl import EMTTrade
+from .types import OrderInfo, order_deserialize
+from .utils import get_int
+
+# 数据行中决定订单是否变化的字段: 状态, 撤单数量, 成交数量, 成交金额
+_signature_keys = ('Wtzt', 'Cdsl', 'Cjsl', 'Cjje')
+
+OrderCallback = Callable[[OrderInfo, Optional[OrderInfo]], None]
+
+
+def _row_signature(row: dict) -> tuple:
+    return tuple(row.get(k) for k in _signature_keys)
+
+
+class OrderTracker:
+    """ 增量订单跟踪
+
+    定期按 dwc 游标分页查询全部当日委托, 按 order_id 索引订单, 只对状态, 撤单数量或成交发生变化的数据行做解析,
+    并回调 ``on_change(order, previous)``, 新订单的 previous 为 None.
+
+    轮询间隔自适应: 有变化时回到 min_interval, 无变化时逐次翻倍直到 max_interval,
+    存在未完结订单时不超过 alive_interval. 下单后可调用 wakeup 立即轮询.
+    """
+
+    def __init__(
+        self,
+        api: EMTTrade,
+        on_change: Optional[OrderCallback] = None,
+        min_interval: float = 0.2,
+        max_interval: float = 5.0,
+        alive_interval: float = 1.0,
+        count: int = 1000
+    ):
+        """
+        :param api: 已登录的 EMTTrade
+        :param on_change: 订单变化回调
+        :param min_interval: 最小轮询间隔(秒)
+        :param max_interval: 最大轮询间隔(秒)
+        :param alive_interval: 存在未完结订单时的最大轮询间隔(秒)
+        :param count: 每页查询的订单数量, 最大 1000
+        """
+        self._api = api
+        self._callbacks: list[OrderCallback] = [on_change] if on_change else []
+        self._min_interval = min_interval
+        self._max_interval = max(max_interval, min_interval)
+        self._alive_interval = min(max(alive_interval, min_interval), self._max_interval)
+        self._count = count
+        self._orders: dict[int, OrderInfo] = {}
+        self._signatures: dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._interval = min_interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def orders(self) -> dict[int, OrderInfo]:
+        """ 当前已知订单, {order_id: OrderInfo} """
+        with self._lock:
+            return dict(self._orders)
+
+    @property
+    def interval(self) -> float:
+        """ 当前轮询间隔(秒) """
+        return self._interval
+
+    def get(self, order_id: int) -> Optional[OrderInfo]:
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def alive_orders(self) -> list[OrderInfo]:
+        with self._lock:
+            return [i for i in self._orders.values() if i.is_alive()]
+
+    def subscribe(self, callback: OrderCallback):
+        self._callbacks.append(callback)
+
+    def poll(self) -> list[OrderInfo]:
+        """ 轮询一次, 返回发生变化的订单 """
+        # 当日委托可能多于一页, 全部页查询成功后才比对, 某一页失败时异常向上抛出
+        rows = [row for page in self._api._iter_pages('query_orders', self._count) for row in page]
+
+        changes: list[tuple[OrderInfo, Optional[OrderInfo]]] = []
+        with self._lock:
+            for row in rows:
+                order_id = get_int(row, 'Wtbh')
+                signature = _row_signature(row)
+                if self._signatures.get(order_id) == signature:
+                    continue
+                order = order_deserialize(row)
+                order._api = self._api
+                changes.append((order, self._orders.get(order_id)))
+                self._orders[order_id] = order
+                self._signatures[order_id] = signature
+
+        for order, previous in changes:
+            for callback in self._callbacks:
+                try:
+                    callback(order, previous)
+                except Exception as e:
+                    logger.error("order tracker callback found exception: [%s], order=%s", e, order)
+        return [i[0] for i in changes]
+
+    def wakeup(self):
+        """ 立即进行下一次轮询, 并重置轮询间隔 """
+        self._interval = self._min_interval
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='emt_order_tracker', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_interval(self, changed: bool) -> float:
+        if changed:
+            return self._min_interval
+        upper = self._alive_interval if self.alive_orders() else self._max_interval
+        return min(self._interval * 2, upper)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # 在轮询前清除, 轮询期间到达的 wakeup 不会丢失
+            self._wakeup.clear()
+            try:
+                changed = bool(self.poll())
+            except Exception as e:
+                logger.error("order tracker poll found exception: [%s]", e)
+                changed = False
+            self._interval = self._next_interval(changed)
+            self._wakeup.wait(self._interval)
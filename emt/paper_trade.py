@@ -0,0 +1,472 @@
+import math
+import time
+import datetime
+import threading
+
+from typing import Any, Iterable, Iterator, Optional, Union
+from .log import logger
+from .api import TradeApi
+from .types import Response, Asset, Position, Account, OrderInfo, TradeInfo, Direction, \
+    InstrumentID, order_status_parser, trade_deserialize
+
+
+_status_map = {i: order_status_parser(i) for i in ('已报', '部成', '已成', '已撤', '部撤')}
+
+
+def _valid_price(price: Any) -> Optional[float]:
+    """ 转换为有效价格, None, 停牌时的 '-' 等非数值以及非正数, 非有限值返回 None """
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return None
+    return price if math.isfinite(price) and price > 0 else None
+
+
+class _PaperOrder:
+    __slots__ = ('order_id', 'ins_id', 'side', 'price', 'qty', 'traded_qty', 'traded_amount', 'canceled_qty',
+                 'frozen', 'insert_time', 'status')
+
+    def __init__(self, order_id: int, ins_id: InstrumentID, side: Direction, price: float, qty: int, frozen: float):
+        self.order_id = order_id
+        self.ins_id = ins_id
+        self.side = side
+        self.price = price
+        self.qty = qty
+        self.traded_qty = 0
+        self.traded_amount = 0.0
+        self.canceled_qty = 0
+        # 买入委托剩余的冻结资金
+        self.frozen = frozen
+        self.insert_time = datetime.datetime.now()
+        self.status = '已报'
+
+    @property
+    def leaves_qty(self) -> int:
+        return self.qty - self.traded_qty - self.canceled_qty
+
+    def to_info(self, api: TradeApi) -> OrderInfo:
+        status = _status_map[self.status]
+        return OrderInfo(
+            symbol_code=self.ins_id.symbol_code,
+            order_id=self.order_id,
+            insert_qty=self.qty,
+            canceled_qty=self.canceled_qty,
+            insert_price=self.price,
+            trade_price=self.traded_amount,
+            trade_qty=self.traded_qty,
+            status=status,
+            side=self.side,
+            quotation_time=self.insert_time.time().replace(microsecond=0),
+            insert_time=self.insert_time.replace(microsecond=0),
+            _api=api
+        )
+
+    def to_row(self) -> dict:
+        """ 转换为与委托查询接口相同格式的数据行 """
+        t = self.insert_time
+        return {
+            'Zqdm': self.ins_id.symbol_code,
+            'Zqmc': self.ins_id.symbol_code,
+            'Wtbh': str(self.order_id),
+            'Wtsl': str(self.qty),
+            'Cdsl': str(self.canceled_qty),
+            'Cjsl': str(self.traded_qty),
+            'Wtjg': f'{self.price:.3f}',
+            'Cjje': f'{self.traded_amount:.2f}',
+            'Wtzt': self.status,
+            'Mmlb': 'B' if self.side == Direction.Buy else 'S',
+            'Bpsj': t.strftime('%H%M%S'),
+            'Wtrq': t.strftime('%Y%m%d'),
+            'Wtsj': t.strftime('%H%M%S'),
+            'Dwc': f'{t.strftime("%Y%m%d")}|{self.order_id}',
+        }
+
+
+class PaperTrade(TradeApi):
+    """ 模拟交易
+
+    实现与 EMTTrade 相同的接口, 委托在内存中按行情撮合, 不发送任何请求:
+
+    - 买入委托价格不低于最新价(卖出不高于)时按最新价成交, 每次撮合最多成交 fill_ratio 比例的委托数量(整手),
+      用于模拟部分成交
+    - 资金和持仓按 Asset/Position 记账, 买入冻结资金, 卖出冻结可用数量, 当日买入次日可卖(T+1)
+    - latency 模拟每个请求的往返耗时
+
+    行情来源可以是 quote_source(提供 get_last_price(symbol_code, market) 的对象, 如 emt.utils 或 TickReplay,
+    在下单和调用 match 时读取), 也可以调用 on_price 推送, 或用 attach(TickReplay / QuoteStream) 订阅.
+    _query_rows 返回与服务端相同格式的数据行, OrderManager / OrderTracker / AccountCache 可直接使用.
+    """
+
+    def __init__(
+        self,
+        cash: float = 1000000.0,
+        positions: Optional[dict[str, tuple[int, float]]] = None,
+        quote_source: Optional[Any] = None,
+        latency: float = 0.0,
+        fill_ratio: float = 1.0,
+        fee_rate: float = 0.0,
+        min_fee: float = 0.0,
+        lot_size: int = 100
+    ):
+        """
+        :param cash: 初始资金
+        :param positions: 初始持仓 {股票代码: (数量, 成本价)}, 均为可用数量
+        :param quote_source: 行情来源, 需提供 get_last_price(symbol_code, market)
+        :param latency: 每个请求的模拟耗时(秒)
+        :param fill_ratio: 每次撮合最多成交的委托数量比例, 1 为一次全部成交
+        :param fee_rate: 手续费率
+        :param min_fee: 单笔最低手续费
+        :param lot_size: 每手数量, 部分成交按整手计算
+        """
+        super().__init__()
+        self._quote_source = quote_source
+        self.latency = latency
+        self._fill_ratio = min(max(fill_ratio, 0.0), 1.0)
+        self._fee_rate = fee_rate
+        self._min_fee = min_fee
+        self._lot_size = max(lot_size, 1)
+        self._lock = threading.RLock()
+        self._cash = cash
+        self._frozen_funds = 0.0
+        # 股票代码 -> [持仓数量, 可用数量, 冻结数量, 成本金额]
+        self._positions: dict[str, list] = {
+            code: [qty, qty, 0, qty * price] for code, (qty, price) in (positions or {}).items()
+        }
+        self._names: dict[str, InstrumentID] = {}
+        self._prices: dict[str, float] = {}
+        self._orders: dict[int, _PaperOrder] = {}
+        # 股票代码 -> 未完结委托 id
+        self._alive: dict[str, dict[int, None]] = {}
+        self._trades: list[dict] = []
+        self._next_order_id = 1
+        self._account: Optional[Account] = None
+
+    def _delay(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _fee(self, amount: float) -> float:
+        if self._fee_rate <= 0:
+            return 0.0
+        return max(amount * self._fee_rate, self._min_fee)
+
+    def login(self, username: str = '', password: str = '', duration: int = 30) -> Optional[Response]:
+        self._delay()
+        self.query_asset_and_position()
+        return Response('', 0, '', [{'khmc': username}])
+
+    # 行情
+
+    def set_price(self, ins_id: Union[InstrumentID, str], price: float):
+        """ 设置最新价, 不触发撮合, 无效价格被忽略 """
+        code = ins_id.symbol_code if isinstance(ins_id, InstrumentID) else ins_id
+        if (price := _valid_price(price)) is None:
+            return
+        with self._lock:
+            self._prices[code] = price
+
+    def on_price(self, ins_id: Union[InstrumentID, str], price: float) -> int:
+        """ 推送最新价并撮合该标的的委托, 返回成交笔数, 无效价格(如停牌时的 '-')被忽略 """
+        code = ins_id.symbol_code if isinstance(ins_id, InstrumentID) else ins_id
+        if (price := _valid_price(price)) is None:
+            return 0
+        with self._lock:
+            self._prices[code] = price
+            return self._match_symbol(code)
+
+    def attach(self, source) -> Any:
+        """ 订阅 TickReplay 或 QuoteStream 的行情, 每条行情触发撮合 """
+        if hasattr(source, 'step'):
+            return source.subscribe(lambda ins_id, tick: self.on_price(ins_id, float(tick['price'])))
+        return source.subscribe(lambda ins_id, quote, changed: self.on_price(ins_id, quote.get('currentPrice')))
+
+    def _fetch_price(self, ins_id: InstrumentID) -> Optional[float]:
+        """ 从 quote_source 获取最新价, 可能发起网络请求, 调用时不能持有 self._lock """
+        if self._quote_source is None:
+            return None
+        return _valid_price(self._quote_source.get_last_price(ins_id.symbol_code, ins_id.market))
+
+    def match(self, symbols: Optional[Iterable[str]] = None) -> int:
+        """ 用最新价撮合未完结委托, 配置了 quote_source 时先刷新行情, 返回成交笔数 """
+        with self._lock:
+            codes = list(symbols) if symbols is not None else [k for k, v in self._alive.items() if v]
+            ins_ids = [self._names[i] for i in codes if i in self._names]
+        quotes = {i.symbol_code: self._fetch_price(i) for i in ins_ids}
+        with self._lock:
+            n = 0
+            for code in codes:
+                if quotes.get(code) is not None:
+                    self._prices[code] = quotes[code]
+                n += self._match_symbol(code)
+            return n
+
+    def _match_symbol(self, code: str) -> int:
+        price = self._prices.get(code)
+        alive = self._alive.get(code)
+        if not alive or price is None or not price > 0:
+            return 0
+        n = 0
+        for order_id in list(alive):
+            n += self._match_order(self._orders[order_id], price)
+        return n
+
+    def _match_order(self, order: _PaperOrder, price: float) -> int:
+        if (order.side == Direction.Buy and order.price >= price) or \
+                (order.side == Direction.Sell and order.price <= price):
+            self._fill(order, price)
+            return 1
+        return 0
+
+    def _fill(self, order: _PaperOrder, price: float):
+        leaves = order.leaves_qty
+        qty = leaves
+        if self._fill_ratio < 1:
+            lots = math.ceil(order.qty * self._fill_ratio / self._lot_size)
+            qty = min(leaves, max(lots, 1) * self._lot_size)
+        amount = price * qty
+        fee = self._fee(amount)
+        pos = self._positions.setdefault(order.ins_id.symbol_code, [0, 0, 0, 0.0])
+        if order.side == Direction.Buy:
+            release = order.frozen if qty == leaves else order.frozen * qty / leaves
+            order.frozen -= release
+            self._frozen_funds = max(0.0, round(self._frozen_funds - release, 6))
+            self._cash -= amount + fee
+            pos[0] += qty
+            pos[3] += amount + fee
+        else:
+            self._cash += amount - fee
+            pos[3] -= pos[3] * qty / pos[0] if pos[0] else 0
+            pos[0] -= qty
+            pos[2] -= qty
+
+        order.traded_qty += qty
+        order.traded_amount += amount
+        order.status = '已成' if order.leaves_qty == 0 else '部成'
+        if order.leaves_qty == 0:
+            self._alive[order.ins_id.symbol_code].pop(order.order_id, None)
+        now = datetime.datetime.now()
+        self._trades.append({
+            'Zqdm': order.ins_id.symbol_code,
+            'Zqmc': order.ins_id.symbol_code,
+            'Wtbh': str(order.order_id),
+            'Cjbh': str(len(self._trades) + 1),
+            'Mmlb': 'B' if order.side == Direction.Buy else 'S',
+            'Cjsl': str(qty),
+            'Cjjg': f'{price:.3f}',
+            'Cjje': f'{amount:.2f}',
+            'Cjrq': now.strftime('%Y%m%d'),
+            'Cjsj': now.strftime('%H%M%S'),
+            'Dwc': f'{now.strftime("%Y%m%d")}|{len(self._trades) + 1}',
+        })
+
+    # 交易
+
+    def insert_order(
+        self,
+        ins_id: InstrumentID,
+        side: Direction,
+        price: float,
+        qty: int
+    ) -> Optional[OrderInfo]:
+        self._delay()
+        quote = self._fetch_price(ins_id)
+        with self._lock:
+            order = self._insert(ins_id, side, price, qty)
+            if order is None:
+                return None
+            last = self._prices.get(ins_id.symbol_code)
+            if quote is not None:
+                self._prices[ins_id.symbol_code] = quote
+            price = self._prices.get(ins_id.symbol_code, float('nan'))
+            if price != last:
+                # 行情变化时撮合该标的的全部委托, 否则只需撮合新委托
+                self._match_symbol(ins_id.symbol_code)
+            elif price > 0:
+                self._match_order(order, price)
+            return order.to_info(self)
+
+    def _insert(self, ins_id: InstrumentID, side: Direction, price: float, qty: int) -> Optional[_PaperOrder]:
+        if qty <= 0 or _valid_price(price) is None:
+            logger.warning("paper trade reject order %s %s@%s: invalid price or qty", ins_id.symbol_code, qty, price)
+            return None
+        price = float(price)
+        code = ins_id.symbol_code
+        frozen = 0.0
+        if side == Direction.Buy:
+            frozen = price * qty + self._fee(price * qty)
+            if frozen > self._cash - self._frozen_funds + 1e-6:
+                logger.warning("paper trade reject order %s %s@%s: insufficient funds", code, qty, price)
+                return None
+            self._frozen_funds += frozen
+        else:
+            pos = self._positions.get(code)
+            if pos is None or pos[1] < qty:
+                logger.warning("paper trade reject order %s %s@%s: insufficient position", code, qty, price)
+                return None
+            pos[1] -= qty
+            pos[2] += qty
+        order = _PaperOrder(self._next_order_id, ins_id, side, price, qty, frozen)
+        self._next_order_id += 1
+        self._orders[order.order_id] = order
+        self._alive.setdefault(code, {})[order.order_id] = None
+        self._names[code] = ins_id
+        return order
+
+    def insert_orders(
+        self,
+        orders: list[tuple[InstrumentID, Direction, float, int]],
+        max_workers: Optional[int] = None
+    ) -> list[Optional[OrderInfo]]:
+        """ 批量下单, 只模拟一次请求耗时 """
+        self._delay()
+        latency, self.latency = self.latency, 0.0
+        try:
+            return [self.insert_order(*i) for i in orders]
+        finally:
+            self.latency = latency
+
+    def _cancel(self, code: str) -> bool:
+        try:
+            order = self._orders.get(int(code.strip().split('_')[-1]))
+        except ValueError:
+            return False
+        if order is None or order.leaves_qty <= 0:
+            return False
+        leaves = order.leaves_qty
+        if order.side == Direction.Buy:
+            self._frozen_funds = max(0.0, round(self._frozen_funds - order.frozen, 6))
+            order.frozen = 0.0
+        else:
+            pos = self._positions[order.ins_id.symbol_code]
+            pos[1] += leaves
+            pos[2] -= leaves
+        order.canceled_qty += leaves
+        order.status = '部撤' if order.traded_qty else '已撤'
+        self._alive[order.ins_id.symbol_code].pop(order.order_id, None)
+        return True
+
+    def cancel_order(self, code: str) -> bool:
+        self._delay()
+        with self._lock:
+            return self._cancel(code)
+
+    def cancel_orders(
+        self,
+        orders: list[Union[OrderInfo, str]],
+        batch_size: int = 50
+    ) -> dict[str, bool]:
+        """ 批量撤单, 只模拟一次请求耗时 """
+        self._delay()
+        with self._lock:
+            codes = [i.cancel_code if isinstance(i, OrderInfo) else i.strip() for i in orders]
+            return {i: self._cancel(i) for i in dict.fromkeys(codes)}
+
+    # 查询
+
+    def query_asset_and_position(self):
+        self._delay()
+        with self._lock:
+            self._account = Account(self._asset(), self._position_list())
+
+    def _asset(self) -> Asset:
+        market_cap = sum(pos[0] * self._prices.get(code, pos[3] / pos[0] if pos[0] else 0)
+                         for code, pos in self._positions.items())
+        cost = sum(pos[3] for pos in self._positions.values())
+        return Asset(
+            total_asset=self._cash + market_cap,
+            market_cap=market_cap,
+            available_funds=self._cash - self._frozen_funds,
+            position_pnl=market_cap - cost,
+            account_balance=self._cash,
+            withdrawable_funds=self._cash - self._frozen_funds,
+            intraday_pnl=0.0,
+            frozen_funds=self._frozen_funds
+        )
+
+    def _position_list(self) -> list[Position]:
+        ret = []
+        for code, (hold, free, frozen, cost) in self._positions.items():
+            if hold <= 0:
+                continue
+            price = cost / hold
+            last = self._prices.get(code, price)
+            ret.append(Position(
+                symbol_code=code,
+                symbol_name=code,
+                hold_qty=hold,
+                free_qty=free,
+                frozen_qty=frozen,
+                price=price,
+                last_price=last,
+                float_ratio=(last / price - 1) * 100 if price else 0.0,
+                float_pnl=(last - price) * hold,
+                last_market_value=last * hold
+            ))
+        return ret
+
+    @property
+    def account(self) -> Optional[Account]:
+        return self._account
+
+    def query_asset(self) -> Asset:
+        self.query_asset_and_position()
+        return self._account.asset
+
+    def query_position(self) -> list[Position]:
+        self.query_asset_and_position()
+        return self._account.positions
+
+    def _query_rows(self, tag: str, count: int = 100, data: Optional[dict] = None) -> Optional[list[dict]]:
+        """ 返回与服务端相同格式的数据行 """
+        self._delay()
+        with self._lock:
+            if tag == 'query_orders':
+                return [i.to_row() for i in self._orders.values()]
+            if tag == 'query_trades':
+                return list(self._trades)
+        return []
+
+    def _iter_pages(self, tag: str, page_size: int = 1000, data: Optional[dict] = None) -> Iterator[list[dict]]:
+        """ 数据行全部在一页中返回 """
+        rows = self._query_rows(tag, page_size, data)
+        if rows:
+            yield rows
+
+    def query_orders(self, columnar: bool = False):
+        if columnar:
+            from .columnar import orders_to_array
+            return orders_to_array(self._query_rows('query_orders'))
+        self._delay()
+        with self._lock:
+            return [i.to_info(self) for i in self._orders.values()]
+
+    def iter_trades(self, page_size: int = 1000) -> Iterator[TradeInfo]:
+        for row in self._query_rows('query_trades'):
+            yield trade_deserialize(row)
+
+    def query_trades(self, columnar: bool = False):
+        if columnar:
+            from .columnar import trades_to_array
+            return trades_to_array(self._query_rows('query_trades'))
+        return list(self.iter_trades())
+
+    def query_history_orders(self, *args, columnar: bool = False, **kwargs):
+        if columnar:
+            from .columnar import orders_to_array
+            return orders_to_array([])
+        return []
+
+    def query_history_trades(self, *args, columnar: bool = False, **kwargs):
+        if columnar:
+            from .columnar import trades_to_array
+            return trades_to_array([])
+        return []
+
+    def settle(self):
+        """ 日终结算: 当日买入的持仓变为可用, 未完结委托全部撤销 """
+        with self._lock:
+            for code, ids in self._alive.items():
+                for order_id in list(ids):
+                    self._cancel(str(order_id))
+            for pos in self._positions.values():
+                pos[1] = pos[0] - pos[2]
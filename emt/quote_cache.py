@@ -0,0 +1,96 @@
+import time
+import threading
+
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class QuoteCache:
+    """ 行情快照缓存
+
+    以 (symbol_code, market) 为键, 条目超过 ttl 秒即失效, 条目数超过 maxsize 时淘汰最久未使用的条目.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[..., Optional[dict]],
+        ttl: float = 1.0,
+        maxsize: int = 1024
+    ):
+        """
+        :param loader: 缓存未命中时调用的加载函数, loader(symbol_code, market, **kwargs)
+        :param ttl: 条目最长存活时间(秒)
+        :param maxsize: 最大条目数
+        """
+        self._loader = loader
+        self._entries: OrderedDict[tuple[str, str], tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.ttl: float = ttl
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        symbol_code: str,
+        market: str,
+        max_age: Optional[float] = None,
+        **kwargs
+    ) -> Optional[dict]:
+        """ 获取行情快照
+
+        :param symbol_code: 股票代码
+        :param market: 市场, SH/SZ
+        :param max_age: 可接受的缓存最大时长(秒), 为空时使用 ttl, 为 0 时强制刷新; 不会超过 ttl
+        :param kwargs: 透传给 loader 的参数
+        :return:
+        """
+        key = (symbol_code.strip(), market)
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        if max_age > 0:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and time.monotonic() - entry[0] <= max_age:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+        with self._lock:
+            self.misses += 1
+
+        snapshot = self._loader(key[0], market, **kwargs)
+        if snapshot is not None:
+            self.put(key[0], market, snapshot)
+        return snapshot
+
+    def put(self, symbol_code: str, market: str, snapshot: dict):
+        """ 写入行情快照 """
+        key = (symbol_code.strip(), market)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.maxsize, 0):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, symbol_code: str, market: str):
+        with self._lock:
+            self._entries.pop((symbol_code.strip(), market), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """ 命中统计 """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+            }
@@ -0,0 +1,291 @@
+import time
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional
+from .log import logger
+from .types import InstrumentID
+from .utils import query_snapshot, quote_cache, snapshot_price_limits
+
+QuoteCallback = Callable[[InstrumentID, dict, dict], None]
+
+
+def _to_number(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def parse_snapshot(snapshot: Optional[dict]) -> Optional[dict]:
+    """ 将行情快照解析为扁平的字段字典, 数值字段转换为 float, 快照无效时返回 None
+
+    字段来自 realtimequote(如 currentPrice, open, high, low, volume, amount, time), 另加 bottomprice/topprice.
+    """
+    if snapshot is None or snapshot.get('status') != 0 or not isinstance(snapshot.get('realtimequote'), dict):
+        return None
+    ret = {k: _to_number(v) for k, v in snapshot['realtimequote'].items()}
+    ret['bottomprice'], ret['topprice'] = snapshot_price_limits(snapshot)
+    return ret
+
+
+class _Subscription:
+
+    def __init__(self, callback: QuoteCallback, ins_ids: Optional[set[InstrumentID]]):
+        self.callback = callback
+        self.ins_ids = ins_ids
+
+
+class QuoteStream:
+    """ 行情订阅
+
+    多个策略共享同一个轮询: 订阅的标的合并为一个集合, 由后台线程按固定节奏调用 query_snapshot,
+    请求在有界线程池中并发执行. 每个快照只解析一次, 与上一次结果对比后只向订阅者发布变化的字段:
+    ``callback(ins_id, quote, changed)``, quote 为完整的字段字典, changed 为变化的字段.
+    回调在轮询线程中顺序执行, 不应阻塞; asyncio 程序可以用 subscribe_queue 获取队列.
+
+    有未完结订单的标的(见 attach / set_priority_provider)按 priority_interval 轮询, 其余标的按 interval 轮询,
+    一轮请求数超过 max_requests 时优先请求这些标的. 快照同时写入 emt.utils.quote_cache,
+    get_last_price(max_age=...) 可以直接使用.
+    """
+
+    def __init__(
+        self,
+        interval: float = 3.0,
+        priority_interval: float = 1.0,
+        max_workers: int = 8,
+        max_requests: int = 0,
+        timeout: float = 2.0
+    ):
+        """
+        :param interval: 普通标的的轮询间隔(秒)
+        :param priority_interval: 优先标的的轮询间隔(秒)
+        :param max_workers: 并发请求数上限
+        :param max_requests: 每轮最多请求的标的数, <= 0 时不限制
+        :param timeout: 单个请求超时(秒)
+        """
+        self._interval = interval
+        self._priority_interval = min(priority_interval, interval)
+        self._max_workers = max(max_workers, 1)
+        self._max_requests = max_requests
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        # 订阅计数, 计数归零的标的不再轮询
+        self._universe: dict[InstrumentID, int] = {}
+        self._next_due: dict[InstrumentID, float] = {}
+        self._quotes: dict[InstrumentID, dict] = {}
+        self._polled_at: dict[InstrumentID, float] = {}
+        self._subscriptions: list[_Subscription] = []
+        self._priority_provider: Optional[Callable[[], Iterable[str]]] = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.requests: int = 0
+        self.errors: int = 0
+
+    @property
+    def universe(self) -> list[InstrumentID]:
+        with self._lock:
+            return list(self._universe)
+
+    def add(self, ins_ids: Iterable[InstrumentID]):
+        """ 增加轮询标的, 与 remove 成对调用 """
+        with self._lock:
+            for ins_id in ins_ids:
+                self._universe[ins_id] = self._universe.get(ins_id, 0) + 1
+                self._next_due.setdefault(ins_id, 0)
+        self._wakeup.set()
+
+    def remove(self, ins_ids: Iterable[InstrumentID]):
+        with self._lock:
+            for ins_id in ins_ids:
+                count = self._universe.get(ins_id, 0) - 1
+                if count > 0:
+                    self._universe[ins_id] = count
+                else:
+                    self._universe.pop(ins_id, None)
+                    self._next_due.pop(ins_id, None)
+                    self._quotes.pop(ins_id, None)
+                    self._polled_at.pop(ins_id, None)
+
+    def subscribe(self, callback: QuoteCallback, ins_ids: Optional[Iterable[InstrumentID]] = None) -> Any:
+        """ 订阅行情变化
+
+        :param callback: callback(ins_id, quote, changed)
+        :param ins_ids: 订阅的标的, 会加入轮询集合; 为空时接收全部标的的变化
+        :return: 订阅句柄, 用于 unsubscribe
+        """
+        ins_ids = set(ins_ids) if ins_ids is not None else None
+        sub = _Subscription(callback, ins_ids)
+        with self._lock:
+            self._subscriptions.append(sub)
+        if ins_ids:
+            self.add(ins_ids)
+        return sub
+
+    def unsubscribe(self, handle: Any):
+        with self._lock:
+            if handle not in self._subscriptions:
+                return
+            self._subscriptions.remove(handle)
+        if handle.ins_ids:
+            self.remove(handle.ins_ids)
+
+    def subscribe_queue(
+        self,
+        ins_ids: Optional[Iterable[InstrumentID]] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        maxsize: int = 0
+    ) -> tuple[asyncio.Queue, Any]:
+        """ 订阅到 asyncio 队列, 队列元素为 (ins_id, quote, changed), 需在事件循环中调用或传入 loop
+
+        :return: (队列, 订阅句柄), 队列已满时丢弃新的变化
+        """
+        loop = loop or asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize)
+
+        def put(item: tuple):
+            try:
+                q.put_nowait(item)
+            except asyncio.QueueFull:
+                logger.warning("quote stream queue is full, drop quote of %s", item[0].symbol_code)
+
+        handle = self.subscribe(lambda *args: loop.call_soon_threadsafe(put, args), ins_ids)
+        return q, handle
+
+    def set_priority_provider(self, provider: Optional[Callable[[], Iterable[str]]]):
+        """ 设置优先标的的来源, provider() 返回股票代码 """
+        self._priority_provider = provider
+
+    def attach(self, manager):
+        """ 以 OrderManager 中有未完结订单的标的作为优先标的 """
+        self.set_priority_provider(lambda: {i.symbol_code for i in manager.alive_orders()})
+
+    def latest(self, ins_id: InstrumentID) -> Optional[dict]:
+        """ 最近一次轮询到的字段 """
+        with self._lock:
+            quote = self._quotes.get(ins_id)
+            return dict(quote) if quote is not None else None
+
+    def get_last_price(self, ins_id: InstrumentID) -> float:
+        quote = self.latest(ins_id)
+        price = quote.get('currentPrice') if quote else None
+        return price if isinstance(price, float) else float('nan')
+
+    def _priority_codes(self) -> set[str]:
+        if self._priority_provider is None:
+            return set()
+        try:
+            return set(self._priority_provider())
+        except Exception as e:
+            logger.error("quote stream priority provider found exception: [%s]", e)
+            return set()
+
+    def _due(self, now: float) -> list[tuple[InstrumentID, bool]]:
+        """ 本轮需要请求的 (标的, 是否优先), 优先标的在前 """
+        priority = self._priority_codes()
+        with self._lock:
+            due = []
+            for ins_id, t in self._next_due.items():
+                is_priority = ins_id.symbol_code in priority
+                if is_priority:
+                    # 成为优先标的后不必等待普通间隔
+                    t = min(t, self._polled_at.get(ins_id, 0) + self._priority_interval)
+                if t <= now:
+                    due.append((not is_priority, t, ins_id))
+        due.sort(key=lambda i: i[:2])
+        if self._max_requests > 0:
+            due = due[:self._max_requests]
+        return [(i[2], not i[0]) for i in due]
+
+    def _fetch(self, ins_id: InstrumentID) -> Optional[dict]:
+        try:
+            snapshot = query_snapshot(ins_id.symbol_code, ins_id.market, timeout=self._timeout)
+        except Exception as e:
+            logger.warning("quote stream fetch %s.%s found exception: [%s]", ins_id.symbol_code, ins_id.market, e)
+            return None
+        if snapshot is not None:
+            quote_cache.put(ins_id.symbol_code, ins_id.market, snapshot)
+        return snapshot
+
+    def poll(self) -> int:
+        """ 请求一轮到期的标的并发布变化, 返回发生变化的标的数 """
+        now = time.monotonic()
+        due = self._due(now)
+        if not due:
+            return 0
+        ins_ids = [i[0] for i in due]
+        if self._executor is None or len(ins_ids) == 1:
+            snapshots = [self._fetch(i) for i in ins_ids]
+        else:
+            snapshots = list(self._executor.map(self._fetch, ins_ids))
+
+        updates = []
+        with self._lock:
+            self.requests += len(ins_ids)
+            for (ins_id, is_priority), snapshot in zip(due, snapshots):
+                if ins_id not in self._next_due:
+                    # 请求期间已取消订阅
+                    continue
+                self._next_due[ins_id] = now + (self._priority_interval if is_priority else self._interval)
+                self._polled_at[ins_id] = now
+                quote = parse_snapshot(snapshot)
+                if quote is None:
+                    self.errors += 1
+                    continue
+                previous = self._quotes.get(ins_id) or {}
+                changed = {k: v for k, v in quote.items() if previous.get(k) != v}
+                self._quotes[ins_id] = quote
+                if changed:
+                    updates.append((ins_id, dict(quote), changed))
+            subscriptions = list(self._subscriptions)
+
+        for ins_id, quote, changed in updates:
+            for sub in subscriptions:
+                if sub.ins_ids is not None and ins_id not in sub.ins_ids:
+                    continue
+                try:
+                    sub.callback(ins_id, quote, changed)
+                except Exception as e:
+                    logger.error("quote stream callback found exception: [%s], symbol=%s", e, ins_id.symbol_code)
+        return len(updates)
+
+    def _next_wakeup(self) -> float:
+        with self._lock:
+            if not self._next_due:
+                return self._interval
+            wait = min(self._next_due.values()) - time.monotonic()
+        if self._priority_provider is not None:
+            wait = min(wait, self._priority_interval)
+        return max(wait, 0)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='emt_quote_stream')
+        self._thread = threading.Thread(target=self._run, name='emt_quote_stream', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error("quote stream poll found exception: [%s]", e)
+            self._wakeup.wait(self._next_wakeup())
+            self._wakeup.clear()
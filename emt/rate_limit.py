@@ -0,0 +1,105 @@
+import enum
+import heapq
+import itertools
+import threading
+import time
+
+from typing import Optional
+
+
+class Priority(enum.IntEnum):
+    """ 请求优先级, 值越小越优先 """
+    CANCEL = 0
+    INSERT = 1
+    QUERY = 2
+
+
+class RateLimiter:
+    """ 带优先级的令牌桶限流
+
+    令牌按 rate 每秒补充, 最多累积 burst 个. 等待中的请求按 (优先级, 到达顺序) 排队, 只有队首能取令牌,
+    因此撤单总是排在报单之前, 报单排在查询之前; 查询还需要为更高优先级的请求保留 query_reserve 个令牌.
+
+    自适应退避(AIMD): 服务端返回错误时速率减半(不低于 min_rate), 请求成功时逐步恢复到 rate.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: float = 20.0,
+        min_rate: float = 1.0,
+        query_reserve: float = 2.0
+    ):
+        """
+        :param rate: 每秒请求数上限
+        :param burst: 令牌桶容量
+        :param min_rate: 退避后的最低速率
+        :param query_reserve: 查询请求需为撤单/报单保留的令牌数
+        """
+        self._max_rate = rate
+        self._min_rate = min(min_rate, rate)
+        self._rate = rate
+        self._burst = max(burst, 1.0)
+        self._reserve = {Priority.QUERY: min(query_reserve, self._burst - 1)}
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    @property
+    def rate(self) -> float:
+        """ 当前速率(退避后可能低于设置值) """
+        return self._rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self, priority: Priority = Priority.QUERY, timeout: Optional[float] = None) -> bool:
+        """ 获取一个令牌
+
+        :param priority: 请求优先级
+        :param timeout: 最长等待时间(秒), 为空时一直等待
+        :return: 是否获取成功
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = (int(priority), next(self._seq))
+        need = 1.0 + self._reserve.get(priority, 0.0)
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    is_head = self._waiting[0] == ticket
+                    if is_head and self._tokens >= need:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= 1.0
+                        self._cond.notify_all()
+                        return True
+                    wait = (need - self._tokens) / self._rate if is_head else None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+
+    def on_success(self):
+        """ 请求成功, 线性恢复速率 """
+        if self._rate < self._max_rate:
+            with self._cond:
+                self._refill()
+                self._rate = min(self._max_rate, self._rate + self._max_rate * 0.05)
+
+    def on_error(self):
+        """ 服务端返回错误, 速率减半 """
+        with self._cond:
+            self._refill()
+            self._rate = max(self._min_rate, self._rate * 0.5)
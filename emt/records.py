@@ -0,0 +1,77 @@
+""" 紧凑记录类型
+
+OrderInfo/Position/Asset/Account/InstrumentID 的 __slots__ 版本(可选 frozen), 不带 __dict__,
+也不持有 _api 引用, 股票代码经过 sys.intern, 用于在内存中保存大量历史订单/成交.
+"""
+import sys
+import dataclasses
+
+from typing import Any, Optional
+from .types import OrderInfo, Position, Asset, Account, InstrumentID, OrderStatus, \
+    order_deserialize, position_deserialize
+
+_interned_fields = ('symbol_code', 'symbol_name')
+
+
+def _slotted(name: str, base: type, frozen: bool, namespace: Optional[dict] = None) -> type:
+    fields = [(f.name, f.type) for f in dataclasses.fields(base) if not f.name.startswith('_')]
+    ns = dict(namespace or {})
+    ns['__slots__'] = tuple(i[0] for i in fields)
+    ns['__module__'] = __name__
+    return dataclasses.make_dataclass(name, fields, frozen=frozen, namespace=ns)
+
+
+def _is_alive(self) -> bool:
+    return self.status in (OrderStatus.PART_TRADED, OrderStatus.INSERT_ACCEPTED, OrderStatus.INSERT_SUBMITTED)
+
+
+OrderRecord = _slotted('OrderRecord', OrderInfo, False, {'is_alive': _is_alive})
+FrozenOrderRecord = _slotted('FrozenOrderRecord', OrderInfo, True, {'is_alive': _is_alive})
+PositionRecord = _slotted('PositionRecord', Position, False)
+FrozenPositionRecord = _slotted('FrozenPositionRecord', Position, True)
+AssetRecord = _slotted('AssetRecord', Asset, False)
+FrozenAssetRecord = _slotted('FrozenAssetRecord', Asset, True)
+AccountRecord = _slotted('AccountRecord', Account, False)
+FrozenAccountRecord = _slotted('FrozenAccountRecord', Account, True)
+InstrumentRecord = _slotted('InstrumentRecord', InstrumentID, True)
+
+# 原类型 -> (可变记录类型, frozen 记录类型)
+_record_types: dict[type, tuple[type, type]] = {
+    OrderInfo: (OrderRecord, FrozenOrderRecord),
+    Position: (PositionRecord, FrozenPositionRecord),
+    Asset: (AssetRecord, FrozenAssetRecord),
+    Account: (AccountRecord, FrozenAccountRecord),
+    InstrumentID: (InstrumentRecord, InstrumentRecord),
+}
+
+
+def to_record(obj: Any, frozen: bool = False) -> Any:
+    """ 将 OrderInfo/Position/Asset/Account/InstrumentID 转换为对应的紧凑记录类型
+
+    :param obj: 原对象
+    :param frozen: 是否转换为不可变记录
+    :return:
+    """
+    record_type = _record_types[type(obj)][int(frozen)]
+    values = {}
+    for name in record_type.__slots__:
+        value = getattr(obj, name)
+        if name in _interned_fields and isinstance(value, str):
+            value = sys.intern(value)
+        elif isinstance(value, (Asset, Position)):
+            value = to_record(value, frozen)
+        elif name == 'positions':
+            value = [to_record(i, frozen) for i in value]
+            value = tuple(value) if frozen else value
+        values[name] = value
+    return record_type(**values)
+
+
+def order_record_deserialize(data: dict, frozen: bool = False) -> Any:
+    """ 报单数据行 -> OrderRecord/FrozenOrderRecord """
+    return to_record(order_deserialize(data), frozen)
+
+
+def position_record_deserialize(data: dict, frozen: bool = False) -> Any:
+    """ 持仓数据行 -> PositionRecord/FrozenPositionRecord """
+    return to_record(position_deserialize(data), frozen)
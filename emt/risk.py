@@ -0,0 +1,210 @@
+""" 下单前风控
+
+在本地对委托做校验, 不合规的委托不发送到服务端, 避免浪费请求和限流额度.
+"""
+import enum
+import datetime
+import threading
+
+import numpy as np
+
+from typing import Optional, Any
+from .log import logger
+from .account_cache import AccountCache
+from .types import Direction, InstrumentID, Order, OrderInfo
+from .utils import get_snapshots, snapshot_price_limits
+
+
+class RiskReject(enum.IntEnum):
+    OK = 0
+    # 价格或数量无效
+    INVALID = 1
+    # 数量不是整手
+    LOT_SIZE = 2
+    # 价格不是最小变动价位的整数倍
+    PRICE_TICK = 3
+    # 价格超出涨跌停
+    PRICE_LIMIT = 4
+    # 可用资金不足
+    FUNDS = 5
+    # 可用持仓不足
+    POSITION = 6
+    # 单笔数量超出上限
+    MAX_QTY = 7
+
+
+OrderRequest = tuple[InstrumentID, Direction, float, int]
+
+
+def _group_cumsum(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """ 按组计算累计和, 保持原有顺序 """
+    order = np.argsort(groups, kind='stable')
+    sorted_values = values[order]
+    sorted_groups = groups[order]
+    cumsum = np.cumsum(sorted_values)
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    offsets = np.repeat(cumsum[starts] - sorted_values[starts], np.diff(np.r_[starts, len(values)]))
+    ret = np.empty_like(cumsum)
+    ret[order] = cumsum - offsets
+    return ret
+
+
+class PreTradeRisk:
+    """ 下单前风控
+
+    基于 AccountCache 的本地资金/持仓和行情快照中的涨跌停价, 对整个篮子做一次向量化校验:
+
+    - 价格和数量有效, 单笔数量不超过 max_order_qty
+    - 买入数量为每手数量的整数倍且不低于最小买入数量; 卖出数量为整手, 或恰好包含全部零股.
+      默认每手 lot_size 股, 科创板(688/689)最少买入 200 股, 以 1 股递增, 可通过 lot_sizes 按标的覆盖
+    - 价格为 price_tick 的整数倍, 且在跌停价和涨停价之间(行情获取失败时跳过)
+    - 按篮子顺序累计的买入金额不超过可用资金, 同一标的累计卖出数量不超过可用数量;
+      某笔委托因资金(持仓)不足被拒绝后, 其后的买入委托(同一标的的卖出委托)也会被拒绝
+
+    涨跌停价当日不变, 首次用到某个标的时从行情快照获取, 之后使用缓存. 设置到 EMTTrade.risk 后
+    insert_order / insert_orders 会在请求前自动校验, 并通过 on_insert 把提交成功的委托应用到 AccountCache,
+    之后的篮子按剩余的资金和持仓校验. AccountCache 未同步时在首次校验前同步.
+    """
+
+    def __init__(
+        self,
+        account: AccountCache,
+        lot_size: int = 100,
+        price_tick: float = 0.01,
+        max_order_qty: int = 1000000,
+        check_price_limits: bool = True,
+        lot_sizes: Optional[dict[str, tuple[int, int]]] = None
+    ):
+        """
+        :param account: 本地账户视图
+        :param lot_size: 默认每手数量
+        :param price_tick: 最小变动价位
+        :param max_order_qty: 单笔最大委托数量
+        :param check_price_limits: 是否校验涨跌停价
+        :param lot_sizes: 按股票代码覆盖的 (每手数量, 最小买入数量)
+        """
+        self._account = account
+        self._lot_size = lot_size
+        self._lot_sizes = dict(lot_sizes or {})
+        self._price_tick = price_tick
+        self._max_order_qty = max_order_qty
+        self._check_price_limits = check_price_limits
+        self._limits: dict[InstrumentID, tuple[float, float]] = {}
+        self._limits_date: Optional[datetime.date] = None
+        self._lock = threading.Lock()
+
+    def lot_rule(self, symbol_code: str) -> tuple[int, int]:
+        """ (每手数量, 最小买入数量) """
+        rule = self._lot_sizes.get(symbol_code)
+        if rule is not None:
+            return rule
+        if symbol_code.startswith(('688', '689')):
+            return 1, 200
+        return self._lot_size, self._lot_size
+
+    def set_price_limits(self, ins_id: InstrumentID, bottom: float, top: float):
+        """ 手动设置涨跌停价, 例如来自行情订阅 """
+        with self._lock:
+            self._reset_limits_if_new_day()
+            self._limits[ins_id] = (bottom, top)
+
+    def _reset_limits_if_new_day(self):
+        today = datetime.date.today()
+        if self._limits_date != today:
+            self._limits.clear()
+            self._limits_date = today
+
+    def price_limits(self, ins_ids: list[Any]) -> dict[Any, tuple[float, float]]:
+        """ 获取 (跌停价, 涨停价), 缓存中没有的标的并发请求行情快照 """
+        with self._lock:
+            self._reset_limits_if_new_day()
+            missing = [i for i in dict.fromkeys(ins_ids) if i not in self._limits]
+        if missing:
+            loaded = {}
+            for ins_id, snapshot in get_snapshots(missing, max_age=0).items():
+                if snapshot is not None:
+                    loaded[ins_id] = snapshot_price_limits(snapshot)
+            with self._lock:
+                self._limits.update(loaded)
+        with self._lock:
+            nan = (float('nan'), float('nan'))
+            return {i: self._limits.get(i, nan) for i in ins_ids}
+
+    def check_basket(self, orders: list[OrderRequest]) -> np.ndarray:
+        """ 校验一篮子委托
+
+        :param orders: (ins_id, side, price, qty) 列表, 资金和持仓按列表顺序占用
+        :return: 与 orders 对应的 RiskReject 数组, 0 (RiskReject.OK) 为通过
+        """
+        n = len(orders)
+        ret = np.zeros(n, dtype=np.int8)
+        if not n:
+            return ret
+
+        ins_ids = [i[0] for i in orders]
+        is_buy = np.fromiter((i[1] == Direction.Buy for i in orders), dtype=bool, count=n)
+        price = np.fromiter((i[2] for i in orders), dtype=np.float64, count=n)
+        qty = np.fromiter((i[3] for i in orders), dtype=np.int64, count=n)
+        symbols = {k: i for i, k in enumerate(dict.fromkeys(i.symbol_code for i in ins_ids))}
+        group = np.fromiter((symbols[i.symbol_code] for i in ins_ids), dtype=np.int64, count=n)
+        if self._account.asset is None and not self._account.sync():
+            logger.warning("pre-trade risk found account cache not synced, buy orders are rejected")
+        positions = [self._account.position(i) for i in symbols]
+        free_qty = np.array([p.free_qty if p is not None else 0 for p in positions], dtype=np.int64)[group]
+        asset = self._account.asset
+        available = asset.available_funds if asset is not None else 0.0
+        rules = np.array([self.lot_rule(i) for i in symbols], dtype=np.int64)[group]
+        lot, min_buy = rules[:, 0], rules[:, 1]
+
+        def reject(mask: np.ndarray, reason: RiskReject):
+            ret[(ret == RiskReject.OK) & mask] = reason
+
+        reject(~np.isfinite(price) | (price <= 0) | (qty <= 0), RiskReject.INVALID)
+        reject(qty > self._max_order_qty, RiskReject.MAX_QTY)
+        odd_lot = qty % lot != 0
+        reject(is_buy & (odd_lot | (qty < min_buy)), RiskReject.LOT_SIZE)
+        reject(~is_buy & odd_lot & (qty % lot != free_qty % lot), RiskReject.LOT_SIZE)
+        ticks = price / self._price_tick
+        reject(np.abs(ticks - np.round(ticks)) > 1e-6, RiskReject.PRICE_TICK)
+
+        if self._check_price_limits:
+            limits = self.price_limits(ins_ids)
+            bounds = np.array([limits[i] for i in ins_ids], dtype=np.float64)
+            bottom, top = bounds[:, 0], bounds[:, 1]
+            # nan 比较结果为 False, 没有涨跌停价时不拒绝
+            reject((price < bottom - 1e-6) | (price > top + 1e-6), RiskReject.PRICE_LIMIT)
+
+        # 资金和持仓只由前面通过校验的委托占用
+        amount = np.where(is_buy & (ret == RiskReject.OK), price * qty, 0.0)
+        reject(is_buy & (np.cumsum(amount) > available + 1e-6), RiskReject.FUNDS)
+        sells = np.where(~is_buy & (ret == RiskReject.OK), qty, 0)
+        reject(~is_buy & (_group_cumsum(sells, group) > free_qty), RiskReject.POSITION)
+        return ret
+
+    def on_insert(self, order: OrderInfo):
+        """ 委托提交成功, 在 AccountCache 中冻结其资金或持仓; OrderManager 之后回调同一委托时只应用增量 """
+        self._account.on_order(Order(
+            symbol_code=order.symbol_code,
+            side=order.side,
+            price=order.insert_price,
+            qty=order.insert_qty,
+            order_id=int(order.order_id),
+            insert_time=order.insert_time,
+            status=order.status
+        ))
+
+    def check(self, ins_id: InstrumentID, side: Direction, price: float, qty: int) -> RiskReject:
+        """ 校验单个委托 """
+        return RiskReject(int(self.check_basket([(ins_id, side, price, qty)])[0]))
+
+    def filter(self, orders: list[OrderRequest]) -> tuple[list[OrderRequest], list[tuple[OrderRequest, RiskReject]]]:
+        """ 拆分为 (通过的委托, [(被拒绝的委托, 原因)]) """
+        result = self.check_basket(orders)
+        accepted, rejected = [], []
+        for order, code in zip(orders, result):
+            if code == RiskReject.OK:
+                accepted.append(order)
+            else:
+                rejected.append((order, RiskReject(int(code))))
+                logger.warning("pre-trade risk reject %s, reason=%s", order, RiskReject(int(code)).name)
+        return accepted, rejected
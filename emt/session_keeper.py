@@ -0,0 +1,79 @@
+import time
+import threading
+
+from typing import Optional
+from .log import logger
+from .emt_trade_impl import EMTTrade
+
+
+class SessionKeeper:
+    """ 会话保活
+
+    后台线程跟踪 EMTTrade 的会话过期时间, 在过期前 refresh_margin 秒主动重新登录(含新的 em_validatekey),
+    避免在下单/撤单的关键路径上因会话过期触发验证码登录. 重新登录期间其他线程的请求会等待登录完成后再发出.
+    每隔 check_interval 秒还会探测一次会话, 服务端提前使会话失效时也能及时重新登录.
+    """
+
+    def __init__(
+        self,
+        api: EMTTrade,
+        refresh_margin: float = 120,
+        check_interval: float = 60,
+        retry_interval: float = 5
+    ):
+        """
+        :param api: 已登录的 EMTTrade
+        :param refresh_margin: 距离过期多少秒时重新登录
+        :param check_interval: 探测会话是否有效的间隔(秒), <= 0 时不探测
+        :param retry_interval: 重新登录失败后的重试间隔(秒)
+        """
+        self._api = api
+        self._refresh_margin = refresh_margin
+        self._check_interval = check_interval
+        self._retry_interval = retry_interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_check = time.time()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='emt_session_keeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_wakeup(self) -> float:
+        """ 距离下一次需要处理的时间(秒) """
+        until_refresh = self._api.session_expires_at - self._refresh_margin - time.time()
+        if self._check_interval > 0:
+            until_check = self._last_check + self._check_interval - time.time()
+            return max(min(until_refresh, until_check), 0)
+        return max(until_refresh, 0)
+
+    def tick(self) -> bool:
+        """ 检查一次会话, 需要时刷新, 返回会话是否可用 """
+        now = time.time()
+        if self._api.session_expires_at - now <= self._refresh_margin:
+            logger.info("session is about to expire, relogin")
+            return self._api.relogin()
+        if 0 < self._check_interval <= now - self._last_check:
+            self._last_check = now
+            return self._api.refresh_session()
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self._next_wakeup()):
+            try:
+                ok = self.tick()
+            except Exception as e:
+                logger.error("session keeper found exception: [%s]", e)
+                ok = False
+            if not ok:
+                logger.error("session keep alive fail, retry after %ss", self._retry_interval)
+                self._stopped.wait(self._retry_interval)
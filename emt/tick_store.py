@@ -0,0 +1,358 @@
+""" 行情快照录制与回放
+
+目录结构::
+
+    root/
+      20231010/
+        index.json                 # {symbol_key: [{file, count, start, end}, ...]}
+        SH_600000/00000.npz        # 每个文件一个数据块, 按 chunk_size 条切分
+        SZ_000001/00000.npz
+
+每个数据块是 tick_dtype 的结构化数组, compress=True 时为 np.savez_compressed 压缩的 .npz,
+否则为可以内存映射读取的 .npy. 数据块只追加不修改, index.json 在每次写入数据块后原子替换.
+"""
+import os
+import json
+import time
+import datetime
+import threading
+
+import numpy as np
+
+from typing import Any, Callable, Iterator, Optional
+from .types import InstrumentID, MarketType
+from .quote_stream import parse_snapshot
+
+tick_dtype = np.dtype([
+    # 接收时间, unix 时间戳(毫秒)
+    ('ts', 'i8'),
+    ('price', 'f8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('volume', 'f8'),
+    ('amount', 'f8'),
+    ('bottom', 'f8'),
+    ('top', 'f8'),
+])
+
+# tick_dtype 字段 -> parse_snapshot 结果中的字段
+_quote_fields = {
+    'price': 'currentPrice',
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'volume': 'volume',
+    'amount': 'amount',
+    'bottom': 'bottomprice',
+    'top': 'topprice',
+}
+
+
+def symbol_key(ins_id: InstrumentID) -> str:
+    return f'{ins_id.market}_{ins_id.symbol_code}'
+
+
+def parse_symbol_key(key: str) -> InstrumentID:
+    market, symbol_code = key.split('_', 1)
+    return InstrumentID(symbol_code, MarketType.SSE if market == 'SH' else MarketType.SZE)
+
+
+def _day_of(ts_ms: int) -> str:
+    return datetime.datetime.fromtimestamp(ts_ms / 1000).strftime('%Y%m%d')
+
+
+def _quote_value(quote: dict, key: str) -> float:
+    v = quote.get(key)
+    return v if isinstance(v, float) else float('nan')
+
+
+class TickRecorder:
+    """ 行情录制
+
+    record / record_quote 先写入内存缓冲, 每个标的累计 chunk_size 条或调用 flush 时写出一个数据块.
+    attach(QuoteStream) 后自动录制订阅到的行情变化.
+    """
+
+    def __init__(self, root: str, chunk_size: int = 4096, compress: bool = True):
+        """
+        :param root: 数据目录
+        :param chunk_size: 每个数据块的最大条数
+        :param compress: 为 True 时写入压缩的 .npz, 否则写入可内存映射的 .npy
+        """
+        self._root = root
+        self._chunk_size = max(chunk_size, 1)
+        self._compress = compress
+        self._lock = threading.Lock()
+        # (日期, symbol_key) -> 缓冲的数据行
+        self._buffers: dict[tuple[str, str], list[tuple]] = {}
+        self._indexes: dict[str, dict[str, list[dict]]] = {}
+        self.records: int = 0
+
+    def _index(self, day: str) -> dict[str, list[dict]]:
+        index = self._indexes.get(day)
+        if index is None:
+            path = os.path.join(self._root, day, 'index.json')
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            else:
+                index = {}
+            self._indexes[day] = index
+        return index
+
+    def record(self, ins_id: InstrumentID, snapshot: Optional[dict], ts: Optional[float] = None) -> bool:
+        """ 录制 query_snapshot 返回的快照, 快照无效时忽略并返回 False """
+        quote = parse_snapshot(snapshot)
+        if quote is None:
+            return False
+        self.record_quote(ins_id, quote, ts)
+        return True
+
+    def record_quote(self, ins_id: InstrumentID, quote: dict, ts: Optional[float] = None):
+        """ 录制 parse_snapshot 解析后的行情
+
+        :param ts: 接收时间(unix 时间戳, 秒), 默认为当前时间
+        """
+        ts_ms = int((time.time() if ts is None else ts) * 1000)
+        row = (ts_ms,) + tuple(_quote_value(quote, i) for i in _quote_fields.values())
+        key = (_day_of(ts_ms), symbol_key(ins_id))
+        with self._lock:
+            buf = self._buffers.setdefault(key, [])
+            buf.append(row)
+            self.records += 1
+            if len(buf) >= self._chunk_size:
+                self._write_chunk(key, buf)
+                self._buffers[key] = []
+
+    def attach(self, stream) -> Any:
+        """ 录制 QuoteStream 的全部行情变化, 返回订阅句柄 """
+        return stream.subscribe(lambda ins_id, quote, changed: self.record_quote(ins_id, quote))
+
+    def _write_chunk(self, key: tuple[str, str], rows: list[tuple]):
+        day, sym = key
+        arr = np.array(rows, dtype=tick_dtype)
+        index = self._index(day)
+        chunks = index.setdefault(sym, [])
+        directory = os.path.join(self._root, day, sym)
+        os.makedirs(directory, exist_ok=True)
+        name = f'{len(chunks):05d}.npz' if self._compress else f'{len(chunks):05d}.npy'
+        path = os.path.join(directory, name)
+        if self._compress:
+            np.savez_compressed(path, ticks=arr)
+        else:
+            np.save(path, arr)
+        chunks.append({
+            'file': f'{sym}/{name}',
+            'count': len(arr),
+            'start': int(arr['ts'][0]),
+            'end': int(arr['ts'][-1]),
+        })
+        index_path = os.path.join(self._root, day, 'index.json')
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(index_path + '.tmp', index_path)
+
+    def flush(self):
+        """ 将所有缓冲写出为数据块 """
+        with self._lock:
+            for key, buf in self._buffers.items():
+                if buf:
+                    self._write_chunk(key, buf)
+            self._buffers.clear()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TickReader:
+    """ 读取录制的行情 """
+
+    def __init__(self, root: str):
+        self._root = root
+
+    def days(self) -> list[str]:
+        if not os.path.isdir(self._root):
+            return []
+        return sorted(i for i in os.listdir(self._root) if os.path.exists(os.path.join(self._root, i, 'index.json')))
+
+    def index(self, day: str) -> dict[str, list[dict]]:
+        with open(os.path.join(self._root, day, 'index.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def symbols(self, day: str) -> list[InstrumentID]:
+        return [parse_symbol_key(i) for i in self.index(day)]
+
+    def _load_chunk(self, day: str, file: str) -> np.ndarray:
+        path = os.path.join(self._root, day, file)
+        if file.endswith('.npz'):
+            with np.load(path) as data:
+                return data['ticks']
+        return np.load(path, mmap_mode='r')
+
+    def load(
+        self,
+        day: str,
+        ins_id: InstrumentID,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> np.ndarray:
+        """ 读取某日某个标的的全部行情, 可按时间(unix 时间戳, 秒)过滤, 只读取时间范围内的数据块 """
+        chunks = self.index(day).get(symbol_key(ins_id), [])
+        start_ms = None if start is None else int(start * 1000)
+        end_ms = None if end is None else int(end * 1000)
+        arrays = [
+            self._load_chunk(day, c['file']) for c in chunks
+            if (start_ms is None or c['end'] >= start_ms) and (end_ms is None or c['start'] <= end_ms)
+        ]
+        if not arrays:
+            return np.empty(0, dtype=tick_dtype)
+        ret = np.concatenate(arrays)
+        if start_ms is not None or end_ms is not None:
+            mask = np.ones(len(ret), dtype=bool)
+            if start_ms is not None:
+                mask &= ret['ts'] >= start_ms
+            if end_ms is not None:
+                mask &= ret['ts'] <= end_ms
+            ret = ret[mask]
+        return ret
+
+    def merged(
+        self,
+        day: str,
+        ins_ids: Optional[list[InstrumentID]] = None
+    ) -> tuple[list[InstrumentID], np.ndarray, np.ndarray]:
+        """ 按时间合并多个标的的行情
+
+        :return: (标的列表, 每条行情对应的标的下标, 行情数组)
+        """
+        ins_ids = list(ins_ids) if ins_ids is not None else self.symbols(day)
+        arrays = [self.load(day, i) for i in ins_ids]
+        if not arrays:
+            return ins_ids, np.empty(0, dtype=np.int32), np.empty(0, dtype=tick_dtype)
+        ticks = np.concatenate(arrays)
+        symbols = np.repeat(np.arange(len(ins_ids), dtype=np.int32), [len(i) for i in arrays])
+        order = np.argsort(ticks['ts'], kind='stable')
+        return ins_ids, symbols[order], ticks[order]
+
+
+class TickReplay:
+    """ 行情回放
+
+    按录制时间顺序推进行情, 提供与 emt.utils 相同签名的 get_last_price / get_last_prices / query_snapshot,
+    回测时替换实时行情即可. speed 为回放倍速, <= 0 时不等待, 尽可能快地回放.
+    """
+
+    def __init__(
+        self,
+        reader: TickReader,
+        day: str,
+        ins_ids: Optional[list[InstrumentID]] = None,
+        speed: float = 10.0
+    ):
+        self._ins_ids, self._symbols, self._ticks = reader.merged(day, ins_ids)
+        self._keys = [(i.symbol_code, i.market) for i in self._ins_ids]
+        self._speed = speed
+        self._pos = 0
+        self._latest: dict[tuple[str, str], np.void] = {}
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[InstrumentID, np.void], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+    @property
+    def now(self) -> float:
+        """ 回放时钟(unix 时间戳, 秒), 即最后一条已回放行情的时间 """
+        if self._pos == 0:
+            return float(self._ticks['ts'][0]) / 1000 if len(self._ticks) else 0.0
+        return float(self._ticks['ts'][self._pos - 1]) / 1000
+
+    def subscribe(self, callback: Callable[[InstrumentID, np.void], None]):
+        """ callback(ins_id, tick) 在每条行情回放时调用 """
+        self._callbacks.append(callback)
+
+    def _apply(self, i: int):
+        sym = int(self._symbols[i])
+        tick = self._ticks[i]
+        with self._lock:
+            self._latest[self._keys[sym]] = tick
+        for callback in self._callbacks:
+            callback(self._ins_ids[sym], tick)
+
+    def advance_to(self, ts: float) -> int:
+        """ 回放时间不晚于 ts(unix 时间戳, 秒)的行情, 返回回放的条数 """
+        end = int(np.searchsorted(self._ticks['ts'], int(ts * 1000), side='right'))
+        start = self._pos
+        for i in range(start, end):
+            self._apply(i)
+        self._pos = max(end, start)
+        return self._pos - start
+
+    def step(self) -> bool:
+        """ 回放下一条行情, 已结束时返回 False """
+        if self._pos >= len(self._ticks):
+            return False
+        self._apply(self._pos)
+        self._pos += 1
+        return True
+
+    def run(self, until: Optional[float] = None):
+        """ 按倍速回放到 until(unix 时间戳, 秒)或结束 """
+        if not len(self._ticks):
+            return
+        ts = self._ticks['ts']
+        base_ts = ts[self._pos] if self._pos < len(ts) else ts[-1]
+        base = time.monotonic()
+        while self._pos < len(ts):
+            if until is not None and ts[self._pos] > until * 1000:
+                break
+            if self._speed > 0:
+                delay = (ts[self._pos] - base_ts) / 1000 / self._speed - (time.monotonic() - base)
+                if delay > 0:
+                    time.sleep(delay)
+            self.step()
+
+    def __iter__(self) -> Iterator[tuple[InstrumentID, np.void]]:
+        while self._pos < len(self._ticks):
+            i = self._pos
+            self.step()
+            yield self._ins_ids[int(self._symbols[i])], self._ticks[i]
+
+    def query_snapshot(self, symbol_code: str, market: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """ 以 query_snapshot 的格式返回当前回放位置的行情, 尚无行情时返回 None """
+        with self._lock:
+            tick = self._latest.get((symbol_code.strip(), market))
+        if tick is None:
+            return None
+        quote = {v: f'{float(tick[k]):.3f}' for k, v in _quote_fields.items() if k not in ('bottom', 'top')}
+        quote['time'] = datetime.datetime.fromtimestamp(int(tick['ts']) / 1000).strftime('%H:%M:%S')
+        return {
+            'code': symbol_code,
+            'status': 0,
+            'topprice': f'{float(tick["top"]):.3f}',
+            'bottomprice': f'{float(tick["bottom"]):.3f}',
+            'realtimequote': quote,
+        }
+
+    def get_last_price(self, symbol_code: str, market: str, max_age: float = 0) -> float:
+        """ 当前回放位置的最新价, 签名同 emt.utils.get_last_price """
+        with self._lock:
+            tick = self._latest.get((symbol_code.strip(), market))
+        return float(tick['price']) if tick is not None else float('nan')
+
+    def get_last_prices(
+        self,
+        ins_ids: list[Any],
+        timeout: Optional[float] = 3.0,
+        max_workers: int = 16,
+        max_age: float = 0
+    ) -> dict[Any, float]:
+        """ 签名同 emt.utils.get_last_prices """
+        return {i: self.get_last_price(i.symbol_code, i.market) for i in dict.fromkeys(ins_ids)}
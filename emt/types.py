@@ -21,7 +21,9 @@ _order_status_map = {
     '已成': OrderStatus.FULL_TRADED,
     '部成': OrderStatus.PART_TRADED,
     '已撤': OrderStatus.CANCELED,
+    '部撤': OrderStatus.CANCELED,
     '已受理': OrderStatus.INSERT_ACCEPTED,
+    '废单': OrderStatus.REJECTED,
 }
 
 
@@ -38,19 +40,15 @@ class MarketType(enum.IntEnum):
     SSE = 2
 
 
-@dataclass
+@dataclass(frozen=True)
 class InstrumentID:
     symbol_code: str
     market_type: MarketType
 
-
-class Order:
-
-    def __init__(self):
-        pass
-
-    def cancel(self):
-        pass
+    @property
+    def market(self) -> str:
+        """ 行情接口使用的市场代码, SH/SZ """
+        return 'SH' if self.market_type == MarketType.SSE else 'SZ'
 
 
 class Direction(enum.IntEnum):
@@ -179,6 +177,8 @@ class OrderInfo:
     # 报盘时间
     quotation_time: Optional[datetime.time]
     insert_time: Optional[datetime.datetime]
+    # 成交数量
+    trade_qty: int = 0
     _api: Optional[TradeApi] = None
 
     def is_alive(self) -> bool:
@@ -186,13 +186,17 @@ class OrderInfo:
                or self.status == OrderStatus.INSERT_ACCEPTED \
                or self.status == OrderStatus.INSERT_SUBMITTED
 
+    @property
+    def cancel_code(self) -> str:
+        """ 撤单代码, 委托日期_委托编号 """
+        return self.insert_time.strftime('%Y%m%d') + '_' + str(self.order_id)
+
     def cancel(self) -> bool:
         assert self._api is not None
         if not self.is_alive():
             return False
 
-        code = self.insert_time.strftime('%Y%m%d') + '_' + str(self.order_id)
-        return self._api.cancel_order(code)
+        return self._api.cancel_order(self.cancel_code)
 
 
 def order_deserialize(data: dict) -> OrderInfo:
@@ -203,8 +207,135 @@ def order_deserialize(data: dict) -> OrderInfo:
         canceled_qty=get_int(data, 'Cdsl'),
         insert_price=get_float(data, 'Wtjg'),
         trade_price=get_float(data, 'Cjje'),
+        trade_qty=get_int(data, 'Cjsl'),
         status=order_status_parser(data['Wtzt'].strip()),
         side=Direction.Buy if data['Mmlb'] == 'B' else Direction.Sell,
         quotation_time=datetime.datetime.strptime(data['Bpsj'], '%H%M%S').time(),
         insert_time=datetime.datetime.strptime(data['Wtrq'] + data['Wtsj'], '%Y%m%d%H%M%S')
     )
+
+
+@dataclass
+class TradeInfo:
+    symbol_code: str
+    # 委托编号
+    order_id: int
+    # 成交编号
+    trade_id: str
+    side: Direction
+    trade_qty: int
+    trade_price: float
+    # 成交金额
+    trade_amount: float
+    trade_time: Optional[datetime.datetime]
+
+
+def trade_deserialize(data: dict) -> TradeInfo:
+    # 当日成交没有成交日期(Cjrq)字段
+    trade_date = data['Cjrq'] if 'Cjrq' in data else datetime.date.today().strftime('%Y%m%d')
+    return TradeInfo(
+        symbol_code=data['Zqdm'],
+        order_id=get_int(data, 'Wtbh'),
+        trade_id=data['Cjbh'].strip(),
+        side=Direction.Buy if data['Mmlb'] == 'B' else Direction.Sell,
+        trade_qty=get_int(data, 'Cjsl'),
+        trade_price=get_float(data, 'Cjjg'),
+        trade_amount=get_float(data, 'Cjje'),
+        trade_time=datetime.datetime.strptime(trade_date + data['Cjsj'], '%Y%m%d%H%M%S')
+    )
+
+
+class Order:
+    """ 由 OrderManager 维护的订单
+
+    与 OrderInfo 快照不同, Order 在订单的整个生命周期内是同一个对象, 状态, 成交数量, 撤单数量
+    以及逐笔成交(trades)随查询结果持续更新.
+    """
+
+    def __init__(
+        self,
+        symbol_code: str,
+        side: Direction,
+        price: float,
+        qty: int,
+        order_id: int,
+        insert_time: Optional[datetime.datetime] = None,
+        status: OrderStatus = OrderStatus.INSERT_SUBMITTED,
+        api: Optional[TradeApi] = None
+    ):
+        self.symbol_code = symbol_code
+        self.side = side
+        self.price = price
+        self.qty = qty
+        self.order_id = order_id
+        self.insert_time = insert_time or datetime.datetime.now()
+        self.status = status
+        # 成交数量
+        self.traded_qty: int = 0
+        # 成交金额
+        self.traded_amount: float = 0.0
+        self.canceled_qty: int = 0
+        # 已收到的逐笔成交
+        self.trades: list[TradeInfo] = []
+        self._api = api
+
+    @property
+    def leaves_qty(self) -> int:
+        """ 未成交且未撤销的数量 """
+        return max(self.qty - self.traded_qty - self.canceled_qty, 0)
+
+    @property
+    def avg_price(self) -> float:
+        """ 成交均价, 无成交时为 nan """
+        return self.traded_amount / self.traded_qty if self.traded_qty else float('nan')
+
+    @property
+    def cancel_code(self) -> str:
+        """ 撤单代码, 委托日期_委托编号 """
+        return self.insert_time.strftime('%Y%m%d') + '_' + str(self.order_id)
+
+    def is_alive(self) -> bool:
+        return self.status in (OrderStatus.INSERT_SUBMITTED, OrderStatus.INSERT_ACCEPTED, OrderStatus.PART_TRADED)
+
+    def update(self, info: OrderInfo) -> bool:
+        """ 合并查询到的订单快照, 返回是否有变化
+
+        成交数量和撤单数量只增不减, 晚到的旧快照不会使订单回退.
+        """
+        if info.trade_qty < self.traded_qty or info.canceled_qty < self.canceled_qty:
+            return False
+        if not self.is_alive() and info.status != self.status \
+                and info.trade_qty == self.traded_qty and info.canceled_qty == self.canceled_qty:
+            return False
+        # order_deserialize 中的 trade_price 取自成交金额(Cjje)
+        changed = (info.status, info.trade_qty, info.canceled_qty, info.trade_price) != \
+            (self.status, self.traded_qty, self.canceled_qty, self.traded_amount)
+        self.status = info.status
+        self.traded_qty = info.trade_qty
+        self.canceled_qty = info.canceled_qty
+        self.traded_amount = info.trade_price
+        if info.insert_time is not None:
+            self.insert_time = info.insert_time
+        return changed
+
+    def add_trade(self, trade: TradeInfo):
+        """ 记录逐笔成交, 成交查询先于委托查询反映成交时同步推进成交数量 """
+        self.trades.append(trade)
+        traded_qty = sum(i.trade_qty for i in self.trades)
+        if traded_qty > self.traded_qty:
+            self.traded_qty = traded_qty
+            self.traded_amount = sum(i.trade_amount for i in self.trades)
+            if self.is_alive():
+                self.status = OrderStatus.FULL_TRADED if traded_qty >= self.qty else OrderStatus.PART_TRADED
+
+    def cancel(self) -> bool:
+        assert self._api is not None
+        if not self.is_alive():
+            return False
+
+        return self._api.cancel_order(self.cancel_code)
+
+    def __repr__(self) -> str:
+        return f'Order(symbol_code={self.symbol_code!r}, order_id={self.order_id}, side={self.side.name}, ' \
+               f'price={self.price}, qty={self.qty}, status={self.status.name}, traded_qty={self.traded_qty}, ' \
+               f'canceled_qty={self.canceled_qty})'
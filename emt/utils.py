@@ -1,6 +1,20 @@
-import requests
 import math
-from typing import Optional
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any
+from .log import logger
+from .quote_cache import QuoteCache
+
+_snapshot_url = 'https://emhsmarketwg.eastmoneysec.com/api/SHSZQuoteSnapshot'
+_snapshot_headers = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/114.0.0.0 Safari/537.36'
+}
+# requests 在第一次请求行情时才导入, 只用到 get_int 等工具函数的模块不承担其导入耗时
+_session: Optional['requests.Session'] = None
+_session_lock = threading.Lock()
+_session_pool_size = 32
 
 
 def double_equal(a, b) -> bool:
@@ -19,30 +33,138 @@ def get_int(data: dict, key: str) -> int:
     return 0
 
 
-def query_snapshot(symbol_code: str, market: str) -> Optional[dict]:
-    url = 'https://emhsmarketwg.eastmoneysec.com/api/SHSZQuoteSnapshot'
+def set_snapshot_url(url: str):
+    """ 修改行情快照接口地址, 可指向本地模拟服务 """
+    global _snapshot_url
+    _snapshot_url = url
+
+
+def _get_session() -> 'requests.Session':
+    """ 行情请求共用的 keep-alive 连接池 """
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_session_pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(_snapshot_headers)
+                _session = session
+    return _session
+
+
+def query_snapshot(symbol_code: str, market: str, timeout: Optional[float] = None) -> Optional[dict]:
     params = {
         'id': symbol_code.strip(),
         'market': market
     }
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) '
-                      'Chrome/114.0.0.0 Safari/537.36'
-    }
-    resp = requests.get(url, params=params, headers=headers)
+    resp = _get_session().get(_snapshot_url, params=params, timeout=timeout)
     if resp.status_code != 200:
-        print(f"fetch snapshot for {symbol_code}.{market} fail, code={resp.status_code}, response={resp.text}")
+        logger.warning("fetch snapshot for %s.%s fail, code=%s, response=%s",
+                       symbol_code, market, resp.status_code, resp.text)
         return None
 
     return resp.json()
 
 
-def get_last_price(symbol_code: str, market: str) -> float:
-    ret = query_snapshot(symbol_code, market)
-    if ret is None or 'status' not in ret or ret['status'] != 0:
+def snapshot_last_price(snapshot: Optional[dict]) -> float:
+    """ 从行情快照中取最新价, 快照无效时返回 nan """
+    if snapshot is None or 'status' not in snapshot or snapshot['status'] != 0:
+        return float('nan')
+
+    return get_float(snapshot['realtimequote'], 'currentPrice')
+
+
+def snapshot_price_limits(snapshot: Optional[dict]) -> tuple[float, float]:
+    """ 从行情快照中取 (跌停价, 涨停价), 快照无效或没有涨跌停限制时对应价格为 nan """
+    if snapshot is None or 'status' not in snapshot or snapshot['status'] != 0:
+        return float('nan'), float('nan')
+
+    ret = []
+    for key in ('bottomprice', 'topprice'):
+        data = snapshot if key in snapshot else snapshot.get('realtimequote') or {}
+        v = data.get(key)
+        try:
+            price = float(v) if v not in (None, '', '-') else float('nan')
+        except (TypeError, ValueError):
+            price = float('nan')
+        ret.append(price if price > 0 else float('nan'))
+    return ret[0], ret[1]
+
+
+# query_snapshot 的共享缓存, 通过 get_last_price(max_age=...) 使用
+quote_cache = QuoteCache(query_snapshot)
+
+
+def get_last_price(symbol_code: str, market: str, max_age: float = 0) -> float:
+    """ 获取最新价
+
+    :param symbol_code: 股票代码
+    :param market: 市场, SH/SZ
+    :param max_age: 可接受的缓存行情最大时长(秒), 默认 0 即总是请求最新行情(结果仍会写入缓存)
+    :return:
+    """
+    return snapshot_last_price(quote_cache.get(symbol_code, market, max_age))
+
+
+def _get_snapshot_safe(symbol_code: str, market: str, timeout: Optional[float], max_age: float) -> Optional[dict]:
+    import requests
+    try:
+        return quote_cache.get(symbol_code, market, max_age, timeout=timeout)
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("fetch snapshot for %s.%s found exception: %s", symbol_code, market, e)
+        return None
+
+
+def get_snapshots(
+    ins_ids: list[Any],
+    timeout: Optional[float] = 3.0,
+    max_workers: int = 16,
+    max_age: float = 0
+) -> dict[Any, Optional[dict]]:
+    """ 批量获取行情快照, 参数同 get_last_prices, 单个标的失败或超时时对应快照为 None """
+    ins_ids = list(dict.fromkeys(ins_ids))
+    if not ins_ids:
+        return {}
+
+    workers = max(1, min(max_workers, len(ins_ids), _session_pool_size))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='emt_quote') as executor:
+        snapshots = executor.map(
+            lambda ins_id: _get_snapshot_safe(ins_id.symbol_code, ins_id.market, timeout, max_age),
+            ins_ids
+        )
+        return dict(zip(ins_ids, snapshots))
+
+
+def _last_price_safe(snapshot: Optional[dict]) -> float:
+    try:
+        return snapshot_last_price(snapshot)
+    except (ValueError, KeyError) as e:
+        logger.warning("parse last price found exception: %s", e)
         return float('nan')
 
-    return get_float(ret['realtimequote'], 'currentPrice')
+
+def get_last_prices(
+    ins_ids: list[Any],
+    timeout: Optional[float] = 3.0,
+    max_workers: int = 16,
+    max_age: float = 0
+) -> dict[Any, float]:
+    """ 批量获取最新价
+
+    复用同一个 keep-alive 连接池, 在线程池中并发请求, 单个标的失败或超时时对应价格为 nan.
+
+    :param ins_ids: InstrumentID 列表
+    :param timeout: 单个标的的请求超时(秒)
+    :param max_workers: 最大并发请求数
+    :param max_age: 可接受的缓存行情最大时长(秒), 同 get_last_price
+    :return: {InstrumentID: 最新价}
+    """
+    snapshots = get_snapshots(ins_ids, timeout, max_workers, max_age)
+    return {k: _last_price_safe(v) for k, v in snapshots.items()}
 
 
 # def test():
@@ -1,8 +1,8 @@
 import dataclasses
 import math
 
-from emt import EMTTrade, Direction, InstrumentID, \
-    MarketType, get_last_price
+from emt import EMTTrade, AccountCache, OrderManager, Direction, InstrumentID, \
+    MarketType, get_last_prices, setup_logging
 
 
 @dataclasses.dataclass
@@ -10,6 +10,8 @@ class EMTConfig:
     username: str
     password: str
     baskets: dict
+    # 会话缓存文件, 进程重启后在会话有效期内可跳过验证码登录
+    session_path: str = '.emt_session.json'
 
 
 class EMTTradeDemo:
@@ -17,17 +19,28 @@ class EMTTradeDemo:
     def __init__(self, cfg: EMTConfig):
         self._cfg = cfg
         self._emt_trade = EMTTrade()
+        # 订单经 OrderManager 提交和跟踪, 订单变化同步到本地账户视图, 下单前检查资金不需要请求服务端
+        self._orders = OrderManager(self._emt_trade)
+        self._account = AccountCache(self._emt_trade)
+        self._account.attach(self._orders)
         self._is_ready: bool = False
         self._login()
 
     def _login(self):
-        resp = self._emt_trade.login(self._cfg.username, self._cfg.password)
-        print(f"login response: [{resp}]")
-        if not resp:
-            return
+        if self._emt_trade.restore_session(self._cfg.session_path):
+            # 恢复的会话不含登录凭证, 设置后会话过期时才能自动重新登录
+            self._emt_trade.set_credentials(self._cfg.username, self._cfg.password)
+        else:
+            resp = self._emt_trade.login(self._cfg.username, self._cfg.password)
+            print(f"login response: [{resp}]")
+            if not resp:
+                return
+            self._emt_trade.save_session(self._cfg.session_path)
 
         # 检查账户可用资金
-        account_is_ok = self._emt_trade.account.asset.available_funds > 0
+        if not self._account.sync():
+            return
+        account_is_ok = self._account.asset.available_funds > 0
         if not account_is_ok:
             print("insufficient available funds in the account")
             return
@@ -35,7 +48,7 @@ class EMTTradeDemo:
 
     def _query_position(self):
         """查询持仓，并清理篮子中已有持仓的标的"""
-        positions = self._emt_trade.query_position()
+        positions = self._account.positions
         print(positions)
         for pos in positions:
             if pos.symbol_code in self._cfg.baskets:
@@ -44,34 +57,53 @@ class EMTTradeDemo:
     def _place_order_with_baskets(self):
         if not self._is_ready:
             return
-        # 按篮子股票列表下单
-        for code, market in self._cfg.baskets.items():
-            last_price = get_last_price(code, market)
+        # 按篮子股票列表批量获取最新价后下单
+        ins_ids = [
+            InstrumentID(code, MarketType.SZE if market == 'SZ' else MarketType.SSE)
+            for code, market in self._cfg.baskets.items()
+        ]
+        last_prices = get_last_prices(ins_ids)
+        for ins_id in ins_ids:
+            last_price = last_prices[ins_id]
             if math.isnan(last_price):
-                print(f"failed to fetch the last price for {code}.{market}, the last price is 'nan'")
+                print(f"failed to fetch the last price for {ins_id.symbol_code}.{ins_id.market}, "
+                      f"the last price is 'nan'")
+                continue
+            if not self._account.can_buy(last_price, 100):
+                print(f"insufficient available funds for {ins_id.symbol_code}.{ins_id.market}")
                 continue
-            ins_id = InstrumentID(code, MarketType.SZE if market == 'SZ' else MarketType.SSE)
-            order = self._emt_trade.insert_order(ins_id, Direction.Buy, last_price, 100)
-            print(f'insert_order for {code}.{market}: ', order)
+            order = self._orders.insert_order(ins_id, Direction.Buy, last_price, 100)
+            if order is not None:
+                # 立即冻结资金, 下一个标的按剩余可用资金检查; 之后事件线程的回调只应用增量
+                self._account.on_order(order)
+            print(f'insert_order for {ins_id.symbol_code}.{ins_id.market}: ', order)
 
     def _query_order_list_and_cancel(self):
         # 查询所有委托
         orders = self._emt_trade.query_orders()
         for order in orders:
             print(order)
-            # 如果订单还存活就撤单
-            if order.is_alive():
-                ret = order.cancel()
-                order_name = f"{order.symbol_code}-{order.side.name}@{order.order_id}"
-                print(f"{order_name} 撤单{'成功' if ret else '失败'}")
+        # 批量撤销还存活的订单
+        alive_orders = [order for order in orders if order.is_alive()]
+        results = self._emt_trade.cancel_orders(alive_orders)
+        for order in alive_orders:
+            ret = results.get(order.cancel_code, False)
+            order_name = f"{order.symbol_code}-{order.side.name}@{order.order_id}"
+            print(f"{order_name} 撤单{'成功' if ret else '失败'}")
 
     def start(self):
-        self._query_position()
-        self._place_order_with_baskets()
-        self._query_order_list_and_cancel()
+        self._orders.start()
+        try:
+            self._query_position()
+            self._place_order_with_baskets()
+            self._query_order_list_and_cancel()
+        finally:
+            self._orders.stop()
 
 
 def main():
+    # 日志默认关闭, 写入 emt_logs 目录
+    setup_logging()
     cfg = EMTConfig('', '', {})
     demo = EMTTradeDemo(cfg)
     demo.start()
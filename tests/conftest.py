@@ -0,0 +1,40 @@
+import pytest
+
+from emt import EMTTrade
+from benchmarks.mock_broker import MockBrokerServer, MockConfig, EchoOcr
+
+
+@pytest.fixture
+def server():
+    with MockBrokerServer(MockConfig(initial_orders=2500)) as server:
+        yield server
+
+
+@pytest.fixture
+def api(server):
+    api = EMTTrade(ocr=EchoOcr(), base_url=server.base_url)
+    resp = api.login('mock', 'mock')
+    assert resp is not None and resp.is_ok()
+    return api
+
+
+@pytest.fixture
+def fail_nth(server):
+    """ fail_nth(path, n, status=False): 第 n 次请求 path 时返回 500(n 为 0 时不注入错误),
+    status 为 True 时改为返回 Status 非 0 的错误响应; 返回记录各次请求表单的列表
+    """
+    def install(path: str, n: int, status: bool = False) -> list[dict]:
+        handle = server.broker.handle
+        calls = []
+
+        def wrapper(method, p, query, form, cookie):
+            if p == path:
+                calls.append(form)
+                if len(calls) == n:
+                    if status:
+                        return server.broker._json({'Status': -1, 'Message': '系统繁忙', 'Data': []})
+                    return 500, {}, b'injected error'
+            return handle(method, p, query, form, cookie)
+        server.broker.handle = wrapper
+        return calls
+    return install
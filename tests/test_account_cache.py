@@ -0,0 +1,41 @@
+from emt import AccountCache, OrderManager, InstrumentID, MarketType, Direction
+
+_ins_id = InstrumentID('600000', MarketType.SSE)
+
+
+def test_insert_reserves_funds(api):
+    manager = OrderManager(api)
+    # 先收录已有委托, 作为同步基准
+    manager.poll()
+    cache = AccountCache(api)
+    cache.attach(manager)
+    assert cache.sync()
+    assert cache.can_buy(6000.0, 100)
+
+    order = manager.insert_order(_ins_id, Direction.Buy, 6000.0, 100)
+    cache.on_order(order)
+    assert cache.asset.frozen_funds == 600000.0
+    assert not cache.can_buy(6000.0, 100)
+    # 事件线程再次回调同一订单不会重复冻结
+    manager.run_once()
+    assert cache.asset.frozen_funds == 600000.0
+
+
+def test_sync_does_not_apply_changes_twice(api):
+    manager = OrderManager(api)
+    # 先收录已有委托, 作为同步基准
+    manager.poll()
+    cache = AccountCache(api)
+    cache.attach(manager)
+    assert cache.sync()
+
+    query = api.query_asset_and_position
+
+    def query_with_order():
+        # 请求期间下单并收到回调, 服务端快照视为已包含该委托
+        cache.on_order(manager.insert_order(_ins_id, Direction.Buy, 10.0, 100))
+        query()
+    api.query_asset_and_position = query_with_order
+    assert cache.sync()
+    assert cache.asset.frozen_funds == api.account.asset.frozen_funds
+    assert cache.asset.available_funds == api.account.asset.available_funds
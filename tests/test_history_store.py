@@ -0,0 +1,32 @@
+import pytest
+
+from emt import PageQueryError, InstrumentID, MarketType, Direction
+from emt.history_store import HistoryStore
+
+
+def test_sync(api):
+    with HistoryStore(':memory:') as store:
+        assert store.sync(api) == (2500, 0)
+        mark = store.watermark('orders')
+        assert mark is not None
+        assert len(store.query_orders()) == 2500
+
+        api.insert_order(InstrumentID('000001', MarketType.SZE), Direction.Buy, 10.0, 100)
+        n_orders, _ = store.sync(api)
+        # 只写入不早于水位的记录, 模拟服务的委托时间精确到秒, 与水位同一秒的记录会被重新写入
+        assert n_orders >= 1
+        assert store.watermark('orders') >= mark
+        assert len(store.query_orders()) == 2501
+
+
+@pytest.mark.parametrize('status', [False, True])
+def test_sync_page_fail_keeps_watermark(api, fail_nth, status):
+    fail_nth('/Search/GetHisOrdersData', 3, status)
+    with HistoryStore(':memory:') as store:
+        with pytest.raises(PageQueryError):
+            store.sync(api)
+        assert store.watermark('orders') is None
+        # 已写入的记录保留, 下次同步补齐
+        assert len(store.query_orders()) == 2000
+        assert store.sync(api) == (2500, 0)
+        assert len(store.query_orders()) == 2500
@@ -0,0 +1,46 @@
+import pytest
+
+from emt import OrderManager, InstrumentID, MarketType, Direction
+
+_ins_id = InstrumentID('600000', MarketType.SSE)
+
+
+def test_query_trades_fail_keeps_order_events(server, api):
+    manager = OrderManager(api)
+    manager.poll()
+    server.broker.config.fill_prob = 1.0
+    assert api.insert_order(_ins_id, Direction.Buy, 10.0, 100) is not None
+    orders, trades = [], []
+    manager.subscribe(on_order=orders.append, on_trade=lambda order, trade: trades.append(trade))
+
+    query_trades = api.query_trades
+
+    def fail():
+        raise ConnectionError('injected error')
+    api.query_trades = fail
+    with pytest.raises(ConnectionError):
+        manager.poll()
+    # 成交查询失败前已回调订单变化, 成交在下次轮询时补齐
+    assert len(orders) == 1 and orders[0].traded_qty == 100
+    api.query_trades = query_trades
+    manager.poll()
+    assert len(orders) == 1 and len(trades) == 1
+
+
+def test_insert_order_after_poll_not_duplicated(api):
+    manager = OrderManager(api)
+    manager.poll()
+    orders = []
+    manager.subscribe(on_order=orders.append)
+
+    insert_order = api.insert_order
+
+    def insert_and_poll(*args):
+        # 下单请求返回前事件线程已经查询到并回调了该订单
+        info = insert_order(*args)
+        manager.poll()
+        return info
+    api.insert_order = insert_and_poll
+    order = manager.insert_order(_ins_id, Direction.Buy, 10.0, 100)
+    manager.run_once()
+    assert orders == [order]
@@ -0,0 +1,9 @@
+from emt import OrderTracker
+
+
+def test_poll_all_pages(api):
+    tracker = OrderTracker(api)
+    assert len(tracker.poll()) == 2500
+    assert len(tracker.orders) == 2500
+    # 没有变化时不再回调
+    assert tracker.poll() == []
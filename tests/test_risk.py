@@ -0,0 +1,29 @@
+from emt import AccountCache, PreTradeRisk, RiskReject, InstrumentID, MarketType, Direction
+
+_ins_id = InstrumentID('600000', MarketType.SSE)
+_star_id = InstrumentID('688001', MarketType.SSE)
+
+
+def test_consecutive_baskets_see_reserved_funds(api):
+    cache = AccountCache(api)
+    # 未同步的 AccountCache 在首次校验时同步
+    api.risk = PreTradeRisk(cache, check_price_limits=False)
+    basket = [(_ins_id, Direction.Buy, 10.0, 60000)]
+    assert all(i is not None for i in api.insert_orders(basket))
+    assert cache.asset.frozen_funds == 600000.0
+    # 上一个篮子冻结的资金不能再次使用
+    assert api.risk.check(_ins_id, Direction.Buy, 10.0, 60000) == RiskReject.FUNDS
+    assert api.insert_orders(basket) == [None]
+    assert api.risk.check(_ins_id, Direction.Buy, 10.0, 30000) == RiskReject.OK
+
+
+def test_star_market_lot_rule(api):
+    risk = PreTradeRisk(AccountCache(api), check_price_limits=False, lot_sizes={'600000': (100, 500)})
+    result = risk.check_basket([
+        (_star_id, Direction.Buy, 10.0, 100),
+        (_star_id, Direction.Buy, 10.0, 200),
+        (_star_id, Direction.Buy, 10.0, 201),
+        (_ins_id, Direction.Buy, 10.0, 400),
+        (_ins_id, Direction.Buy, 10.0, 500),
+    ])
+    assert result.tolist() == [RiskReject.LOT_SIZE, RiskReject.OK, RiskReject.OK, RiskReject.LOT_SIZE, RiskReject.OK]
@@ -0,0 +1,100 @@
+import pytest
+
+from emt import EMTTrade, PageQueryError, InstrumentID, MarketType, Direction
+from benchmarks.mock_broker import EchoOcr
+
+_ins_id = InstrumentID('600000', MarketType.SSE)
+
+
+def test_login(server):
+    api = EMTTrade(ocr=EchoOcr(), base_url=server.base_url)
+    resp = api.login('mock', 'mock')
+    assert resp.is_ok()
+    assert api.is_session_valid()
+    assert api.account is not None
+
+
+def test_relogin_on_session_expired(server, api):
+    server.broker.expire_sessions()
+    assert api.query_asset() is not None
+    assert api.metrics.snapshot()['retries'] == {'query_asset_and_pos': 1}
+
+
+def test_relogin_without_credentials(server, api):
+    state = api.dump_session()
+    restored = EMTTrade(ocr=EchoOcr(), base_url=server.base_url)
+    assert restored.load_session(state)
+    server.broker.expire_sessions()
+    restored._account = None
+    restored.query_asset_and_position()
+    assert restored.account is None
+
+    restored.set_credentials('mock', 'mock')
+    assert restored.query_asset() is not None
+
+
+def test_insert_and_cancel_orders(api):
+    orders = api.insert_orders([(_ins_id, Direction.Buy, 10.0, 100)] * 5)
+    assert all(i is not None for i in orders)
+    codes = [i.cancel_code for i in orders]
+
+    ret = api.cancel_orders(codes[:3] + ['20200101_1'], batch_size=2)
+    assert ret == {codes[0]: True, codes[1]: True, codes[2]: True, '20200101_1': False}
+    # 已撤销的委托再次撤单失败
+    assert api.cancel_orders(codes) == {codes[0]: False, codes[1]: False, codes[2]: False,
+                                        codes[3]: True, codes[4]: True}
+    assert not api.cancel_order(codes[0])
+
+
+@pytest.mark.parametrize('body', [
+    '',
+    '撤单委托已提交',
+    # 只有委托编号, 没有完整的撤单代码
+    '{order_id}: 撤单委托已提交\r\n{other_id}: 撤单委托已提交',
+])
+def test_cancel_orders_unmatched_response(server, api, body):
+    orders = api.insert_orders([(_ins_id, Direction.Buy, 10.0, 100)] * 2)
+    codes = [i.cancel_code for i in orders]
+    text = body.format(order_id=orders[0].order_id, other_id=orders[1].order_id)
+    handle = server.broker.handle
+
+    def wrapper(method, path, query, form, cookie):
+        if path == '/Trade/RevokeOrders':
+            return 200, {'Content-Type': 'text/plain; charset=utf-8'}, text.encode()
+        return handle(method, path, query, form, cookie)
+    server.broker.handle = wrapper
+    assert api.cancel_orders(codes) == {codes[0]: False, codes[1]: False}
+
+
+def test_cancel_orders_partial_response(server, api):
+    orders = api.insert_orders([(_ins_id, Direction.Buy, 10.0, 100)] * 3)
+    codes = [i.cancel_code for i in orders]
+    revoke = server.broker._revoke
+    # 响应中缺少最后一个委托的结果
+    server.broker._revoke = lambda code: '' if code == codes[-1] else revoke(code)
+    assert api.cancel_orders(codes) == {codes[0]: True, codes[1]: True, codes[2]: False}
+
+
+def test_history_orders_paging(api, fail_nth):
+    calls = fail_nth('/Search/GetHisOrdersData', 0)
+    orders = api.query_history_orders()
+    assert len(orders) == 2500
+    assert len({i.order_id for i in orders}) == 2500
+    # 每页以上一页最后一条的 Dwc 作为游标
+    assert len(calls) == 4
+    assert [i.get('dwc', '') for i in calls[:2]] == ['', f"{orders[999].insert_time:%Y%m%d}|{orders[999].order_id}"]
+    assert len(api.query_history_orders(columnar=True)) == 2500
+
+
+def test_history_orders_paging_server_cap(server, api):
+    page = server.broker._page
+    # 服务端把每页数量限制为 300
+    server.broker._page = lambda rows, form: page(rows, dict(form, qqhs=min(int(form['qqhs']), 300)))
+    assert len(api.query_history_orders()) == 2500
+
+
+@pytest.mark.parametrize('status', [False, True])
+def test_history_orders_page_fail(api, fail_nth, status):
+    fail_nth('/Search/GetHisOrdersData', 2, status)
+    with pytest.raises(PageQueryError):
+        api.query_history_orders()